@@ -0,0 +1,50 @@
+"""
+基准测试公共工具：按文件路径加载插件内不依赖MoviePilot的模块，生成合成媒体数据
+"""
+import importlib.util
+import random
+import sys
+from pathlib import Path
+from typing import Iterator, Tuple
+
+PLUGIN_DIR = Path(__file__).resolve().parents[2] / "plugins.v2" / "mediato115"
+
+# 常用汉字和英文音节，组合出区分度接近真实片库的标题
+_CN_CHARS = ("的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而"
+             "方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开"
+             "它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变"
+             "条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基")
+_EN_SYLLABLES = ["ka", "lo", "ren", "ta", "mi", "shi", "vor", "del", "an", "tor", "gra", "bel", "son", "ix", "ar",
+                 "que", "zen", "dra", "mo", "lin", "pha", "rus", "ce", "ny", "ost", "ve", "pri", "gon", "ul", "thea"]
+
+
+def load_module(name: str):
+    """
+    按文件路径加载插件子模块，避免触发依赖MoviePilot的插件包__init__
+    """
+    module_name = f"mediato115_bench_{name}"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, PLUGIN_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_titles(count: int, seed: int = 115) -> Iterator[Tuple[str, str, str, str]]:
+    """
+    生成 (item_id, title, item_type, path) 形式的合成媒体条目
+    """
+    rnd = random.Random(seed)
+    for i in range(count):
+        if rnd.random() < 0.6:
+            title = "".join(rnd.choice(_CN_CHARS) for _ in range(rnd.randint(2, 8)))
+        else:
+            title = " ".join("".join(rnd.choice(_EN_SYLLABLES) for _ in range(rnd.randint(1, 3))).title()
+                             for _ in range(rnd.randint(1, 4)))
+        if rnd.random() < 0.2:
+            title = f"{title}{rnd.randint(1, 9)}"
+        item_type = "电影" if rnd.random() < 0.7 else "电视剧"
+        path = f"/media/{'movies' if item_type == '电影' else 'tv'}/{title} ({1950 + i % 75})"
+        yield str(i), title, item_type, path
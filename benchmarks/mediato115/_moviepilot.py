@@ -0,0 +1,239 @@
+"""
+MoviePilot运行环境的替身：在 sys.modules 中注册插件用到的 app.* 模块，插件包无需修改即可在基准测试中加载。
+
+- MediaServerItem 使用 SQLite 数据库，字段与 MoviePilot 一致
+- TransferChain.manual_transfer 按设定的延迟在后台回调整理完成事件
+- _PluginBase.post_message 交给基准测试注册的回调，数据存储在内存中，数据目录为临时目录
+
+依赖 sqlalchemy（MoviePilot本身的依赖）
+"""
+import heapq
+import itertools
+import logging
+import sys
+import tempfile
+import threading
+import time
+import types
+from enum import Enum
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+from sqlalchemy import JSON, Column, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+class EventType(Enum):
+    PluginAction = "plugin.action"
+    MessageAction = "message.action"
+    TransferComplete = "transfer.complete"
+    TransferFailed = "transfer.failed"
+
+
+class Event:
+
+    def __init__(self, event_type: Optional[EventType] = None, event_data: Optional[dict] = None):
+        self.event_type = event_type
+        self.event_data = event_data or {}
+
+
+class EventManager:
+    """
+    只记录注册关系，事件由基准测试直接调用插件方法投递，与MoviePilot调用插件事件处理方法的方式一致
+    """
+
+    def __init__(self):
+        self.handlers: List[tuple] = []
+        self.sent = 0
+
+    def register(self, etype):
+        def decorator(func):
+            self.handlers.append((etype, func.__qualname__))
+            return func
+
+        return decorator
+
+    def send_event(self, etype, data: Optional[dict] = None):
+        self.sent += 1
+
+
+class FileItem:
+
+    def __init__(self, storage: str = "local", type: Optional[str] = None, path: str = "/", name: Optional[str] = None,
+                 basename: Optional[str] = None, extension: Optional[str] = None, size: Optional[int] = None,
+                 modify_time: Optional[float] = None):
+        self.storage = storage
+        self.type = type
+        self.path = path
+        self.name = name
+        self.basename = basename
+        self.extension = extension
+        self.size = size
+        self.modify_time = modify_time
+
+
+class TransferInfo:
+
+    def __init__(self, success: bool = True, fileitem: Optional[FileItem] = None, message: Optional[str] = None):
+        self.success = success
+        self.fileitem = fileitem
+        self.message = message
+
+
+class TransferSimulator:
+    """
+    模拟后台整理：单个定时线程按完成时间依次触发整理完成事件，不为每次整理创建线程
+    """
+
+    def __init__(self):
+        self.latency = 0.0
+        self.fail_ratio = 0.0
+        self.on_event: Optional[Callable[[bool, Event], None]] = None
+        self.calls = 0
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self.__run, name="bench-transfer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fileitem: FileItem):
+        with self._cond:
+            self.calls += 1
+            success = self.fail_ratio <= 0 or (self.calls * 7919 % 1000) / 1000 >= self.fail_ratio
+            heapq.heappush(self._heap, (time.monotonic() + self.latency, next(self._counter), fileitem, success))
+            self._cond.notify()
+
+    def __run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, fileitem, success = heapq.heappop(self._heap)
+            if self.on_event:
+                event = Event(EventType.TransferComplete if success else EventType.TransferFailed,
+                              {"fileitem": fileitem,
+                               "transferinfo": TransferInfo(success=success, fileitem=fileitem,
+                                                            message=None if success else "模拟整理失败")})
+                self.on_event(success, event)
+
+
+class Settings:
+    RMT_MEDIAEXT = [".mp4", ".mkv", ".ts", ".iso", ".rmvb", ".avi", ".mov", ".mpeg", ".mpg", ".wmv", ".3gp", ".asf",
+                    ".m4v", ".flv", ".m2ts", ".strm", ".tp", ".f4v"]
+    RMT_SUBEXT = [".srt", ".ass", ".ssa", ".sup"]
+    RMT_AUDIOEXT = [".aac", ".ac3", ".m4a", ".mka", ".mp3", ".flac", ".wav", ".ape"]
+
+
+Base = declarative_base()
+
+
+class MediaServerItem(Base):
+    __tablename__ = "mediaserveritem"
+    id = Column(Integer, primary_key=True)
+    server = Column(String)
+    library = Column(String)
+    item_id = Column(String, index=True)
+    item_type = Column(String)
+    title = Column(String, index=True)
+    original_title = Column(String)
+    year = Column(String)
+    tmdbid = Column(Integer)
+    imdbid = Column(String)
+    tvdbid = Column(String)
+    path = Column(String)
+    seasoninfo = Column(JSON)
+    note = Column(JSON)
+    lst_mod_date = Column(String, index=True)
+
+
+class Environment:
+    """
+    已安装的替身环境
+    """
+
+    def __init__(self, db_url: str, data_dir: Path):
+        self.engine = create_engine(db_url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.data_dir = data_dir
+        self.eventmanager = EventManager()
+        self.transfers = TransferSimulator()
+        self.on_message: Optional[Callable[..., None]] = None
+
+
+def install(db_url: str = "sqlite://", data_dir: Optional[str] = None, log_level: int = logging.WARNING) -> Environment:
+    """
+    注册替身模块，必须在导入插件之前调用
+    """
+    env = Environment(db_url, Path(data_dir or tempfile.mkdtemp(prefix="mediato115-bench-")))
+
+    def db_query(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if kwargs.get("db") is not None:
+                return func(*args, **kwargs)
+            db = env.session_factory()
+            try:
+                kwargs["db"] = db
+                return func(*args, **kwargs)
+            finally:
+                db.close()
+
+        return wrapper
+
+    class TransferChain:
+
+        def manual_transfer(self, fileitem: FileItem = None, target_storage: str = None, target_path: Any = None,
+                            background: bool = False, **kwargs):
+            env.transfers.submit(fileitem)
+            return True, ""
+
+    class _PluginBase:
+
+        def __init__(self):
+            self._store = {}
+
+        def post_message(self, channel: Any = None, title: str = None, text: str = None, userid: Any = None,
+                         buttons: Optional[list] = None, **kwargs):
+            if env.on_message:
+                env.on_message(userid=userid, title=title, text=text, buttons=buttons)
+
+        def get_data(self, key: str = None, plugin_id: str = None):
+            return self._store.get(key)
+
+        def save_data(self, key: str, value: Any, plugin_id: str = None):
+            self._store[key] = value
+
+        def del_data(self, key: str, plugin_id: str = None):
+            self._store.pop(key, None)
+
+        def get_data_path(self, plugin_id: str = None) -> Path:
+            env.data_dir.mkdir(parents=True, exist_ok=True)
+            return env.data_dir
+
+    logging.basicConfig(level=log_level, format="%(levelname)s %(message)s")
+    modules = {
+        "app": {},
+        "app.core": {},
+        "app.core.config": {"settings": Settings()},
+        "app.core.event": {"eventmanager": env.eventmanager, "Event": Event},
+        "app.chain": {},
+        "app.chain.transfer": {"TransferChain": TransferChain},
+        "app.plugins": {"_PluginBase": _PluginBase},
+        "app.schemas": {"FileItem": FileItem, "TransferInfo": TransferInfo},
+        "app.schemas.types": {"EventType": EventType},
+        "app.db": {"db_query": db_query, "Base": Base},
+        "app.db.models": {"MediaServerItem": MediaServerItem},
+        "app.log": {"logger": logging.getLogger("moviepilot")},
+    }
+    for name, attrs in modules.items():
+        module = types.ModuleType(name)
+        module.__path__ = []
+        module.__dict__.update(attrs)
+        sys.modules[name] = module
+        parent, _, child = name.rpartition(".")
+        if parent:
+            setattr(sys.modules[parent], child, module)
+    return env
@@ -0,0 +1,356 @@
+"""
+命令处理全链路压测：在替身MoviePilot环境中加载插件，按比例回放单个上传、多结果菜单选择、批量上传和未命中查询，
+统计各类操作从发出命令到收到回复的 p50/p99 耗时、吞吐量、上传端到端耗时及内存占用。
+
+- 媒体库为 SQLite 中的合成 MediaServerItem 数据，条目路径映射到临时目录下固定数量的真实媒体文件
+- 整理由替身 TransferChain 按设定延迟回调完成/失败事件
+- --json 输出包含当前提交和参数，不同提交间的结果可直接对比
+
+用法：python benchmarks/mediato115/bench_command_path.py [--rows 100000] [--ops 2000] [--clients 8]
+      [--mix search=6,menu=2,batch=1,miss=1] [--transfer-ms 50] [--json result.json]
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from _common import PLUGIN_DIR, synthetic_titles
+import _moviepilot
+
+# 插件发出的上传结束通知标题
+FINISH_TITLES = ("✅ 上传完成", "⚠️ 上传未全部完成")
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def _rss_mb() -> float:
+    """
+    当前进程常驻内存(MB)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PLUGIN_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Waiter:
+    __slots__ = ("event", "message")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.message: Optional[dict] = None
+
+
+class Collector:
+    """
+    按用户收集插件回复：等待中的回复交给对应的操作，上传结束通知用于统计端到端耗时
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, Waiter] = {}
+        self._commands: Dict[str, float] = {}
+        self.e2e: List[float] = []
+        self.finished = 0
+
+    def expect(self, userid: str) -> Waiter:
+        waiter = Waiter()
+        with self._lock:
+            self._waiters[userid] = waiter
+        return waiter
+
+    def command_sent(self, userid: str):
+        with self._lock:
+            self._commands[userid] = time.perf_counter()
+
+    def on_message(self, userid=None, title=None, text=None, buttons=None):
+        now = time.perf_counter()
+        with self._lock:
+            if title in FINISH_TITLES:
+                self.finished += 1
+                started = self._commands.pop(userid, None)
+                if started is not None:
+                    self.e2e.append(now - started)
+                return
+            waiter = self._waiters.pop(userid, None)
+        if waiter:
+            waiter.message = {"title": title, "text": text, "buttons": buttons}
+            waiter.event.set()
+
+
+class Workload:
+    """
+    由媒体库数据生成各类操作的查询参数
+    """
+
+    def __init__(self, plugin, titles: List[str], rnd: random.Random, pool: int = 300):
+        index = plugin._title_index
+        self.unique: List[str] = []
+        self.ambiguous: List[str] = []
+        for title in rnd.sample(titles, min(len(titles), pool * 20)):
+            if len(self.unique) < pool and len(index.search(title)) == 1:
+                self.unique.append(title)
+            fragment = title[:2]
+            if len(self.ambiguous) < pool and 2 <= len(index.search(fragment)) <= 40:
+                self.ambiguous.append(fragment)
+            if len(self.unique) >= pool and len(self.ambiguous) >= pool:
+                break
+        if not self.unique or not self.ambiguous:
+            raise SystemExit("合成数据中找不到足够的唯一标题或多结果片段，请增大 --rows")
+
+
+class LoadTest:
+
+    def __init__(self, env, plugin, workload: Workload, collector: Collector, timeout: float):
+        self._env = env
+        self._plugin = plugin
+        self._workload = workload
+        self._collector = collector
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def __record(self, kind: str, seconds: Optional[float]):
+        with self._lock:
+            if seconds is None:
+                self.errors[kind] += 1
+            else:
+                self.latency[kind].append(seconds)
+
+    def __command(self, userid: str, arg: str, kind: str) -> Optional[dict]:
+        waiter = self._collector.expect(userid)
+        self._collector.command_sent(userid)
+        start = time.perf_counter()
+        self._plugin.mediato115(_moviepilot.Event(_moviepilot.EventType.PluginAction,
+                                                  {"action": "mediato115", "arg_str": arg,
+                                                   "user": userid, "channel": "bench"}))
+        if not waiter.event.wait(self._timeout):
+            self.__record(kind, None)
+            return None
+        self.__record(kind, time.perf_counter() - start)
+        return waiter.message
+
+    def __callback(self, userid: str, data: str) -> Optional[dict]:
+        waiter = self._collector.expect(userid)
+        start = time.perf_counter()
+        self._plugin.message_action(_moviepilot.Event(_moviepilot.EventType.MessageAction,
+                                                      {"plugin_id": type(self._plugin).__name__, "text": data,
+                                                       "user": userid, "channel": "bench"}))
+        if not waiter.event.wait(self._timeout):
+            self.__record("callback", None)
+            return None
+        self.__record("callback", time.perf_counter() - start)
+        return waiter.message
+
+    def run_op(self, kind: str, userid: str, rnd: random.Random):
+        if kind == "search":
+            self.__command(userid, rnd.choice(self._workload.unique), kind)
+        elif kind == "miss":
+            self.__command(userid, f"不存在的媒体{rnd.randint(0, 10 ** 9)}", kind)
+        elif kind == "batch":
+            # 批量上传的名称按行分隔，名称中的逗号是标题的一部分
+            self.__command(userid, "\n".join(rnd.sample(self._workload.unique, 5)), kind)
+        elif kind == "menu":
+            message = self.__command(userid, rnd.choice(self._workload.ambiguous), kind)
+            buttons = [button["callback_data"].split("|", 1)[-1]
+                       for row in (message or {}).get("buttons") or [] for button in row]
+            selects = [data for data in buttons if ":s:" in data]
+            if not selects:
+                return
+            # 选择一到两项后确认上传
+            for data in selects[:rnd.randint(1, 2)]:
+                self.__callback(userid, data)
+            self.__callback(userid, selects[0].rsplit(":", 2)[0] + ":c")
+
+
+def _create_media_pool(root: Path, count: int):
+    """
+    创建固定数量的电影和剧集目录，文件内容互不相同
+    """
+    for i in range(count):
+        movie = root / "movies" / str(i)
+        movie.mkdir(parents=True)
+        (movie / f"{i}.mkv").write_text(f"movie-{i}")
+        season = root / "tv" / str(i) / "Season 1"
+        season.mkdir(parents=True)
+        for episode in range(1, 4):
+            (season / f"{i}.S01E{episode:02d}.mkv").write_text(f"tv-{i}-{episode}")
+
+
+def _load_rows(env, media_root: Path, rows: int, pool: int) -> List[str]:
+    titles = []
+    batch = []
+    table = _moviepilot.MediaServerItem.__table__
+    with env.engine.begin() as conn:
+        for item_id, title, item_type, path in synthetic_titles(rows):
+            slot = int(item_id) % pool
+            titles.append(title)
+            batch.append({
+                "server": "bench",
+                "item_id": item_id,
+                "title": title,
+                "item_type": item_type,
+                "year": path[-5:-1],
+                "path": str(media_root / "movies" / str(slot) / f"{slot}.mkv") if item_type == "电影"
+                else str(media_root / "tv" / str(slot)),
+                "seasoninfo": {"1": [1, 2, 3]} if item_type == "电视剧" else None,
+                "lst_mod_date": "2024-01-01 00:00:00",
+            })
+            if len(batch) >= 50000:
+                conn.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(table.insert(), batch)
+    return titles
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000, help="媒体库条目数，10000~1000000")
+    parser.add_argument("--ops", type=int, default=2000, help="回放的操作数")
+    parser.add_argument("--clients", type=int, default=8, help="并发用户数，每个用户发出命令后等待回复")
+    parser.add_argument("--mix", default="search=6,menu=2,batch=1,miss=1", help="各类操作的比例")
+    parser.add_argument("--transfer-ms", type=float, default=50, help="模拟单个文件整理耗时")
+    parser.add_argument("--fail-ratio", type=float, default=0.02, help="模拟整理失败比例")
+    parser.add_argument("--media-dirs", type=int, default=300, help="真实媒体目录数，条目路径循环映射到这些目录")
+    parser.add_argument("--timeout", type=float, default=30, help="等待单次回复的超时(秒)")
+    parser.add_argument("--seed", type=int, default=115)
+    parser.add_argument("--tracemalloc", action="store_true", help="统计Python内存分配峰值，会降低吞吐")
+    parser.add_argument("--json", help="结果输出文件")
+    args = parser.parse_args()
+
+    mix = {kind: float(weight) for kind, weight in (item.split("=") for item in args.mix.split(","))}
+    workdir = Path(tempfile.mkdtemp(prefix="mediato115-bench-"))
+    env = _moviepilot.install(db_url=f"sqlite:///{workdir / 'media.db'}", data_dir=str(workdir / "data"),
+                               log_level=logging.ERROR)
+    env.transfers.latency = args.transfer_ms / 1000
+    env.transfers.fail_ratio = args.fail_ratio
+    collector = Collector()
+    env.on_message = collector.on_message
+    memory = {"baseline_mb": round(_rss_mb(), 1)}
+    try:
+        media_root = workdir / "media"
+        _create_media_pool(media_root, args.media_dirs)
+        start = time.perf_counter()
+        titles = _load_rows(env, media_root, args.rows, args.media_dirs)
+        print(f"rows={args.rows} load={time.perf_counter() - start:.1f}s")
+        memory["rows_loaded_mb"] = round(_rss_mb(), 1)
+
+        sys.path.insert(0, str(PLUGIN_DIR.parent))
+        plugin = importlib.import_module(PLUGIN_DIR.name).MediaTo115()
+        env.transfers.on_event = lambda success, event: (
+            plugin.transfer_complete(event) if success else plugin.transfer_failed(event))
+        start = time.perf_counter()
+        plugin.init_plugin({"enabled": True, "media_paths": str(media_root), "max_concurrency": 4})
+        while not plugin._title_index.ready:
+            time.sleep(0.05)
+        init_seconds = time.perf_counter() - start
+        print(f"plugin init + index build={init_seconds:.1f}s")
+        memory["plugin_ready_mb"] = round(_rss_mb(), 1)
+
+        rnd = random.Random(args.seed)
+        workload = Workload(plugin, titles, rnd)
+        kinds = rnd.choices(list(mix), weights=list(mix.values()), k=args.ops)
+        loadtest = LoadTest(env, plugin, workload, collector, args.timeout)
+        counter = iter(range(args.ops))
+        counter_lock = threading.Lock()
+
+        def client(client_id: int):
+            client_rnd = random.Random(args.seed * 1000 + client_id)
+            while True:
+                with counter_lock:
+                    n = next(counter, None)
+                if n is None:
+                    return
+                loadtest.run_op(kinds[n], f"user-{n}", client_rnd)
+
+        if args.tracemalloc:
+            tracemalloc.start()
+        start = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        # 等待上传队列清空
+        drain_start = time.perf_counter()
+        while time.perf_counter() - drain_start < args.timeout:
+            if not plugin._pipeline.stats()["jobs"] and not len(plugin._tracker):
+                break
+            time.sleep(0.05)
+        drain = time.perf_counter() - drain_start
+        memory["after_run_mb"] = round(_rss_mb(), 1)
+        if args.tracemalloc:
+            memory["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+            tracemalloc.stop()
+
+        result = {
+            "commit": _git_commit(),
+            "args": vars(args),
+            "init_seconds": round(init_seconds, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_ops": round(args.ops / elapsed, 1),
+            "drain_seconds": round(drain, 3),
+            "transfers": env.transfers.calls,
+            "uploads_finished": collector.finished,
+            "latency_ms": {},
+            "errors": dict(loadtest.errors),
+            "dispatcher_rejected": plugin._dispatcher.rejected,
+            "memory": memory,
+        }
+        for kind, samples in sorted(list(loadtest.latency.items()) + [("upload_e2e", collector.e2e)]):
+            if samples:
+                result["latency_ms"][kind] = {
+                    "count": len(samples),
+                    "p50": round(_percentile(samples, 0.5) * 1000, 3),
+                    "p99": round(_percentile(samples, 0.99) * 1000, 3),
+                    "mean": round(statistics.mean(samples) * 1000, 3),
+                }
+        plugin.stop_service()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"ops={args.ops} clients={args.clients} elapsed={result['elapsed_seconds']}s "
+          f"throughput={result['throughput_ops']} ops/s transfers={result['transfers']} "
+          f"drain={result['drain_seconds']}s")
+    for kind, stats in result["latency_ms"].items():
+        print(f"{kind:<12} n={stats['count']:<6} p50={stats['p50']:9.3f}ms p99={stats['p99']:9.3f}ms "
+              f"mean={stats['mean']:9.3f}ms")
+    if result["errors"]:
+        print(f"timeouts: {result['errors']}")
+    print("memory: " + " ".join(f"{key}={value}" for key, value in memory.items()))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
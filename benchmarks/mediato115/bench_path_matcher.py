@@ -0,0 +1,66 @@
+"""
+允许目录检查基准：对比逐个 startswith 与路径前缀树，以及文件状态缓存与直接 os.path.exists
+
+用法：python benchmarks/mediato115/bench_path_matcher.py [--roots 1000 5000 10000] [--checks 20000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from _common import load_module
+
+
+def _timeit(func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - start) / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--roots", type=int, nargs="+", default=[100, 1000, 5000, 10000])
+    parser.add_argument("--checks", type=int, default=20000)
+    args = parser.parse_args()
+
+    pathmatcher = load_module("pathmatcher")
+    rnd = random.Random(115)
+    for count in args.roots:
+        roots = [f"/mnt/disk{i % 16}/library{i}/media" for i in range(count)]
+        paths = []
+        for _ in range(args.checks):
+            root = rnd.choice(roots)
+            # 一半在允许目录下，一半是前缀相似但不在目录下的路径
+            if rnd.random() < 0.5:
+                paths.append(f"{root}/Movie ({rnd.randint(1950, 2024)})/movie.mkv")
+            else:
+                paths.append(f"{root}2/Movie/movie.mkv")
+
+        def linear(path):
+            return any(path.startswith(root) for root in roots)
+
+        start = time.perf_counter()
+        trie = pathmatcher.PathTrie(roots)
+        build = time.perf_counter() - start
+
+        linear_cost = _timeit(linear, paths)
+        trie_cost = _timeit(trie.match, paths)
+        print(f"roots={count:<6} startswith={linear_cost * 1e6:9.2f}us/check "
+              f"trie={trie_cost * 1e6:7.2f}us/check build={build * 1000:.1f}ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(200):
+            path = os.path.join(tmp, f"{i}.mkv")
+            open(path, "wb").close()
+            files.append(path)
+        checks = [rnd.choice(files) for _ in range(args.checks)]
+        cache = pathmatcher.StatCache(ttl=30)
+        print(f"os.path.exists={_timeit(os.path.exists, checks) * 1e6:.2f}us/check "
+              f"StatCache.exists={_timeit(cache.exists, checks) * 1e6:.2f}us/check (本地磁盘，慢速挂载差距更大)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+标题查询基准：对比 SQL ilike '%title%' 扫描与内存标题索引，并测量输错一个字时模糊匹配的耗时和命中率
+
+用法：python benchmarks/mediato115/bench_title_index.py [--rows 200000] [--queries 200]
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import time
+
+from _common import load_module, synthetic_titles
+
+
+def _percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def _report(name, samples):
+    print(f"{name:<12} p50={_percentile(samples, 0.5) * 1000:8.3f}ms "
+          f"p99={_percentile(samples, 0.99) * 1000:8.3f}ms "
+          f"mean={statistics.mean(samples) * 1000:8.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    # 与插件的SEARCH_LIMIT一致，0表示取回全部结果
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    titleindex = load_module("titleindex")
+    rows = list(synthetic_titles(args.rows))
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE mediaserveritem (id INTEGER PRIMARY KEY, item_id TEXT, title TEXT, "
+                 "item_type TEXT, path TEXT)")
+    conn.executemany("INSERT INTO mediaserveritem (item_id, title, item_type, path) VALUES (?, ?, ?, ?)", rows)
+    conn.execute("CREATE INDEX ix_title ON mediaserveritem (title)")
+    conn.commit()
+
+    start = time.perf_counter()
+    index = titleindex.TitleIndex()
+    index.build(titleindex.MediaRecord(item_id=r[0], title=r[1], item_type=r[2], path=r[3]) for r in rows)
+    print(f"rows={args.rows} index build={time.perf_counter() - start:.2f}s grams={len(index._postings)} "
+          f"trigrams={len(index._trigrams)}")
+
+    rnd = random.Random(7)
+    queries = []
+    for _, title, _, _ in rnd.sample(rows, args.queries):
+        # 混合完整标题和标题片段，片段包括单字
+        if len(title) > 3 and rnd.random() < 0.5:
+            begin = rnd.randint(0, len(title) - 3)
+            fragment = title[begin:begin + rnd.randint(1, 3)]
+            if titleindex.normalize(fragment):
+                title = fragment
+        queries.append(title)
+
+    sql_samples, index_samples = [], []
+    for query in queries:
+        start = time.perf_counter()
+        conn.execute("SELECT item_id, title, item_type, path FROM mediaserveritem WHERE title LIKE ?",
+                     (f"%{query}%",)).fetchall()
+        sql_samples.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        index.search(query, limit=args.limit)
+        index_samples.append(time.perf_counter() - start)
+
+    _report("sql ilike", sql_samples)
+    _report("title index", index_samples)
+
+    # 高频单字和双字母，候选集最大的查询
+    for query in ("的", "a", "an"):
+        samples = []
+        for _ in range(20):
+            start = time.perf_counter()
+            index.search(query, limit=args.limit)
+            samples.append(time.perf_counter() - start)
+        _report(f"short {query}", samples)
+
+    # 较长的完整标题替换其中一个字，模拟输错字
+    typo_samples, hits = [], 0
+    typos = [(item_id, title) for item_id, title, _, _ in rnd.sample(rows, args.queries * 4)
+             if len(titleindex.normalize(title)) >= 6][:args.queries]
+    for item_id, title in typos:
+        pos = rnd.randrange(len(title))
+        query = title[:pos] + ("x" if title[pos] != "x" else "y") + title[pos + 1:]
+        start = time.perf_counter()
+        results = index.search(query, limit=args.limit)
+        typo_samples.append(time.perf_counter() - start)
+        hits += any(record.item_id == item_id for record in results)
+    _report("typo", typo_samples)
+    print(f"typo hit rate={hits / max(1, len(typos)):.1%}")
+
+
+if __name__ == "__main__":
+    main()
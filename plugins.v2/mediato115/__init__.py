@@ -1,17 +1,48 @@
 import os
-from typing import Optional, List, Tuple, Dict, Any
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional, List, Set, Tuple, Dict, Any
 
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.core.event import eventmanager, Event
 from app.chain.transfer import TransferChain
 from app.plugins import _PluginBase
-from app.schemas import ManualTransferItem, FileItem
+from app.schemas import FileItem
 from app.schemas.types import EventType
 from app.db import db_query
 from app.db.models import MediaServerItem
 from app.log import logger
+from .dispatcher import EventDispatcher
+from .episodes import EpisodeIndex, EpisodeSelection, split_episode_spec
+from .hashcache import HashCache
+from .journal import SyncJournal
+from .menu import MENU_PREFIX, MenuCache, MenuSession
+from .metrics import LatencyHistogram, MetricsRecorder
+from .pathmatcher import PathTrie, StatCache
+from .pipeline import UploadPipeline, UploadJob, UploadUnit, UnitState, collect_units
+from .registry import InflightRegistry
+from .scanner import ScanCache
+from .scheduler import BandwidthProfile, Priority
+from .snapshot import WarmSnapshot
+from .sync import DirtyWatcher, LibrarySync, SyncResult
+from .titleindex import TitleIndex, MediaRecord, MATCH_SUBSTRING, exact_matches, rank_records
+from .tracker import InflightTransfer, TransferTracker
 
+# 配置项中多个取值的分隔符
+LIST_SEPARATORS = re.compile(r"[,，;；、\n]+")
+# 批量上传时媒体名称按行分隔，名称中的逗号、顿号是标题的一部分
+BATCH_SEPARATORS = re.compile(r"\n+")
+# 单行批量上传需显式指定，名称用分号分隔：/mediato115 --batch 电影A;电影B
+BATCH_FLAG = "--batch"
+BATCH_FLAG_SEPARATORS = re.compile(r"[;；\n]+")
+# 强制上传：不检查内容是否已上传过，目标存储上的文件被删除后重新上传：/mediato115 --force 电影名
+FORCE_FLAG = "--force"
 
 
 class MediaTo115(_PluginBase):
@@ -22,7 +53,7 @@ class MediaTo115(_PluginBase):
     # 插件图标
     plugin_icon = ""
     # 插件版本
-    plugin_version = "0.0.3"
+    plugin_version = "0.0.36"
     # 插件作者
     plugin_author = "Sowevo"
     # 作者主页
@@ -33,16 +64,144 @@ class MediaTo115(_PluginBase):
     plugin_order = 30
     # 可使用的用户级别
     auth_level = 1
+    # 批量上传汇总消息中每类最多列出的条目数
+    SUMMARY_LIMIT = 20
+    # 事件处理线程数及队列长度
+    EVENT_WORKERS = 2
+    EVENT_QUEUE_SIZE = 100
+    # 文件状态缓存有效期(秒)
+    STAT_CACHE_TTL = 30
+    # 插件加载后首次查询等待预热快照读取的最长时间(秒)
+    SNAPSHOT_WAIT = 3
+    # 选择菜单每页条目数及结果集缓存有效期(秒)
+    MENU_PAGE_SIZE = 8
+    MENU_CACHE_TTL = 600
+    # 按标题查询时最多取回的条目数，选择菜单最多翻到该数量
+    SEARCH_LIMIT = 50
+    # 默认上传目标存储
+    TARGET_STORAGE = "u115"
+    # 媒体库同步时跳过最近该秒数内修改过的文件，避免上传仍在写入的文件
+    SYNC_SETTLE = 120
 
     # 私有属性
     _enabled = False
     _media_paths = ""
-
+    _batch_workers = 4
+    _max_concurrency = 2
+    _bandwidth_profiles = ""
+    _bandwidth_profile: Optional[BandwidthProfile] = None
+    _sync_enabled = False
+    _sync_interval = 60
+    # 上传目标存储列表，同一媒体同时上传到各存储
+    _target_storages: List[str] = ["u115"]
+    # 跨进程的上传任务登记表，相同的上传请求并入已有任务
+    _registry: Optional[InflightRegistry] = None
+    # 批量上传线程池
+    _executor: Optional[ThreadPoolExecutor] = None
+    # 可续传上传流水线
+    _pipeline: Optional[UploadPipeline] = None
+    # 文件哈希缓存
+    _hash_cache: Optional[HashCache] = None
+    # 事件处理分发器及事件回调占用时间
+    _dispatcher: Optional[EventDispatcher] = None
+    # 整理结果处理线程：结果数不超过已提交的整理数，队列不限长度，结果不会因队列已满被拒绝
+    _results: Optional[EventDispatcher] = None
+    _hold_histogram: Optional[LatencyHistogram] = None
+    # 运行指标
+    _metrics: Optional[MetricsRecorder] = None
+    # 允许目录匹配及文件状态缓存
+    _path_matcher: Optional[PathTrie] = None
+    _stat_cache: Optional[StatCache] = None
+    # 目录扫描结果缓存
+    _scan_cache: Optional[ScanCache] = None
+    # 标题索引、文件状态和扫描结果的预热快照，读取完成前查询等待
+    _snapshot: Optional[WarmSnapshot] = None
+    _snapshot_loaded: Optional[threading.Event] = None
+    # 选择菜单结果集缓存
+    _menu_cache: Optional[MenuCache] = None
+    # 标题索引
+    _title_index: Optional[TitleIndex] = None
+    _index_lock: Optional[threading.Lock] = None
+    # 媒体库同步日志、目录监控及上次同步统计
+    _journal: Optional[SyncJournal] = None
+    _sync_watcher: Optional[DirtyWatcher] = None
+    _sync_lock: Optional[threading.Lock] = None
+    _sync_baseline = False
+    _last_sync: Optional[dict] = None
+    # 已转交后台整理、等待结果事件的文件
+    _tracker: Optional[TransferTracker] = None
 
     def init_plugin(self, config: dict = None):
         if config:
             self._enabled = config.get("enabled")
             self._media_paths = config.get("media_paths") or ""
+            try:
+                self._batch_workers = max(1, int(config.get("batch_workers") or 4))
+            except (TypeError, ValueError):
+                self._batch_workers = 4
+            try:
+                self._max_concurrency = max(1, int(config.get("max_concurrency") or 2))
+            except (TypeError, ValueError):
+                self._max_concurrency = 2
+            self._bandwidth_profiles = config.get("bandwidth_profiles") or ""
+            self._sync_enabled = config.get("sync_enabled")
+            targets = [target.strip() for target in LIST_SEPARATORS.split(config.get("target_storages") or "")]
+            self._target_storages = list(dict.fromkeys(filter(None, targets))) or [self.TARGET_STORAGE]
+            try:
+                self._sync_interval = max(1, int(config.get("sync_interval") or 60))
+            except (TypeError, ValueError):
+                self._sync_interval = 60
+
+        self.stop_service()
+        self._path_matcher = PathTrie(self.__media_roots())
+        self._stat_cache = StatCache(ttl=self.STAT_CACHE_TTL)
+        self._scan_cache = ScanCache()
+        if not self._menu_cache:
+            self._menu_cache = MenuCache(ttl=self.MENU_CACHE_TTL)
+        if not self._metrics:
+            self._metrics = MetricsRecorder()
+        self._hold_histogram = LatencyHistogram()
+        if not self._tracker:
+            self._tracker = TransferTracker()
+        self._title_index = TitleIndex()
+        self._index_lock = threading.Lock()
+        self._snapshot = WarmSnapshot(str(self.get_data_path() / "warm.snap"))
+        self._snapshot_loaded = threading.Event()
+        if not self._enabled:
+            # 未启用时不启动工作线程，也不恢复未完成的上传任务
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self._batch_workers, thread_name_prefix="mediato115")
+        self._dispatcher = EventDispatcher(workers=self.EVENT_WORKERS, maxsize=self.EVENT_QUEUE_SIZE)
+        self._dispatcher.start()
+        self._results = EventDispatcher(workers=1, maxsize=0, name="mediato115-result")
+        self._results.start()
+        self._hash_cache = HashCache(db_path=str(self.get_data_path() / "hashcache.db"))
+        self._journal = SyncJournal(db_path=str(self.get_data_path() / "journal.db"))
+        self._sync_lock = threading.Lock()
+        self._sync_baseline = False
+        if self._sync_enabled:
+            # 监控目录变化，首次同步完成目录遍历后只处理变化的目录
+            self._sync_watcher = DirtyWatcher()
+            if not self._sync_watcher.start(self.__media_roots()):
+                self._sync_watcher = None
+        self._bandwidth_profile, invalid = BandwidthProfile.parse(self._bandwidth_profiles)
+        if invalid:
+            logger.warning(f"无法解析的带宽时段配置：{invalid}")
+        self._registry = InflightRegistry(db_path=str(self.get_data_path() / "inflight.db"))
+        self._pipeline = UploadPipeline(store=self,
+                                        submit=self.__transfer_unit,
+                                        on_finished=self.__on_job_finished,
+                                        skip=self.__is_uploaded,
+                                        concurrency=self._max_concurrency,
+                                        profile=self._bandwidth_profile,
+                                        in_flight=lambda job, unit: self._tracker.contains(job.job_id, unit.path,
+                                                                                         job.target),
+                                        claim=self.__claim_resumed)
+        resumed = self._pipeline.start()
+        if resumed:
+            logger.info(f"恢复{resumed}个未完成的上传任务")
+        # 后台读取预热快照并刷新标题索引，索引可用前查询回退到数据库
+        threading.Thread(target=self.__warm_start, daemon=True).start()
 
     @staticmethod
     def get_command() -> List[Dict[str, Any]]:
@@ -68,80 +227,286 @@ class MediaTo115(_PluginBase):
             if not event_data or event_data.get("action") != "mediato115":
                 return
 
-            if not self._media_paths or not self._media_paths.strip():
-                logger.warning("未配置允许的目录")
-                self.post_message(channel=event_data.get("channel"),
-                                  title="❌ 配置错误",
-                                  text="请先在插件配置中设置允许上传的本地媒体路径",
-                                  userid=event_data.get("user"))
+            self.__dispatch(self.__handle_command, event_data)
+
+    def __handle_command(self, event_data: dict):
+        """
+        处理上传命令
+        """
+        if not self._media_paths or not self._media_paths.strip():
+            logger.warning("未配置允许的目录")
+            self.post_message(channel=event_data.get("channel"),
+                              title="❌ 配置错误",
+                              text="请先在插件配置中设置允许上传的本地媒体路径",
+                              userid=event_data.get("user"))
+            return
+
+        args = event_data.get("arg_str")
+        if not args or not args.strip():
+            logger.warning("缺少参数")
+            self.post_message(channel=event_data.get("channel"),
+                              title="❌ 参数错误",
+                              text="请提供媒体名称\n用法：/mediato115 电影名 或 /mediato115 剧集名 [S02|S01E05-E10]",
+                              userid=event_data.get("user"))
+            return
+
+        args = args.strip()
+        force = args.startswith(FORCE_FLAG)
+        if force:
+            args = args[len(FORCE_FLAG):].strip()
+        titles = self.__parse_titles(args, event_data)
+        if titles is None:
+            return
+        if not titles:
+            logger.warning(f"参数错误：{args}")
+            self.post_message(channel=event_data.get("channel"),
+                              title="❌ 参数错误",
+                              text="请提供媒体名称\n用法：/mediato115 电影名 或 /mediato115 剧集名 [S02|S01E05-E10]",
+                              userid=event_data.get("user"))
+            return
+        if len(titles) > 1:
+            self.__batch_upload(titles, event_data, force)
+            return
+
+        # 名称末尾可以带季集范围，只上传范围内的剧集
+        title, episodes = split_episode_spec(titles[0])
+        ranked = self.__search_media(title=title)
+        if not ranked:
+            logger.info(f"未找到媒体：{title}")
+            self._metrics.fail("lookup_miss")
+            self.post_message(channel=event_data.get("channel"),
+                              title="❌ 未找到媒体",
+                              text=f"未找到名为「{title}」的媒体信息\n请检查媒体名称是否正确",
+                              userid=event_data.get("user"))
+            return
+        media_items = [item for _, item in ranked]
+        # 模糊匹配或多个词分别匹配的结果可能不是要找的媒体，只有一个也先由用户确认
+        approximate = ranked[0][0] > MATCH_SUBSTRING
+        if len(media_items) > 1 or approximate:
+            logger.info(f"找到{len(media_items)}个{'近似' if approximate else ''}匹配的媒体项目")
+            # 发送带有交互按钮的消息,让用户选
+            self._send_main_menu(event_data, media_items, episodes, approximate=approximate, force=force)
+            return
+
+        media_item = media_items[0]
+        # 上传到115
+        self.__upload_to_115(media_item, event_data, episodes=episodes, force=force)
+
+    def __dispatch(self, handler, event_data: dict):
+        """
+        事件处理入队后立即返回，不在事件管理器线程上执行查询和文件检查
+        """
+        start = time.perf_counter()
+        try:
+            if self._dispatcher and self._dispatcher.submit(handler, event_data):
                 return
+            logger.warning("事件处理队列已满，拒绝请求")
+            self.post_message(channel=event_data.get("channel"),
+                              title="⏳ 系统繁忙",
+                              text="上传请求过多，请稍后再试",
+                              userid=event_data.get("user"))
+        finally:
+            self._hold_histogram.observe(time.perf_counter() - start)
 
-            args = event_data.get("arg_str")
-            if not args or not args.strip():
-                logger.warning("缺少参数")
+    def __parse_titles(self, args: str, event_data: dict) -> Optional[List[str]]:
+        """
+        解析媒体名称列表：多个名称按行分隔，"--batch" 开头时也可用分号分隔，
+        "@文件路径" 表示从文件读取（每行一个），文件读取失败时发送通知并返回None
+        """
+        separators = BATCH_SEPARATORS
+        if args.startswith(BATCH_FLAG):
+            args = args[len(BATCH_FLAG):].strip()
+            separators = BATCH_FLAG_SEPARATORS
+        elif args.startswith("@"):
+            file_path = args[1:].strip()
+            if not self.__is_allowed_path(file_path) or not self._stat_cache.isfile(file_path):
+                logger.warning(f"名称列表文件无效：{file_path}")
                 self.post_message(channel=event_data.get("channel"),
                                   title="❌ 参数错误",
-                                  text="请提供媒体名称\n用法：/mediato115 电影名 或 /mediato115 剧集名",
+                                  text=f"名称列表文件不存在或不在允许的目录范围内\n文件：{file_path}",
                                   userid=event_data.get("user"))
-                return
-
-            args_list = args.strip().split(" ")
-            # 检查参数数量是否正确 (1个参数)
-            if len(args_list) != 1:
-                logger.warning(f"参数错误：{args_list}")
+                return None
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    args = f.read()
+            except Exception as e:
+                logger.error(f"读取名称列表文件失败：{file_path} - {str(e)}")
                 self.post_message(channel=event_data.get("channel"),
                                   title="❌ 参数错误",
-                                  text="只能输入一个媒体名称\n用法：/mediato115 电影名 或 /mediato115 剧集名",
+                                  text=f"读取名称列表文件失败\n文件：{file_path}",
                                   userid=event_data.get("user"))
-                return
+                return None
+        titles = []
+        for title in separators.split(args):
+            title = title.strip()
+            if title and title not in titles:
+                titles.append(title)
+        return titles
 
-            media_items = self.__get_media_by_title(title=args_list[0])
-            if not media_items:
-                logger.info(f"未找到媒体：{args_list[0]}")
-                self.post_message(channel=event_data.get("channel"),
-                                  title="❌ 未找到媒体",
-                                  text=f"未找到名为「{args_list[0]}」的媒体信息\n请检查媒体名称是否正确",
-                                  userid=event_data.get("user"))
-                return
-            elif len(media_items) > 1:
-                logger.info(f"找到{len(media_items)}个匹配的媒体项目")
-                # 发送带有交互按钮的消息,让用户选
-                self._send_main_menu(event_data, media_items)
-                return
+    def __batch_upload(self, titles: List[str], event_data: dict, force: bool = False):
+        """
+        批量上传：一次解析全部名称，只匹配到一个媒体或只有一个标题完全一致的名称直接上传，
+        匹配到多个媒体或只有近似匹配的名称不自动选择，在汇总中列出候选，通过线程池并行提交上传任务，最后汇总通知
+        """
+        specs = {title: split_episode_spec(title) for title in titles}
+        matches = self.__resolve_titles(list(dict.fromkeys(name for name, _ in specs.values())))
+        missing, ambiguous = [], []
+        selected: Dict[Tuple[str, str], Tuple[str, Any, Optional[EpisodeSelection]]] = {}
+        for title in titles:
+            name, episodes = specs[title]
+            ranked = matches.get(name)
+            if not ranked:
+                missing.append(title)
+                self._metrics.fail("lookup_miss")
+                continue
+            items = [item for _, item in ranked]
+            if ranked[0][0] > MATCH_SUBSTRING:
+                candidates = "、".join(self.__describe_item(item) for item in items[:3])
+                ambiguous.append(f"{title}：近似匹配 {candidates}" + (f" 等{len(items)}个" if len(items) > 3 else ""))
+                continue
+            if len(items) > 1:
+                exact = exact_matches(items, name)
+                if len(exact) != 1:
+                    candidates = "、".join(self.__describe_item(item) for item in items[:3])
+                    ambiguous.append(f"{title}：{candidates}" + (f" 等{len(items)}个" if len(items) > 3 else ""))
+                    continue
+                items = exact
+            # 多个名称命中同一媒体的同一范围时只上传一次
+            selected.setdefault((items[0].item_id, episodes.label if episodes else ""), (title, items[0], episodes))
+        logger.info(f"批量上传：{len(titles)}个名称，匹配{len(selected)}个媒体，未找到{len(missing)}个，"
+                    f"待确认{len(ambiguous)}个")
+        self.__submit_batch(list(selected.values()), missing, event_data, ambiguous, force)
 
-            media_item = media_items[0]
-            # 上传到115
-            self.__upload_to_115(media_item,event_data)
+    @staticmethod
+    def __describe_item(item: Any) -> str:
+        """
+        汇总中的候选媒体：标题 (年份)
+        """
+        year = getattr(item, "year", None)
+        return f"{item.title} ({year})" if year else item.title
 
-    def _send_main_menu(self, event_data, items):
+    def __submit_batch(self, selected: List[Tuple[str, Any, Optional[EpisodeSelection]]], missing: List[str],
+                       event_data: dict, ambiguous: Optional[List[str]] = None, force: bool = False):
         """
-        发送主菜单
+        通过线程池并行提交多个媒体的上传任务，最后汇总通知
+        :param selected: [(用户输入的名称, 媒体条目, 季集范围)]
+        :param missing: 未找到的名称
+        :param ambiguous: 匹配到多个媒体或只有近似匹配、未上传的名称及候选
+        :param force: 强制上传，不检查内容是否已上传过
         """
-        channel = event_data.get("channel")
-        userid = event_data.get("user")
-        
-        # 限制显示前4个项目
-        menu_items = items[:4]
-        
-        # 生成菜单按钮和文本
-        menu_buttons = []
-        menu_text_lines = []
-        
-        for i, item in enumerate(menu_items, 1):
-            menu_buttons.append({
-                "text": str(i), 
-                "callback_data": f"[PLUGIN]{self.__class__.__name__}|{item.item_id}"
-            })
-            menu_text_lines.append(f"{i}. {item.title} ({item.item_type})")
+        ambiguous = ambiguous or []
+        futures = {
+            self._executor.submit(self.__upload_to_115, item, event_data, False, Priority.BATCH, episodes, force):
+                (title, item, episodes)
+            for title, item, episodes in selected
+        }
+        succeeded, failed = [], []
+        for future in as_completed(futures):
+            title, item, episodes = futures[future]
+            try:
+                state, errmsg = future.result()
+            except Exception as e:
+                logger.error(f"批量上传提交失败：{item.title} - {str(e)}")
+                state, errmsg = False, str(e)
+            if state:
+                label = f"{item.title} {episodes.label}" if episodes and item.item_type == "电视剧" else item.title
+                succeeded.append(label if split_episode_spec(title)[0] == item.title else f"{title} → {label}")
+            else:
+                failed.append(f"{item.title}：{errmsg.splitlines()[0] if errmsg else '未知错误'}")
+
+        lines = [f"共{len(selected) + len(missing) + len(ambiguous)}个，成功{len(succeeded)}个，失败{len(failed)}个"
+                 + (f"，未找到{len(missing)}个" if missing else "")
+                 + (f"，待确认{len(ambiguous)}个" if ambiguous else "")]
+        for name, values in (("✅ 已加入上传队列", succeeded), ("❌ 上传失败", failed), ("🔍 未找到", missing),
+                             ("❓ 匹配到多个媒体或只有近似匹配，请单独发送名称后选择", ambiguous)):
+            if not values:
+                continue
+            lines.append(f"\n{name}：")
+            lines.extend(values[:self.SUMMARY_LIMIT])
+            if len(values) > self.SUMMARY_LIMIT:
+                lines.append(f"……等{len(values)}个")
+        self.post_message(channel=event_data.get("channel"),
+                          title="📦 批量上传完成" if not failed and not ambiguous else "⚠️ 批量上传部分失败",
+                          text="\n".join(lines),
+                          userid=event_data.get("user"))
 
+    def _send_main_menu(self, event_data, items, episodes: Optional[EpisodeSelection] = None,
+                        approximate: bool = False, force: bool = False):
+        """
+        发送选择菜单，结果集按用户缓存，翻页、筛选和选择都不再查询数据库，
+        命令带季集范围时选中的剧集只上传范围内的文件，approximate表示结果只是近似匹配，force表示强制上传
+        """
+        items = [item if isinstance(item, MediaRecord) else MediaRecord.from_item(item) for item in items]
+        session = self._menu_cache.create(event_data.get("user"), items)
+        session.episodes = episodes
+        session.approximate = approximate
+        session.force = force
+        self.__render_menu(event_data, session)
+
+    def __render_menu(self, event_data: dict, session: MenuSession, edit: bool = False):
+        """
+        发送或更新选择菜单
+        """
+        text, buttons = session.render(callback_prefix=f"[PLUGIN]{self.__class__.__name__}|",
+                                       page_size=self.MENU_PAGE_SIZE)
+        kwargs = {}
+        if edit and event_data.get("original_message_id"):
+            # 在原消息上更新菜单
+            kwargs = {
+                "original_message_id": event_data.get("original_message_id"),
+                "original_chat_id": event_data.get("original_chat_id"),
+            }
         self.post_message(
-            channel=channel,
-            title="🔍 发现多个匹配项目",
-            text="请选择需要上传的项目：\n" + "\n".join(menu_text_lines),
-            userid=userid,
-            buttons=[menu_buttons]
+            channel=event_data.get("channel"),
+            title="🔍 未找到名称一致的媒体，是否是以下项目" if session.approximate else "🔍 发现多个匹配项目",
+            text=text,
+            userid=event_data.get("user"),
+            buttons=buttons,
+            **kwargs
         )
 
+    def __handle_menu(self, event_data: dict, data: str):
+        """
+        处理选择菜单的回调：menu:会话ID:动作[:参数]
+        """
+        parts = data.split(":")
+        sid, action = parts[1], parts[2] if len(parts) > 2 else ""
+        arg = parts[3] if len(parts) > 3 else ""
+        userid = event_data.get("user")
+        session = self._menu_cache.get(userid, sid)
+        if not session:
+            self.post_message(channel=event_data.get("channel"),
+                              title="⌛ 菜单已过期",
+                              text="请重新发送上传命令搜索媒体",
+                              userid=userid)
+            return
+        if action == "s" and arg.isdigit() and int(arg) < len(session.items):
+            session.selected ^= {int(arg)}
+        elif action == "p" and arg.isdigit():
+            session.page = int(arg)
+        elif action == "t":
+            session.item_type, session.page = arg or None, 0
+        elif action == "y":
+            session.year, session.page = arg or None, 0
+        elif action == "x":
+            self._menu_cache.discard(userid)
+            self.post_message(channel=event_data.get("channel"),
+                              title="已取消",
+                              text="已取消选择",
+                              userid=userid)
+            return
+        elif action == "c":
+            items = session.selected_items()
+            self._menu_cache.discard(userid)
+            logger.info(f"用户选择媒体：{'、'.join(item.title for item in items)}")
+            if len(items) == 1:
+                self.__upload_to_115(items[0], event_data, episodes=session.episodes, force=session.force)
+            elif items:
+                self.__submit_batch([(item.title, item, session.episodes) for item in items], [], event_data,
+                                    force=session.force)
+            return
+        self.__render_menu(event_data, session, edit=True)
+
     @eventmanager.register(EventType.MessageAction)
     def message_action(self, event: Event):
         """
@@ -156,10 +521,21 @@ class MediaTo115(_PluginBase):
         if plugin_id != self.__class__.__name__:
             return
 
+        self.__dispatch(self.__handle_action, event_data)
+
+    def __handle_action(self, event_data: dict):
+        """
+        处理菜单选择
+        """
         # 获取回调数据
         item_id = event_data.get("text", "")
         logger.info(f"回调数据：{item_id}")
-        
+        if item_id.startswith(f"{MENU_PREFIX}:"):
+            self.__handle_menu(event_data, item_id)
+            return
+
+        # 旧版菜单的回调直接携带item_id
+
         # 验证item_id
         if not item_id or not item_id.strip():
             logger.warning("回调数据为空")
@@ -169,7 +545,7 @@ class MediaTo115(_PluginBase):
                               userid=event_data.get("user"))
             return
             
-        media_items = self.__get_media_by_item_id(item_id=item_id)
+        media_items = self.__find_media(item_id=item_id)
         logger.debug(f"查询到{len(media_items) if media_items else 0}个媒体项目")
         if not media_items:
             logger.warning(f"未找到媒体：{item_id}")
@@ -184,11 +560,211 @@ class MediaTo115(_PluginBase):
         self.__upload_to_115(media_item, event_data)
 
 
+    @eventmanager.register(EventType.TransferComplete)
+    def transfer_complete(self, event: Event = None):
+        self.__on_transfer_event(event, True)
+
+    @eventmanager.register(EventType.TransferFailed)
+    def transfer_failed(self, event: Event = None):
+        self.__on_transfer_event(event, False)
+
+    def __on_transfer_event(self, event: Event, success: bool):
+        """
+        整理结果事件：按源文件路径找回本插件提交的整理，其他来源的整理忽略。
+        回报结果、清理超时的整理都可能结束任务并发送通知、更新登记表，全部交给结果处理线程，不占用事件线程
+        """
+        if not self._enabled or not self._tracker or not event or not event.event_data:
+            return
+        fileitem = event.event_data.get("fileitem")
+        path = fileitem.get("path") if isinstance(fileitem, dict) else getattr(fileitem, "path", None)
+        transferinfo = event.event_data.get("transferinfo")
+        transfer = self._tracker.resolve(path, self.__event_storage(transferinfo)) if path else None
+        if transfer:
+            errmsg = None
+            if not success:
+                errmsg = getattr(transferinfo, "message", None) or "整理失败"
+            if not self._results or not self._results.submit(self.__complete_transfer, transfer, success, errmsg):
+                # 插件正在停止，未回报的单元在下次启动时重新上传
+                logger.warning(f"插件已停止，整理结果未处理：{path}")
+        if self._results:
+            self._results.submit(self.__expire_transfers)
+
+    @staticmethod
+    def __event_storage(transferinfo: Any) -> Optional[str]:
+        """
+        整理结果中的目标存储，同一文件同时上传到多个存储时据此区分，取不到时返回None
+        """
+        for name in ("target_item", "target_diritem"):
+            item = transferinfo.get(name) if isinstance(transferinfo, dict) else getattr(transferinfo, name, None)
+            storage = item.get("storage") if isinstance(item, dict) else getattr(item, "storage", None)
+            if storage:
+                return storage
+        return None
+
+    def __complete_transfer(self, transfer: InflightTransfer, success: bool, errmsg: Optional[str] = None):
+        """
+        记录整理结果并回报上传流水线
+        """
+        self._metrics.upload(title=transfer.title, path=transfer.path, size=transfer.size,
+                             seconds=time.time() - transfer.started, success=success)
+        if success:
+            self.__record_uploaded(transfer.path, transfer.target)
+        else:
+            self._metrics.fail("transfer")
+            logger.warning(f"文件整理失败：{transfer.path} - {errmsg}")
+        if self._pipeline:
+            # 同一文件的多个任务等待同一个整理结果
+            for job_id in transfer.job_ids:
+                self._pipeline.complete(job_id, transfer.path, success, errmsg)
+        self.__registry_call("touch")
+
+    def __registry_call(self, method: str, *args: Any):
+        """
+        更新跨进程登记表，登记表不可用时只记录日志
+        """
+        if not self._registry:
+            return None
+        try:
+            return getattr(self._registry, method)(*args)
+        except Exception as e:
+            logger.warning(f"上传任务登记表更新失败：{method} - {str(e)}")
+            return None
+
+    def __expire_transfers(self):
+        """
+        清理超时仍未收到结果事件的整理，按失败回报以释放并发名额
+        """
+        if not self._tracker:
+            return
+        for transfer in self._tracker.expired():
+            self.__complete_transfer(transfer, False, "等待整理结果超时")
+
     def get_state(self) -> bool:
         return self._enabled
 
     def get_api(self) -> List[Dict[str, Any]]:
-        pass
+        return [
+            {
+                "path": "/latency",
+                "endpoint": self.get_latency,
+                "methods": ["GET"],
+                "summary": "事件处理耗时",
+                "description": "查询事件回调占用时间、排队等待及处理耗时的直方图"
+            },
+            {
+                "path": "/metrics",
+                "endpoint": self.get_metrics,
+                "methods": ["GET"],
+                "summary": "上传运行指标",
+                "description": "查询各阶段耗时、传输速率、队列深度及失败计数"
+            },
+            {
+                "path": "/sync",
+                "endpoint": self.sync_now,
+                "methods": ["GET"],
+                "summary": "立即同步媒体库",
+                "description": "后台执行一次媒体库增量同步，full=true时忽略目录修改时间全量检查"
+            },
+            {
+                "path": "/jobs",
+                "endpoint": self.get_jobs,
+                "methods": ["GET"],
+                "summary": "上传任务记录",
+                "description": "查询进行中的上传任务数及最近结束的任务记录，含耗时和平均速率"
+            }
+        ]
+
+    def get_jobs(self) -> Dict[str, Any]:
+        """
+        上传任务记录
+        """
+        records = self._pipeline.records() if self._pipeline else []
+        for record in records:
+            record["seconds"] = round(record["finished"] - record["created"], 3) if record["finished"] else None
+            record["rate"] = self.__job_rate(record["bytes"], record["started"], record["finished"])
+        return {
+            "in_flight": len(self._tracker) if self._tracker else 0,
+            "records": records,
+        }
+
+    @staticmethod
+    def __job_rate(size: int, started: Optional[float], finished: Optional[float]) -> Optional[float]:
+        """
+        任务平均上传速率(字节/秒)
+        """
+        if not size or not started or not finished or finished <= started:
+            return None
+        return round(size / (finished - started), 1)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        上传运行指标
+        """
+        metrics = self._metrics.snapshot() if self._metrics else {}
+        metrics["queue"] = {
+            "events": self._dispatcher.depth if self._dispatcher else 0,
+            "events_rejected": self._dispatcher.rejected if self._dispatcher else 0,
+            "results": self._results.depth if self._results else 0,
+            **(self._pipeline.stats() if self._pipeline else {}),
+        }
+        metrics["sync"] = {
+            "last": self._last_sync,
+            "watching": bool(self._sync_watcher),
+            "journal_files": {target: self._journal.count(target) for target in self._target_storages}
+            if self._journal else {},
+        }
+        if self._registry:
+            try:
+                metrics["dedup"] = self._registry.stats()
+            except Exception as e:
+                logger.warning(f"上传任务登记表读取失败：{str(e)}")
+        return metrics
+
+    def sync_now(self, full: bool = False) -> Dict[str, Any]:
+        """
+        后台执行一次媒体库同步
+        """
+        if not self._enabled or not self._sync_lock:
+            return {"success": False, "message": "插件未启用"}
+        if self._sync_lock.locked():
+            return {"success": False, "message": "媒体库同步正在进行中"}
+        threading.Thread(target=self.sync_library, kwargs={"full": full}, daemon=True).start()
+        return {"success": True, "message": "媒体库同步已开始"}
+
+    def get_latency(self) -> Dict[str, Any]:
+        """
+        事件处理耗时统计
+        """
+        return {
+            "hold": self._hold_histogram.snapshot() if self._hold_histogram else None,
+            "dispatcher": self._dispatcher.stats() if self._dispatcher else None,
+            "results": self._results.stats() if self._results else None,
+        }
+
+    def get_service(self) -> List[Dict[str, Any]]:
+        """
+        注册插件公共服务
+        """
+        if not self._enabled:
+            return []
+        services = [
+            {
+                "id": "MediaTo115IndexRefresh",
+                "name": "媒体标题索引刷新、整理超时清理及上传登记心跳",
+                "trigger": "interval",
+                "func": self.run_maintenance,
+                "kwargs": {"minutes": 10}
+            }
+        ]
+        if self._sync_enabled:
+            services.append({
+                "id": "MediaTo115LibrarySync",
+                "name": "媒体库增量同步",
+                "trigger": "interval",
+                "func": self.sync_library,
+                "kwargs": {"minutes": self._sync_interval}
+            })
+        return services
 
     def get_form(self) -> Tuple[Optional[List[dict]], Dict[str, Any]]:
         """
@@ -227,19 +803,47 @@ class MediaTo115(_PluginBase):
                                                     },
                                                     {
                                                         'component': 'div',
-                                                        'text': '2. 在聊天界面使用命令：/mediato115 电影名 或 /mediato115 剧集名'
+                                                        'text': '2. 在聊天界面使用命令：/mediato115 电影名 或 /mediato115 剧集名，'
+                                                                '剧集名后可加季集范围只上传部分剧集，如 /mediato115 剧集名 S02 或 S01E05-E10'
                                                     },
                                                     {
                                                         'component': 'div',
-                                                        'text': '3. 系统会自动从媒体库中搜索匹配的媒体文件并上传到115网盘'
+                                                        'text': '3. 系统会自动从媒体库中搜索匹配的媒体文件并上传到115网盘，'
+                                                                '支持原始标题、拼音及首字母、多个关键词和少量错字'
                                                     },
                                                     {
                                                         'component': 'div',
-                                                        'text': '4. 如果找到多个匹配项，会显示选择菜单供您选择'
+                                                        'text': '4. 如果找到多个匹配项，会显示选择菜单，可翻页、按类型和年份筛选并多选后上传'
                                                     },
                                                     {
                                                         'component': 'div',
                                                         'text': '5. 只有位于配置路径下的文件才能被上传'
+                                                    },
+                                                    {
+                                                        'component': 'div',
+                                                        'text': '6. 批量上传：多个名称每行一个，或用 /mediato115 --batch 电影A;电影B；'
+                                                                '也可用 /mediato115 @文件路径 从允许目录下的文本文件读取（每行一个名称）。'
+                                                                '名称中的逗号视为标题的一部分，匹配到多个媒体或只有近似匹配的名称不会自动上传'
+                                                    },
+                                                    {
+                                                        'component': 'div',
+                                                        'text': '7. 上传按文件逐个进行并记录进度，中断或部分失败后重新执行命令只会上传未完成的文件；'
+                                                                '内容已上传过的文件会跳过，网盘上的文件被删除后可用 /mediato115 --force 名称 重新上传'
+                                                    },
+                                                    {
+                                                        'component': 'div',
+                                                        'text': '8. 开启定时同步后，会按间隔检查允许目录下新增或变化的媒体文件并自动上传，'
+                                                                '已上传的文件记录在同步日志中，不会重复上传'
+                                                    },
+                                                    {
+                                                        'component': 'div',
+                                                        'text': '9. 配置多个上传目标存储时，同一媒体只扫描一次，同时上传到各个存储，'
+                                                                '各存储的进度和失败互不影响'
+                                                    },
+                                                    {
+                                                        'component': 'div',
+                                                        'text': '10. 多个MoviePilot进程共用数据目录时，相同的上传请求会并入正在进行的任务，'
+                                                                '不会重复上传，节省的文件数和大小可在运行指标中查看'
                                                     }
                                                 ]
                                             }
@@ -314,6 +918,135 @@ class MediaTo115(_PluginBase):
                                         }
                                     }
                                 ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'batch_workers',
+                                            'label': '批量上传并发数',
+                                            'type': 'number',
+                                            'placeholder': '4'
+                                        }
+                                    }
+                                ]
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VRow',
+                        'content': [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'max_concurrency',
+                                            'label': '同时上传文件数',
+                                            'type': 'number',
+                                            'placeholder': '2',
+                                            'hint': '所有上传任务共享的并发上限，单个媒体的上传优先于批量上传',
+                                            'persistent-hint': True
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextarea',
+                                        'props': {
+                                            'model': 'bandwidth_profiles',
+                                            'label': '带宽限制时段',
+                                            'rows': 3,
+                                            'placeholder': '每行一个时段，格式：开始-结束 限速MB/s，0为不限速\n'
+                                                           '08:00-23:00 10\n23:00-08:00 0',
+                                            'hint': '未配置的时段不限速',
+                                            'persistent-hint': True
+                                        }
+                                    }
+                                ]
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VRow',
+                        'content': [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'sync_enabled',
+                                            'label': '定时同步媒体库',
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'sync_interval',
+                                            'label': '同步间隔(分钟)',
+                                            'type': 'number',
+                                            'placeholder': '60',
+                                            'hint': '只上传新增或变化的文件，支持目录监控时只检查发生变化的目录',
+                                            'persistent-hint': True
+                                        }
+                                    }
+                                ]
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VRow',
+                        'content': [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'target_storages',
+                                            'label': '上传目标存储',
+                                            'placeholder': 'u115',
+                                            'hint': '多个存储用逗号分隔，每个存储都需要配置手动整理的目标目录；'
+                                                    '文件只扫描一次并同时上传到各个存储，进度和失败分别记录',
+                                            'persistent-hint': True
+                                        }
+                                    }
+                                ]
                             }
                         ]
                     },{
@@ -343,23 +1076,436 @@ class MediaTo115(_PluginBase):
         ], {
             "enabled": False,
             "media_paths": "",
+            "batch_workers": 4,
+            "max_concurrency": 2,
+            "bandwidth_profiles": "",
+            "sync_enabled": False,
+            "sync_interval": 60,
+            "target_storages": self.TARGET_STORAGE,
         }
 
     def get_page(self) -> Optional[List[dict]]:
-        pass
+        """
+        拼装插件详情页面：运行指标、最近的耗时和传输速率图表、最近上传记录
+        """
+        metrics = self.get_metrics()
+        # 各阶段都还没有耗时记录，也没有上传记录
+        if not any(phase.get("count") for phase in (metrics.get("phases") or {}).values()) \
+                and not metrics.get("recent_uploads"):
+            return [
+                {
+                    'component': 'div',
+                    'text': '暂无数据',
+                    'props': {
+                        'class': 'text-center',
+                    }
+                }
+            ]
+        uploads = metrics.get("recent_uploads") or []
+        # 失败的上传没有有效的速率，不计入平均值和速率图表
+        rates = [upload["rate"] for upload in uploads if upload["success"] and upload["rate"]]
+        queue = metrics.get("queue") or {}
+        failures = metrics.get("failures") or {}
+        cards = [
+            ("累计上传", self.__format_size(metrics.get("bytes_total") or 0)),
+            ("近期平均速率", f"{self.__format_size(sum(rates) / len(rates))}/s" if rates else "-"),
+            ("待上传文件", str(queue.get("pending_units", 0))),
+            ("失败次数", str(sum(failures.values()))),
+        ]
+        phase_names = {"lookup": "数据库查询", "validate": "路径校验", "submit": "提交任务"}
+        phase_series = []
+        for phase, name in phase_names.items():
+            samples = self._metrics.recent_samples(phase)
+            phase_series.append({'name': name, 'data': [sample[1] for sample in samples]})
+
+        return [
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 6,
+                            'md': 3
+                        },
+                        'content': [
+                            {
+                                'component': 'VCard',
+                                'props': {
+                                    'variant': 'tonal'
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VCardText',
+                                        'content': [
+                                            {
+                                                'component': 'div',
+                                                'props': {
+                                                    'class': 'text-caption'
+                                                },
+                                                'text': label
+                                            },
+                                            {
+                                                'component': 'div',
+                                                'props': {
+                                                    'class': 'text-h6'
+                                                },
+                                                'text': value
+                                            }
+                                        ]
+                                    }
+                                ]
+                            }
+                        ]
+                    } for label, value in cards
+                ]
+            },
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12,
+                            'md': 6
+                        },
+                        'content': [
+                            {
+                                'component': 'VApexChart',
+                                'props': {
+                                    'height': 300,
+                                    'options': {
+                                        'chart': {
+                                            'type': 'line'
+                                        },
+                                        'title': {
+                                            'text': '最近上传速率 (MB/s)'
+                                        },
+                                        'stroke': {
+                                            'curve': 'smooth'
+                                        }
+                                    },
+                                    'series': [
+                                        {
+                                            'name': '速率',
+                                            'data': [round(rate / 1024 / 1024, 2) for rate in rates]
+                                        }
+                                    ]
+                                }
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12,
+                            'md': 6
+                        },
+                        'content': [
+                            {
+                                'component': 'VApexChart',
+                                'props': {
+                                    'height': 300,
+                                    'options': {
+                                        'chart': {
+                                            'type': 'line'
+                                        },
+                                        'title': {
+                                            'text': '最近处理耗时 (ms)'
+                                        },
+                                        'stroke': {
+                                            'curve': 'smooth'
+                                        }
+                                    },
+                                    'series': phase_series
+                                }
+                            }
+                        ]
+                    }
+                ]
+            },
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12
+                        },
+                        'content': [
+                            {
+                                'component': 'VTable',
+                                'props': {
+                                    'hover': True
+                                },
+                                'content': [
+                                    {
+                                        'component': 'thead',
+                                        'content': [
+                                            {
+                                                'component': 'tr',
+                                                'content': [
+                                                    {
+                                                        'component': 'th',
+                                                        'text': text
+                                                    } for text in ('时间', '媒体', '文件', '大小', '耗时', '速率', '结果')
+                                                ]
+                                            }
+                                        ]
+                                    },
+                                    {
+                                        'component': 'tbody',
+                                        'content': [
+                                            {
+                                                'component': 'tr',
+                                                'content': [
+                                                    {
+                                                        'component': 'td',
+                                                        'text': text
+                                                    } for text in (
+                                                        time.strftime("%m-%d %H:%M:%S",
+                                                                      time.localtime(upload["time"])),
+                                                        upload["title"],
+                                                        upload["file"],
+                                                        self.__format_size(upload["bytes"]),
+                                                        f'{upload["seconds"]:.1f}s',
+                                                        f'{self.__format_size(upload["rate"])}/s',
+                                                        '成功' if upload["success"] else '失败'
+                                                    )
+                                                ]
+                                            } for upload in reversed(uploads)
+                                        ]
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            }
+        ]
+
+    @staticmethod
+    def __format_size(size: float) -> str:
+        """
+        格式化字节数
+        """
+        for unit in ("B", "KB", "MB", "GB"):
+            if size < 1024:
+                return f"{size:.1f}{unit}"
+            size /= 1024
+        return f"{size:.1f}TB"
 
     def stop_service(self):
         """
         退出插件
         """
-        pass
+        self.__save_snapshot()
+        if self._dispatcher:
+            self._dispatcher.stop()
+            self._dispatcher = None
+        if self._results:
+            self._results.stop()
+            self._results = None
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._pipeline:
+            self._pipeline.stop()
+            self._pipeline = None
+        if self._hash_cache:
+            self._hash_cache.close()
+            self._hash_cache = None
+        if self._sync_watcher:
+            self._sync_watcher.stop()
+            self._sync_watcher = None
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+        if self._registry:
+            # 未完成的任务留给下次启动的进程认领
+            self._registry.release_all()
+            self._registry.close()
+            self._registry = None
+
+    def run_maintenance(self):
+        """
+        定时维护：清理超时仍未收到结果事件的整理，刷新上传登记的心跳，再刷新标题索引。
+        事件丢失后可能不再有新的整理或事件触发清理，由定时服务兜底释放并发名额；
+        单个文件上传较久时没有新的整理触发心跳刷新，其他主机会误判登记已失效；
+        上传检查点按间隔写入，单元状态长时间没有变化时由定时服务写入最后的变化
+        """
+        self.__expire_transfers()
+        self.__registry_call("touch")
+        if self._pipeline:
+            self._pipeline.flush()
+        self.refresh_index()
+
+    def refresh_index(self):
+        """
+        刷新标题索引：媒体库有变化时先增量更新，条目数对不上再全量重建
+        """
+        index = self._title_index
+        if index is None or not self._index_lock:
+            return
+        # 已有刷新任务在执行
+        if not self._index_lock.acquire(blocking=False):
+            return
+        try:
+            version = self.__get_media_version()
+            if index.ready and index.version == version:
+                return
+            start = time.perf_counter()
+            if index.ready and index.version:
+                records = self.__get_media_records(since=index.version[1])
+                for record in records:
+                    index.upsert(record)
+                if len(index) == version[0]:
+                    index.version = version
+                    logger.info(f"标题索引增量更新完成：{len(records)}个条目，"
+                                f"耗时{time.perf_counter() - start:.2f}秒")
+            if index.version != version:
+                index.build(self.__get_media_records(), version=version)
+                logger.info(f"标题索引构建完成：{len(index)}个条目，耗时{time.perf_counter() - start:.2f}秒")
+            self.__save_snapshot()
+        except Exception as e:
+            logger.error(f"标题索引刷新失败：{str(e)}")
+        finally:
+            self._index_lock.release()
+
+    def __warm_start(self):
+        """
+        插件加载后在后台读取预热快照，再按媒体库版本刷新标题索引
+        """
+        try:
+            self.__load_snapshot()
+        except Exception as e:
+            logger.warning(f"预热快照读取失败：{str(e)}")
+        finally:
+            self._snapshot_loaded.set()
+        self.refresh_index()
+
+    def __load_snapshot(self):
+        """
+        读取预热快照恢复标题索引、文件状态和目录扫描结果。
+        标题索引由refresh_index在快照版本的基础上增量更新；媒体库版本已变化时文件状态和扫描结果整体作废
+        """
+        snapshot = self._snapshot.load() if self._snapshot else None
+        if not snapshot:
+            return
+        start = time.perf_counter()
+        version = snapshot.get("version")
+        index = self._title_index
+        if index is not None and not index.ready:
+            index.build((MediaRecord(*row) for row in snapshot.get("records") or ()), version=version)
+        current = version == self.__get_media_version()
+        if current:
+            self._stat_cache.load(snapshot.get("stats") or ())
+            self._scan_cache.load(snapshot.get("scans") or {})
+        logger.info(f"预热快照读取完成：{len(snapshot.get('records') or ())}个条目"
+                    + ("" if current else "，媒体库已更新，文件状态和扫描结果已作废")
+                    + f"，耗时{time.perf_counter() - start:.2f}秒")
+
+    def __save_snapshot(self):
+        """
+        写入预热快照，标题索引未就绪时不写入，避免覆盖已有的快照
+        """
+        index = self._title_index
+        if not self._snapshot or index is None or not index.ready:
+            return
+        try:
+            records, version = index.dump()
+            self._snapshot.save({
+                "version": version,
+                "records": records,
+                "stats": self._stat_cache.dump() if self._stat_cache else [],
+                "scans": self._scan_cache.dump() if self._scan_cache else {},
+            })
+        except Exception as e:
+            logger.warning(f"预热快照写入失败：{str(e)}")
+
+    def __index_ready(self) -> bool:
+        """
+        标题索引是否可用，插件刚加载时等待预热快照读取完成
+        """
+        index = self._title_index
+        if index is None:
+            return False
+        if not index.ready and self._snapshot_loaded is not None:
+            self._snapshot_loaded.wait(self.SNAPSHOT_WAIT)
+        return index.ready
+
+    def __search_media(self, title: str) -> List[Tuple[int, Any]]:
+        """
+        根据标题查询媒体，返回 [(匹配类别, 媒体)]，优先使用内存索引，索引未就绪时回退到数据库
+        """
+        with self._metrics.timer("lookup"):
+            if self.__index_ready():
+                return self._title_index.search_ranked(title, limit=self.SEARCH_LIMIT)
+            return rank_records(self.__get_media_by_title(title=title) or [], title)[:self.SEARCH_LIMIT]
+
+    def __resolve_titles(self, titles: List[str]) -> Dict[str, List[Tuple[int, Any]]]:
+        """
+        一次性解析多个媒体名称，返回 名称 -> 按匹配质量排序的 [(匹配类别, 媒体)]
+        """
+        with self._metrics.timer("lookup"):
+            if self.__index_ready():
+                return {title: self._title_index.search_ranked(title, limit=self.SEARCH_LIMIT) for title in titles}
+            items = self.__get_media_by_titles(titles=titles) or []
+            return {title: rank_records(items, title)[:self.SEARCH_LIMIT] for title in titles}
+
+    def __find_media(self, item_id: str) -> List[Any]:
+        """
+        根据item_id查询媒体，优先使用内存索引
+        """
+        with self._metrics.timer("lookup"):
+            if self.__index_ready():
+                record = self._title_index.get(item_id)
+                if record:
+                    return [record]
+            return self.__get_media_by_item_id(item_id=item_id)
+
+    @db_query
+    def __get_media_version(self, db: Optional[Session]) -> Tuple[int, Optional[str]]:
+        """
+        查询媒体服务器条目数和最后更新时间，作为索引版本
+        """
+        count, last_modified = db.query(func.count(MediaServerItem.id),
+                                        func.max(MediaServerItem.lst_mod_date)).one()
+        return count or 0, last_modified
+
+    @db_query
+    def __get_media_records(self, db: Optional[Session], since: Optional[str] = None) -> List[MediaRecord]:
+        """
+        查询构建索引所需的媒体服务器条目字段，指定since时只查询之后更新的条目
+        """
+        query = db.query(MediaServerItem.item_id,
+                         MediaServerItem.title,
+                         MediaServerItem.original_title,
+                         MediaServerItem.year,
+                         MediaServerItem.item_type,
+                         MediaServerItem.path,
+                         MediaServerItem.lst_mod_date)
+        if since:
+            query = query.filter(MediaServerItem.lst_mod_date > since)
+        return [MediaRecord.from_item(row) for row in query.all()]
 
     @db_query
     def __get_media_by_title(self, db: Optional[Session], title: str) -> list[type[MediaServerItem]]:
         """
-        根据标题查询媒体服务器媒体条目
+        根据标题或原始标题查询媒体服务器媒体条目
         """
-        return db.query(MediaServerItem).filter(MediaServerItem.title.ilike(f"%{title}%")).all()
+        return db.query(MediaServerItem).filter(or_(MediaServerItem.title.ilike(f"%{title}%"),
+                                                    MediaServerItem.original_title.ilike(f"%{title}%"))).all()
+
+    @db_query
+    def __get_media_by_titles(self, db: Optional[Session], titles: List[str]) -> list[type[MediaServerItem]]:
+        """
+        一次查询匹配多个标题的媒体服务器媒体条目，同时匹配原始标题
+        """
+        return db.query(MediaServerItem).filter(
+            or_(*[column.ilike(f"%{title}%") for title in titles
+                  for column in (MediaServerItem.title, MediaServerItem.original_title)])
+        ).all()
 
     @db_query
     def __get_media_by_item_id(self, db: Optional[Session], item_id: str) -> list[type[MediaServerItem]]:
@@ -370,50 +1516,122 @@ class MediaTo115(_PluginBase):
         return db.query(MediaServerItem).filter(MediaServerItem.item_id == item_id).all()
 
 
-    def __upload_to_115(self, media_item, event_data):
+    def __media_roots(self) -> List[str]:
+        """
+        配置的允许目录
+        """
+        return [p.strip() for p in self._media_paths.split("\n") if p.strip()]
+
+    def sync_library(self, full: bool = False):
+        """
+        媒体库增量同步：对比同步日志，上传允许目录下新增或变化的媒体文件。
+        目录监控可用且已完成一次目录遍历时只检查变化的目录，否则按目录修改时间剪枝遍历
+        """
+        if not self._enabled or not self._pipeline or not self._journal or not self._sync_lock:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            logger.info("媒体库同步正在进行中，跳过本次同步")
+            return
+        try:
+            # 先取出变化的目录，遍历期间发生的变化留给下次同步
+            dirty = self._sync_watcher.drain() if self._sync_watcher else None
+            results: Dict[str, SyncResult] = {}
+            # 各存储的同步日志相互独立，分别对比
+            for target in self._target_storages:
+                library_sync = LibrarySync(journal=self._journal,
+                                           roots=self.__media_roots(),
+                                           media_exts=settings.RMT_MEDIAEXT,
+                                           target=target,
+                                           settle=self.SYNC_SETTLE)
+                if full or dirty is None or not self._sync_baseline:
+                    result = SyncResult("full" if full else "walk")
+                    changes = library_sync.walk(result, full=full)
+                else:
+                    result = SyncResult("watch")
+                    changes = library_sync.changed(dirty, result)
+                for directory, units in changes:
+                    job = UploadJob(job_id=UploadJob.make_id(directory, target, scope="sync"),
+                                    title=os.path.basename(directory),
+                                    root=directory,
+                                    target=target,
+                                    units=units,
+                                    notify=False,
+                                    priority=Priority.SYNC)
+                    # 与上传命令共用去重登记，其他进程正在上传的文件不再提交
+                    owner, remote = self.__claim_job(job)
+                    if remote:
+                        duplicates = [unit for unit in job.units if unit.path in remote]
+                        self.__record_dedup(job, owner, duplicates)
+                        job.units = [unit for unit in job.units if unit.path not in remote]
+                        result.files_queued -= len(duplicates)
+                        result.bytes_queued -= sum(unit.size for unit in duplicates)
+                    if job.units:
+                        self._pipeline.submit(job)
+                results[target] = result
+                logger.info(f"媒体库同步完成（{target}，{result.mode}）：列出{result.dirs_scanned}个目录，"
+                            f"跳过{result.dirs_pruned}个未变化的目录，新增或变化{result.files_queued}个文件，"
+                            f"耗时{result.seconds}秒")
+            if dirty is not None:
+                self._sync_baseline = True
+            self._last_sync = {target: result.to_dict() for target, result in results.items()}
+            queued = [f"{target} {result.files_queued}个，{self.__format_size(result.bytes_queued)}"
+                      for target, result in results.items() if result.files_queued]
+            if queued:
+                self.post_message(title="🔄 媒体库同步",
+                                  text="发现新增或变化的媒体文件，已加入上传队列\n" + "\n".join(queued))
+        except Exception as e:
+            logger.error(f"媒体库同步失败：{str(e)}")
+        finally:
+            self._sync_lock.release()
+
+    def __is_allowed_path(self, path: str) -> bool:
+        """
+        检查路径是否在允许的目录下
+        """
+        return bool(self._path_matcher and self._path_matcher.match(path))
+
+    def __upload_to_115(self, media_item, event_data, notify: bool = True,
+                        priority: int = Priority.INTERACTIVE,
+                        episodes: Optional[EpisodeSelection] = None, force: bool = False) -> Tuple[bool, str]:
+        """
+        提交媒体上传任务，notify为False时不单独发送通知，由调用方汇总，
+        剧集指定季集范围时只上传范围内的文件，force为True时不检查内容是否已上传过
+        """
         path = str(media_item.path)
         title = media_item.title
         item_type = media_item.item_type
         logger.info(f"开始处理媒体上传：{title} ({item_type}) -> {path}")
-        
+
+        def _fail(reason: str, msg_title: str, msg_text: str) -> Tuple[bool, str]:
+            self._metrics.fail(reason)
+            if notify:
+                self.post_message(channel=event_data.get("channel"),
+                                  title=msg_title,
+                                  text=msg_text,
+                                  userid=event_data.get("user"))
+            return False, msg_text
+
         # 验证媒体项目的基本信息
         if not path or not title or not item_type:
             logger.error(f"媒体信息不完整：path={path}, title={title}, item_type={item_type}")
-            self.post_message(channel=event_data.get("channel"),
-                              title="❌ 数据错误",
-                              text="媒体信息不完整，无法上传",
-                              userid=event_data.get("user"))
-            return
+            return _fail("invalid_item", "❌ 数据错误", "媒体信息不完整，无法上传")
 
-        # 获取允许的目录列表，去除空白字符和空行
-        allowed_paths = [p.strip() for p in self._media_paths.split("\n") if p.strip()]
-        
-        # 验证路径安全性
-        if not allowed_paths:
-            logger.error("没有配置允许的路径")
-            self.post_message(channel=event_data.get("channel"),
-                              title="❌ 配置错误",
-                              text="没有配置允许上传的路径",
-                              userid=event_data.get("user"))
-            return
+        with self._metrics.timer("validate"):
+            # 验证路径安全性
+            if not self._path_matcher:
+                logger.error("没有配置允许的路径")
+                return _fail("no_allowed_paths", "❌ 配置错误", "没有配置允许上传的路径")
 
-        # 检查文件是否在允许的目录下
-        if not any(path.startswith(allowed_path) for allowed_path in allowed_paths):
-            logger.warning(f"文件不在允许的目录下：{path}")
-            self.post_message(channel=event_data.get("channel"),
-                              title="❌ 路径限制",
-                              text=f"文件路径不在允许的目录范围内\n文件：{path}\n请检查插件配置中的允许路径设置",
-                              userid=event_data.get("user"))
-            return
+            # 检查文件是否在允许的目录下
+            if not self.__is_allowed_path(path):
+                logger.warning(f"文件不在允许的目录下：{path}")
+                return _fail("path_denied", "❌ 路径限制",
+                             f"文件路径不在允许的目录范围内\n文件：{path}\n请检查插件配置中的允许路径设置")
 
-        # 检查文件是否存在
-        if not os.path.exists(path):
-            logger.warning(f"文件不存在：{path}")
-            self.post_message(channel=event_data.get("channel"),
-                              title="❌ 文件不存在",
-                              text=f"本地文件不存在或已被删除\n文件：{path}",
-                              userid=event_data.get("user"))
-            return
+            # 检查文件是否存在
+            if not self._stat_cache.exists(path):
+                logger.warning(f"文件不存在：{path}")
+                return _fail("path_missing", "❌ 文件不存在", f"本地文件不存在或已被删除\n文件：{path}")
 
         file_root = None
         # 获取根目录
@@ -421,35 +1639,292 @@ class MediaTo115(_PluginBase):
             file_root = os.path.dirname(path)
         elif item_type == "电视剧":
             file_root = path
+        # 季集范围只对剧集有效，范围不同的上传分别记录进度
+        if item_type != "电视剧":
+            episodes = None
+        if episodes:
+            title = f"{title} {episodes.label}"
 
-        # 拼一个ManualTransferItem
-        transfer_item = ManualTransferItem(
-            fileitem=FileItem(
-                storage="local",
-                type="dir",
-                path=file_root,
-                name=title,
-                basename=title
-            ),
-            target_storage="u115",
-        )
+        # 目录只扫描一次，按文件拆分为各目标存储的上传单元，已有未完成的检查点时只续传未完成的部分
+        with self._metrics.timer("submit"):
+            include = None
+            if episodes:
+                files = self._scan_cache.scan(file_root, settings.RMT_MEDIAEXT,
+                                              settings.RMT_SUBEXT + settings.RMT_AUDIOEXT, self._stat_cache)
+                index = EpisodeIndex(path for path, _, _ in files)
+                include = index.select(episodes)
+                if not include:
+                    logger.warning(f"没有{episodes.label}范围内的剧集文件：{file_root}")
+                    return _fail("no_episodes", "❌ 上传失败",
+                                 f"「{media_item.title}」中没有{episodes.label}范围内的剧集文件\n"
+                                 + (f"现有剧集：{index.describe()}" if len(index) else "未能识别剧集文件的季集编号"))
+            units, summary = collect_units(file_root, settings.RMT_MEDIAEXT,
+                                           settings.RMT_SUBEXT + settings.RMT_AUDIOEXT,
+                                           self._stat_cache, self._scan_cache, include)
+            if not units:
+                logger.warning(f"未找到可上传的媒体文件：{file_root}")
+                return _fail("no_media_files", "❌ 上传失败", f"目录下没有可上传的媒体文件\n目录：{file_root}")
 
-        state, errormsg = TransferChain().manual_transfer(
-            fileitem=transfer_item.fileitem,
-            target_storage=transfer_item.target_storage,
-            target_path=transfer_item.target_path,
-            background=True
-        )
-        if not state:
-            logger.error(f"转移失败：{errormsg}")
+            jobs = [
+                UploadJob(job_id=UploadJob.make_id(file_root, target, scope=episodes.label if episodes else ""),
+                          title=title,
+                          root=file_root,
+                          target=target,
+                          units=[UploadUnit(path=unit.path, size=unit.size) for unit in units],
+                          channel=event_data.get("channel"),
+                          userid=event_data.get("user"),
+                          notify=notify,
+                          priority=priority,
+                          force=force)
+                for target in self._target_storages
+            ]
+            # 同一文件的上传正在进行时并入已有任务，不区分季集范围和媒体库同步：其他进程正在上传的文件不再提交，
+            # 请求方登记为该进程的订阅者；本进程已排队的文件合并后共用同一次传输
+            local, saved = [], []
+            for job in jobs:
+                owner, remote = self.__claim_job(job, (event_data.get("channel"), event_data.get("user"))
+                                                 if notify else None)
+                busy = self._pipeline.busy_paths(job.target)
+                duplicates = [unit for unit in job.units if unit.path in busy and unit.path not in remote]
+                if duplicates:
+                    saved.append(self.__record_dedup(job, None, duplicates))
+                if remote:
+                    saved.append(self.__record_dedup(job, owner, [unit for unit in job.units if unit.path in remote]))
+                    job.units = [unit for unit in job.units if unit.path not in remote]
+                if job.units:
+                    local.append(job)
+            jobs = self._pipeline.submit_many(local) if local else []
+        saved_text = "\n".join(saved)
+        if not jobs:
+            logger.info(f"上传任务已由其他进程执行，已合并：{title}")
+            if notify:
+                self.post_message(channel=event_data.get("channel"),
+                                  title="♻️ 上传任务已在进行",
+                                  text=f"媒体「{title}」正在上传中，本次请求已合并到已有任务，上传结束后通知\n"
+                                       f"{saved_text}",
+                                  userid=event_data.get("user"))
+            return True, ""
+        # 后台预先计算待上传文件的哈希，各存储共用
+        self._hash_cache.prefetch({unit.path for job in jobs for unit in job.units
+                                   if unit.state == UnitState.PENDING})
+        eta = self.__estimate_eta()
+        # 合并到已有任务时其中正在上传的单元同样尚未完成
+        remaining = (UnitState.PENDING, UnitState.RUNNING)
+        pending = [f"{job.target + ' ' if len(self._target_storages) > 1 else ''}{job.count(*remaining)}个，"
+                   f"{self.__format_size(job.size(*remaining))}" for job in jobs]
+        logger.info(f"上传任务创建成功：{title}，共{summary.files}个文件，{self.__format_size(summary.bytes)}，"
+                    f"待上传：{'；'.join(pending)}")
+        # 没有需要上传的文件时任务在提交时已结束，已发送完成通知
+        if notify and not all(job.finished_at for job in jobs):
             self.post_message(channel=event_data.get("channel"),
-                              title="❌ 上传失败",
-                              text=f"文件上传到115网盘失败\n原因：{errormsg}",
+                              title="✅ 上传任务已创建",
+                              text=f"媒体「{title}」已加入上传队列\n"
+                                   f"共{summary.media_files}个媒体文件"
+                                   + (f"、{summary.sidecar_files}个字幕/音轨" if summary.sidecar_files else "")
+                                   + f"，合计{self.__format_size(summary.bytes)}\n"
+                                   + (f"待上传{pending[0]}\n" if len(pending) == 1
+                                      else "待上传：\n" + "\n".join(pending) + "\n")
+                                   + (f"{saved_text}\n" if saved else "")
+                                   + f"预计耗时：{self.__format_duration(eta) if eta is not None else '未知'}",
                               userid=event_data.get("user"))
+        return True, ""
+
+    def __claim_job(self, job: UploadJob, subscriber: Optional[Tuple[Any, Any]] = None
+                    ) -> Tuple[Optional[str], Set[str]]:
+        """
+        在跨进程登记表中按去重键认领任务中未完成的文件，返回 (其他进程标识, 其中已由其他存活的进程上传的文件)，
+        指定subscriber时请求方登记为该进程的订阅者，登记表不可用时不影响上传
+        """
+        if not self._registry:
+            return None, set()
+        try:
+            return self._registry.claim(job.key, job.root, job.target, job.title,
+                                        [unit.path for unit in job.units
+                                         if unit.state in (UnitState.PENDING, UnitState.RUNNING)],
+                                        subscriber)
+        except Exception as e:
+            logger.warning(f"上传任务登记失败：{job.title} - {str(e)}")
+            return None, set()
+
+    def __claim_resumed(self, job: UploadJob) -> bool:
+        """
+        恢复未完成的任务前认领，其他进程正在上传的文件从任务中移除，全部由其他进程上传时不恢复
+        """
+        _, remote = self.__claim_job(job)
+        if remote:
+            job.units = [unit for unit in job.units if unit.path not in remote or unit.state in UnitState.FINAL]
+        return bool(job.count(UnitState.PENDING) or job.count(UnitState.RUNNING))
+
+    def __record_dedup(self, job: UploadJob, owner: Optional[str], units: List[UploadUnit]) -> str:
+        """
+        记录重复请求节省的上传，返回通知中的说明
+        """
+        size = sum(unit.size for unit in units)
+        if self._registry:
+            try:
+                self._registry.attach(job.job_id, job.target, job.title, owner or self._registry.owner,
+                                      len(units), size)
+            except Exception as e:
+                logger.warning(f"重复请求记录失败：{job.title} - {str(e)}")
+        logger.info(f"重复的上传请求已合并：{job.title}（{job.target}），{'其他进程' if owner else '本进程'}正在上传，"
+                    f"节省{len(units)}个文件，{self.__format_size(size)}")
+        target = f"{job.target} " if len(self._target_storages) > 1 else ""
+        return (f"{target}{'其他进程' if owner else ''}已在上传其中{len(units)}个文件，"
+                f"不会重复上传，节省{self.__format_size(size)}")
+
+    def __estimate_eta(self) -> Optional[float]:
+        """
+        按最近的上传速率、并发数和当前限速估算队列中全部待上传和正在上传文件的完成时间(秒)
+        """
+        if not self._pipeline:
+            return None
+        stats = self._pipeline.stats()
+        pending_bytes = stats["pending_bytes"] + stats["running_bytes"]
+        if not pending_bytes:
+            return 0
+        rate = self._metrics.throughput()
+        if rate:
+            rate *= self._max_concurrency
+        limit = self._bandwidth_profile.rate() if self._bandwidth_profile else 0
+        if limit:
+            rate = min(rate, limit) if rate else limit
+        return pending_bytes / rate if rate else None
+
+    @staticmethod
+    def __format_duration(seconds: float) -> str:
+        """
+        格式化时长
+        """
+        seconds = int(seconds)
+        if seconds < 60:
+            return "不到1分钟"
+        hours, minutes = divmod(seconds // 60, 60)
+        return f"约{hours}小时{minutes}分钟" if hours else f"约{minutes}分钟"
+
+    def __is_uploaded(self, job: UploadJob, unit: UploadUnit) -> bool:
+        """
+        文件内容已上传到目标存储时跳过传输
+        """
+        if not self._hash_cache:
+            return False
+        try:
+            if self._hash_cache.is_uploaded(unit.path, job.target):
+                logger.info(f"文件内容已上传过，跳过：{unit.path}")
+                self.__record_synced(unit.path, job.target)
+                return True
+        except Exception as e:
+            logger.warning(f"计算文件哈希失败：{unit.path} - {str(e)}")
+        return False
+
+    def __transfer_unit(self, job: UploadJob, unit: UploadUnit) -> Optional[Tuple[bool, str]]:
+        """
+        提交后台整理上传单个文件，同名字幕、音轨由整理流程一并处理，
+        提交成功时返回None，结果由整理完成或失败事件回报
+        """
+        self.__expire_transfers()
+        self.__registry_call("touch")
+        if job.force and self._hash_cache:
+            # 强制上传的内容之前记录的已上传不再可信，相同内容的其他文件也重新上传
+            try:
+                self._hash_cache.forget(unit.path, job.target)
+            except Exception as e:
+                logger.warning(f"移除已上传记录失败：{unit.path} - {str(e)}")
+        file_path = Path(unit.path)
+        # 先登记再提交，整理可能在提交返回前就已完成
+        transfer, attached = self._tracker.track(job_id=job.job_id, title=job.title, target=job.target,
+                                                 path=unit.path, size=unit.size)
+        if attached:
+            # 其他任务已在整理同一文件，等待同一个结果
+            logger.info(f"文件正在整理中，等待已提交的整理结果：{unit.path}")
+            return None
+        try:
+            state, errmsg = TransferChain().manual_transfer(
+                fileitem=FileItem(
+                    storage="local",
+                    type="file",
+                    path=unit.path,
+                    name=file_path.name,
+                    basename=file_path.stem,
+                    extension=file_path.suffix.lstrip("."),
+                    size=unit.size
+                ),
+                target_storage=job.target,
+                background=True
+            )
+        except Exception as e:
+            state, errmsg = False, str(e)
+        if state:
+            return None
+        # 提交失败不会产生结果事件，已被事件取走时以事件结果为准
+        transfer = self._tracker.resolve(unit.path, job.target)
+        if not transfer:
+            return None
+        self._metrics.upload(title=job.title, path=unit.path, size=unit.size,
+                             seconds=time.time() - transfer.started, success=False)
+        self._metrics.fail("transfer")
+        # 提交期间并入的其他任务同样失败
+        for job_id in transfer.job_ids:
+            if job_id != job.job_id:
+                self._pipeline.complete(job_id, unit.path, False, errmsg)
+        return False, errmsg
+
+    def __record_uploaded(self, path: str, target: str):
+        """
+        记录文件已上传：内容哈希写入缓存，文件写入同步日志
+        """
+        if self._hash_cache:
+            try:
+                self._hash_cache.mark_uploaded(path, target)
+            except Exception as e:
+                logger.warning(f"记录已上传文件哈希失败：{path} - {str(e)}")
+        self.__record_synced(path, target)
+
+    def __record_synced(self, path: str, target: str):
+        """
+        文件写入同步日志，远端不返回文件ID，以115秒传识别文件所用的内容SHA1作为远端标识
+        """
+        if not self._journal:
             return
-        
-        logger.info(f"转移任务创建成功：{title}")
-        self.post_message(channel=event_data.get("channel"),
-                          title="✅ 上传任务已创建",
-                          text=f"媒体「{title}」已加入上传队列\n请稍后查看上传进度",
-                          userid=event_data.get("user"))
+        try:
+            remote_id = self._hash_cache.get(path) if self._hash_cache else None
+            self._journal.record(path, target, remote_id=remote_id)
+        except Exception as e:
+            logger.warning(f"写入同步日志失败：{path} - {str(e)}")
+
+    def __on_job_finished(self, job: UploadJob):
+        """
+        上传任务结束通知，附带从提交命令到全部文件整理完成的耗时和平均上传速率
+        """
+        done, skipped, failed = job.count(UnitState.DONE), job.count(UnitState.SKIPPED), job.count(UnitState.FAILED)
+        elapsed = (job.finished_at or time.time()) - job.created
+        rate = self.__job_rate(job.size(UnitState.DONE), job.started, job.finished_at)
+        logger.info(f"上传任务结束：{job.title}，成功{done}个，跳过{skipped}个，失败{failed}个，"
+                    f"耗时{elapsed:.1f}秒")
+        # 同一目录在本进程已没有进行中的任务时移除登记，并通知并入本进程上传的其他进程的请求方
+        pipeline = self._pipeline
+        remote = []
+        if not pipeline or not pipeline.busy_paths(job.target, job.key):
+            remote = [[row["channel"], row["userid"]]
+                      for row in self.__registry_call("release", job.key) or []]
+        subscribers = job.subscribers + [subscriber for subscriber in remote if subscriber not in job.subscribers]
+        if not subscribers:
+            return
+        # 同时上传到多个存储时注明是哪个存储的任务
+        title = f"{job.title}（{job.target}）" if len(self._target_storages) > 1 else job.title
+        stats = (f"\n上传{self.__format_size(job.size(UnitState.DONE))}，耗时{self.__format_duration(elapsed)}"
+                 + (f"，平均速率{self.__format_size(rate)}/s" if rate else ""))
+        if not failed:
+            msg_title = "✅ 上传完成"
+            text = (f"媒体「{title}」上传完成，共{done + skipped}个文件"
+                    + (f"，其中{skipped}个已存在无需上传" if skipped else "")
+                    + stats)
+        else:
+            errors = [f"{Path(unit.path).name}：{unit.error}"
+                      for unit in job.units if unit.state == UnitState.FAILED][:self.SUMMARY_LIMIT]
+            msg_title = "⚠️ 上传未全部完成"
+            text = (f"媒体「{title}」成功{done + skipped}个，失败{failed}个"
+                    + stats + "\n"
+                    + "\n".join(errors)
+                    + "\n重新执行上传命令将只上传未完成的文件")
+        for channel, userid in subscribers:
+            self.post_message(channel=channel, title=msg_title, text=text, userid=userid)
@@ -0,0 +1,80 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.log import logger
+from .metrics import LatencyHistogram
+
+
+class EventDispatcher:
+    """
+    事件处理分发器：事件回调只负责入队并立即返回，由固定数量的工作线程执行实际处理，
+    队列已满时拒绝新任务，避免阻塞事件管理器线程
+    """
+
+    def __init__(self, workers: int = 2, maxsize: int = 100, name: str = "mediato115-event"):
+        self._workers = max(1, workers)
+        self._name = name
+        self._queue: "queue.Queue[Tuple[Callable, tuple, float]]" = queue.Queue(maxsize=maxsize)
+        self._threads: List[threading.Thread] = []
+        self._stop_event = threading.Event()
+        # 排队等待耗时、实际处理耗时
+        self.wait_histogram = LatencyHistogram()
+        self.handle_histogram = LatencyHistogram()
+        self.rejected = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        self._stop_event.clear()
+        for i in range(self._workers):
+            thread = threading.Thread(target=self.__run, name=f"{self._name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        停止工作线程，已入队的任务处理完后退出
+        """
+        self._stop_event.set()
+        self._threads = []
+
+    def submit(self, func: Callable, *args: Any) -> bool:
+        """
+        提交处理任务，队列已满时返回False
+        """
+        try:
+            self._queue.put_nowait((func, args, time.perf_counter()))
+            return True
+        except queue.Full:
+            self.rejected += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "rejected": self.rejected,
+            "wait": self.wait_histogram.snapshot(),
+            "handle": self.handle_histogram.snapshot(),
+        }
+
+    def __run(self):
+        while True:
+            try:
+                task = self._queue.get(timeout=1)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    break
+                continue
+            func, args, enqueued = task
+            start = time.perf_counter()
+            self.wait_histogram.observe(start - enqueued)
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"事件处理失败：{str(e)}")
+            finally:
+                self.handle_histogram.observe(time.perf_counter() - start)
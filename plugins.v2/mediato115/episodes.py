@@ -0,0 +1,156 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 命令中的季集范围：S02、S01E05、S01E05-E10、S01E05-10、S01-S03、S01E05-S02E03
+SPEC_PATTERN = re.compile(r"^S(\d{1,4})(?:E(\d{1,4}))?(?:-(?:S(\d{1,4}))?(?:E?(\d{1,4}))?)?$", re.IGNORECASE)
+# 文件名中的季集编号，支持多集文件：S01E01、S01E01E02、S01E01-E02、S01E01-02
+FILE_EPISODE_PATTERN = re.compile(r"(?<![a-z0-9])s(\d{1,4})[ ._-]?e(\d{1,4})(?:-?e(\d{1,4})|-(\d{1,4})(?![\dp]))?",
+                                  re.IGNORECASE)
+# 文件名中只有集编号：E05、EP05、第05集
+FILE_EPISODE_ONLY_PATTERN = re.compile(r"(?:(?<![a-z0-9])ep?(\d{1,4})(?![\dp])|第(\d{1,4})集)", re.IGNORECASE)
+# 季目录：Season 1、S01、第1季、Specials
+SEASON_DIR_PATTERN = re.compile(r"^(?:season[ ._-]*(\d{1,4})|s(\d{1,4})|第(\d{1,4})季)$", re.IGNORECASE)
+SPECIALS_DIR_PATTERN = re.compile(r"^specials?$", re.IGNORECASE)
+
+# 整季选择时集编号的上限
+_LAST_EPISODE = 1 << 30
+
+
+class EpisodeSelection:
+    """
+    季集范围选择：由一个或多个闭区间组成，区间端点为 (季, 集)，整季选择的集编号为 0 到上限
+    """
+    __slots__ = ("ranges", "label")
+
+    def __init__(self, ranges: List[Tuple[Tuple[int, int], Tuple[int, int]]], label: str):
+        self.ranges = ranges
+        self.label = label
+
+    @classmethod
+    def parse(cls, text: str) -> Optional["EpisodeSelection"]:
+        """
+        解析单个季集范围，格式不正确或起止颠倒时返回None
+        """
+        match = SPEC_PATTERN.match(text.strip())
+        if not match:
+            return None
+        season, episode, end_season, end_episode = (int(x) if x else None for x in match.groups())
+        if episode is None:
+            # 整季：S02、S01-S03、S01-03
+            start = (season, 0)
+            end = (end_season or end_episode or season, _LAST_EPISODE)
+            if "E" in text.upper().split("-", 1)[-1] and "-" in text:
+                return None
+        else:
+            start = (season, episode)
+            if end_season is not None:
+                end = (end_season, end_episode) if end_episode is not None else (end_season, _LAST_EPISODE)
+            else:
+                end = (season, end_episode if end_episode is not None else episode)
+        if end < start:
+            return None
+        return cls([(start, end)], text.strip().upper())
+
+    @classmethod
+    def merge(cls, selections: List["EpisodeSelection"]) -> Optional["EpisodeSelection"]:
+        """
+        合并多个季集范围，没有范围时返回None
+        """
+        if not selections:
+            return None
+        return cls([r for selection in selections for r in selection.ranges],
+                   " ".join(selection.label for selection in selections))
+
+    def contains(self, season: int, first: int, last: Optional[int] = None) -> bool:
+        """
+        是否包含指定的剧集，多集文件与任一区间有重叠即包含
+        """
+        last = first if last is None else last
+        return any(start <= (season, last) and (season, first) <= end for start, end in self.ranges)
+
+
+def split_episode_spec(text: str) -> Tuple[str, Optional[EpisodeSelection]]:
+    """
+    拆分命令参数末尾的季集范围：「剧名 S01 S03E01-E04」-> ("剧名", S01 S03E01-E04)，
+    没有季集范围或只剩季集范围时原样返回
+    """
+    words = text.split()
+    selections = []
+    while len(words) > 1:
+        selection = EpisodeSelection.parse(words[-1])
+        if not selection:
+            break
+        selections.insert(0, selection)
+        words.pop()
+    if not selections:
+        return text, None
+    return " ".join(words), EpisodeSelection.merge(selections)
+
+
+def parse_episode(path: str) -> Optional[Tuple[int, int, int]]:
+    """
+    从文件名和所在目录解析 (季, 起始集, 结束集)，优先使用文件名中的 SxxEyy，
+    只有集编号时季取自所在的季目录，无法识别时返回None
+    """
+    name = os.path.basename(path)
+    match = FILE_EPISODE_PATTERN.search(name)
+    if match:
+        season, first = int(match.group(1)), int(match.group(2))
+        last = match.group(3) or match.group(4)
+        last = int(last) if last else first
+        return season, first, max(first, last)
+    match = FILE_EPISODE_ONLY_PATTERN.search(os.path.splitext(name)[0])
+    if not match:
+        return None
+    episode = int(match.group(1) or match.group(2))
+    season = season_of_dir(os.path.basename(os.path.dirname(path)))
+    return 1 if season is None else season, episode, episode
+
+
+def season_of_dir(name: str) -> Optional[int]:
+    """
+    从季目录名解析季编号，特别篇为0，不是季目录时返回None
+    """
+    if SPECIALS_DIR_PATTERN.match(name):
+        return 0
+    match = SEASON_DIR_PATTERN.match(name.strip())
+    if not match:
+        return None
+    return int(next(group for group in match.groups() if group))
+
+
+class EpisodeIndex:
+    """
+    剧集文件索引：记录剧集目录下每个文件对应的季集编号，按季集范围直接得到需要上传的文件
+    """
+
+    def __init__(self, files: Iterable[str]):
+        self._episodes: Dict[str, Tuple[int, int, int]] = {}
+        self.unknown = 0
+        for path in files:
+            episode = parse_episode(path)
+            if episode:
+                self._episodes[path] = episode
+            else:
+                self.unknown += 1
+
+    def __len__(self) -> int:
+        return len(self._episodes)
+
+    def select(self, selection: EpisodeSelection) -> Set[str]:
+        """
+        季集范围内的文件
+        """
+        return {path for path, episode in self._episodes.items() if selection.contains(*episode)}
+
+    def describe(self) -> str:
+        """
+        现有的季集概况，如 S01(E01-E10)、S02(E01-E08)
+        """
+        seasons: Dict[int, List[int]] = {}
+        for season, first, last in self._episodes.values():
+            bounds = seasons.setdefault(season, [first, last])
+            bounds[0], bounds[1] = min(bounds[0], first), max(bounds[1], last)
+        return "、".join(f"S{season:02d}(E{first:02d}-E{last:02d})"
+                        for season, (first, last) in sorted(seasons.items()))
@@ -0,0 +1,159 @@
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+# 每次从内存映射中读取的块大小
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """
+    流式计算文件的SHA1，大写十六进制
+    """
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return sha1.hexdigest().upper()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for offset in range(0, size, HASH_CHUNK_SIZE):
+                    sha1.update(view[offset:offset + HASH_CHUNK_SIZE])
+            finally:
+                view.release()
+    return sha1.hexdigest().upper()
+
+
+class HashCache:
+    """
+    文件哈希缓存：按 (路径, 大小, 修改时间) 缓存SHA1，并记录已上传到各存储的内容哈希，
+    内容已上传过的文件无需再次传输。指定remote时本地没有记录的内容再向目标存储查询，已存在的记为已上传
+    """
+
+    def __init__(self, db_path: str, workers: int = 2, remote: Optional[Callable[[str, str], bool]] = None):
+        """
+        :param remote: 查询 (目标存储, SHA1) 对应的内容是否已存在于目标存储
+        """
+        self._remote = remote
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(file_hash)")]
+        if "preid" in columns:
+            # 旧版本缓存的预检哈希没有用到，哈希缓存可以重新计算，直接重建
+            self._conn.execute("DROP TABLE file_hash")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS file_hash (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                sha1 TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS uploaded (
+                sha1 TEXT NOT NULL,
+                target TEXT NOT NULL,
+                uploaded_at REAL NOT NULL,
+                PRIMARY KEY (sha1, target)
+            );
+        """)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="mediato115-hash")
+        # 正在计算的哈希
+        self._pending: Dict[str, Future] = {}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._conn.close()
+
+    def __lookup(self, path: str, size: int, mtime: float) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT sha1 FROM file_hash WHERE path = ? AND size = ? AND mtime = ?",
+                                     (path, size, mtime)).fetchone()
+        return row[0] if row else None
+
+    def __compute(self, path: str, size: int, mtime: float) -> str:
+        try:
+            sha1 = hash_file(path)
+            with self._lock:
+                self._conn.execute("INSERT OR REPLACE INTO file_hash (path, size, mtime, sha1) VALUES (?, ?, ?, ?)",
+                                   (path, size, mtime, sha1))
+                self._conn.commit()
+            return sha1
+        finally:
+            with self._lock:
+                self._pending.pop(path, None)
+
+    def __request(self, path: str) -> Future:
+        """
+        获取文件哈希，缓存未命中时提交到线程池计算
+        """
+        stat = os.stat(path)
+        sha1 = self.__lookup(path, stat.st_size, stat.st_mtime)
+        if sha1:
+            future = Future()
+            future.set_result(sha1)
+            return future
+        with self._lock:
+            future = self._pending.get(path)
+            if future is None:
+                future = self._executor.submit(self.__compute, path, stat.st_size, stat.st_mtime)
+                self._pending[path] = future
+        return future
+
+    def prefetch(self, paths: Iterable[str]):
+        """
+        后台预先计算一批文件的哈希
+        """
+        for path in paths:
+            try:
+                self.__request(path)
+            except OSError:
+                continue
+
+    def get(self, path: str) -> str:
+        """
+        获取文件的SHA1，计算中则等待结果
+        """
+        return self.__request(path).result()
+
+    def is_uploaded(self, path: str, target: str) -> bool:
+        """
+        文件内容是否已上传到目标存储，本地没有记录时向目标存储查询
+        """
+        sha1 = self.get(path)
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM uploaded WHERE sha1 = ? AND target = ?",
+                                     (sha1, target)).fetchone()
+        if row is not None:
+            return True
+        if self._remote and self._remote(target, sha1):
+            self.__mark(sha1, target)
+            return True
+        return False
+
+    def mark_uploaded(self, path: str, target: str):
+        """
+        记录文件内容已上传到目标存储
+        """
+        self.__mark(self.get(path), target)
+
+    def forget(self, path: str, target: str):
+        """
+        移除文件内容已上传到目标存储的记录，相同内容的其他文件也不再跳过
+        """
+        sha1 = self.get(path)
+        with self._lock:
+            self._conn.execute("DELETE FROM uploaded WHERE sha1 = ? AND target = ?", (sha1, target))
+            self._conn.commit()
+
+    def __mark(self, sha1: str, target: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO uploaded (sha1, target, uploaded_at) VALUES (?, ?, ?)",
+                               (sha1, target, time.time()))
+            self._conn.commit()
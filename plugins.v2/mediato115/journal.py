@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class SyncJournal:
+    """
+    同步日志：记录已上传到各存储的文件 (路径, 大小, 修改时间, 远端标识)，以及上次同步时各目录的修改时间，
+    目录修改时间未变且目录下文件都已同步时，下次同步无需再列出该目录
+    """
+
+    def __init__(self, db_path: str):
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS synced_file (
+                target TEXT NOT NULL,
+                path TEXT NOT NULL,
+                dir TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                remote_id TEXT,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (target, path)
+            );
+            CREATE INDEX IF NOT EXISTS idx_synced_file_dir ON synced_file (target, dir);
+            CREATE TABLE IF NOT EXISTS synced_dir (
+                target TEXT NOT NULL,
+                path TEXT NOT NULL,
+                parent TEXT,
+                mtime REAL,
+                PRIMARY KEY (target, path)
+            );
+            CREATE INDEX IF NOT EXISTS idx_synced_dir_parent ON synced_dir (target, parent);
+        """)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def record(self, path: str, target: str, remote_id: Optional[str] = None):
+        """
+        记录文件已上传到目标存储，大小和修改时间取当前文件状态
+        """
+        stat = os.stat(path)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO synced_file "
+                               "(target, path, dir, size, mtime, remote_id, synced_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (target, path, os.path.dirname(path), stat.st_size, stat.st_mtime, remote_id,
+                                time.time()))
+            self._conn.commit()
+
+    def synced_files(self, directory: str, target: str) -> Dict[str, Tuple[int, float]]:
+        """
+        目录下已同步的文件 {路径: (大小, 修改时间)}
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT path, size, mtime FROM synced_file WHERE target = ? AND dir = ?",
+                                      (target, directory)).fetchall()
+        return {path: (size, mtime) for path, size, mtime in rows}
+
+    def count(self, target: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM synced_file WHERE target = ?", (target,)).fetchone()[0]
+
+    def get_dir(self, path: str, target: str) -> Tuple[bool, Optional[float]]:
+        """
+        目录是否已记录及上次同步完成时的修改时间，未同步完成时修改时间为None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT mtime FROM synced_dir WHERE target = ? AND path = ?",
+                                     (target, path)).fetchone()
+        return (True, row[0]) if row else (False, None)
+
+    def children(self, path: str, target: str) -> List[str]:
+        """
+        上次列出目录时记录的子目录
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT path FROM synced_dir WHERE target = ? AND parent = ?",
+                                      (target, path)).fetchall()
+        return [row[0] for row in rows]
+
+    def pending_dirs(self, target: str) -> List[str]:
+        """
+        尚未同步完成的目录
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT path FROM synced_dir WHERE target = ? AND mtime IS NULL",
+                                      (target,)).fetchall()
+        return [row[0] for row in rows]
+
+    def update_dir(self, path: str, target: str, parent: Optional[str], mtime: Optional[float],
+                   children: Iterable[str]):
+        """
+        更新目录记录及其子目录列表，已不存在的子目录连同其下的记录一并删除，需调用commit提交
+        """
+        children = set(children)
+        with self._lock:
+            self._conn.execute("INSERT INTO synced_dir (target, path, parent, mtime) VALUES (?, ?, ?, ?) "
+                               "ON CONFLICT (target, path) DO UPDATE SET mtime = excluded.mtime",
+                               (target, path, parent, mtime))
+            known = {row[0] for row in self._conn.execute(
+                "SELECT path FROM synced_dir WHERE target = ? AND parent = ?", (target, path))}
+            for child in known - children:
+                self.__remove(child, target)
+            self._conn.executemany("INSERT OR IGNORE INTO synced_dir (target, path, parent, mtime) "
+                                   "VALUES (?, ?, ?, NULL)", [(target, child, path) for child in children - known])
+
+    def remove_dir(self, path: str, target: str):
+        """
+        删除目录及其下的全部记录，需调用commit提交
+        """
+        with self._lock:
+            self.__remove(path, target)
+
+    def __remove(self, path: str, target: str):
+        prefix = path.rstrip(os.sep) + os.sep
+        # 前缀匹配时转义LIKE通配符
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        for table, column in (("synced_dir", "path"), ("synced_file", "dir")):
+            self._conn.execute(f"DELETE FROM {table} WHERE target = ? AND ({column} = ? OR {column} LIKE ? ESCAPE '\\')",
+                               (target, path, pattern))
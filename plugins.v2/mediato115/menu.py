@@ -0,0 +1,160 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# 菜单回调数据前缀，区别于旧版直接携带item_id的回调
+MENU_PREFIX = "menu"
+
+
+class MenuSession:
+    """
+    一次搜索的选择菜单状态：完整结果集、筛选条件、当前页、已选条目和命令中的季集范围
+    """
+    __slots__ = ("sid", "items", "page", "item_type", "year", "selected", "episodes", "approximate", "force",
+                 "expires")
+
+    def __init__(self, items: List[Any], ttl: float):
+        self.sid = uuid.uuid4().hex[:6]
+        self.items = items
+        self.page = 0
+        self.item_type: Optional[str] = None
+        self.year: Optional[str] = None
+        # 已选条目在完整结果集中的序号
+        self.selected: Set[int] = set()
+        # 命令中的季集范围，选中的剧集只上传范围内的文件
+        self.episodes: Optional[Any] = None
+        # 结果只是模糊匹配或多个词分别匹配，即使只有一个也需要用户确认
+        self.approximate = False
+        # 命令带 --force，选中的媒体强制上传
+        self.force = False
+        self.expires = time.monotonic() + ttl
+
+    def filtered(self) -> List[int]:
+        """
+        符合当前筛选条件的条目序号
+        """
+        return [i for i, item in enumerate(self.items)
+                if (not self.item_type or item.item_type == self.item_type)
+                and (not self.year or str(item.year) == self.year)]
+
+    def pages(self, page_size: int) -> int:
+        return max(1, (len(self.filtered()) + page_size - 1) // page_size)
+
+    def selected_items(self) -> List[Any]:
+        return [self.items[i] for i in sorted(self.selected)]
+
+    def render(self, callback_prefix: str, page_size: int) -> Tuple[str, List[List[dict]]]:
+        """
+        生成菜单文本和按钮
+        """
+        indexes = self.filtered()
+        pages = self.pages(page_size)
+        self.page = min(self.page, pages - 1)
+        page_indexes = indexes[self.page * page_size:(self.page + 1) * page_size]
+
+        def _button(text: str, *action: Any) -> dict:
+            return {
+                "text": text,
+                "callback_data": f"{callback_prefix}{':'.join([MENU_PREFIX, self.sid, *map(str, action)])}"
+            }
+
+        lines = []
+        for no, i in enumerate(page_indexes, self.page * page_size + 1):
+            item = self.items[i]
+            mark = "✅ " if i in self.selected else ""
+            year = f" {item.year}" if item.year else ""
+            lines.append(f"{mark}{no}. {item.title} ({item.item_type}{year})")
+        filters = [value for value in (self.item_type, self.year) if value]
+        header = (f"共{len(indexes)}个结果" + (f"（筛选：{' '.join(filters)}）" if filters else "")
+                  + f"，第{self.page + 1}/{pages}页，已选{len(self.selected)}个"
+                  + (f"\n剧集只上传{self.episodes.label}"
+                     if self.episodes and any(item.item_type == "电视剧" for item in self.items) else ""))
+        text = header + "\n点击序号选择/取消，选好后点击上传：\n" + "\n".join(lines)
+
+        buttons: List[List[dict]] = []
+        item_buttons = [_button(f"{'✅' if i in self.selected else ''}{no}", "s", i)
+                        for no, i in enumerate(page_indexes, self.page * page_size + 1)]
+        for start in range(0, len(item_buttons), 4):
+            buttons.append(item_buttons[start:start + 4])
+
+        types = sorted({item.item_type for item in self.items if item.item_type})
+        if len(types) > 1:
+            buttons.append([_button(("✔" if self.item_type is None else "") + "全部类型", "t", "")]
+                           + [_button(("✔" if self.item_type == t else "") + t, "t", t) for t in types])
+        years = self.__top_years(4)
+        if len(years) > 1:
+            buttons.append([_button(("✔" if self.year is None else "") + "全部年份", "y", "")]
+                           + [_button(("✔" if self.year == y else "") + y, "y", y) for y in years])
+
+        nav = []
+        if self.page > 0:
+            nav.append(_button("⬅️ 上一页", "p", self.page - 1))
+        if self.selected:
+            nav.append(_button(f"⬆️ 上传({len(self.selected)})", "c"))
+        if self.page < pages - 1:
+            nav.append(_button("下一页 ➡️", "p", self.page + 1))
+        nav.append(_button("❌ 取消", "x"))
+        buttons.append(nav)
+        return text, buttons
+
+    def __top_years(self, limit: int) -> List[str]:
+        """
+        结果集中出现最多的年份，筛选中的年份始终保留
+        """
+        counts: Dict[str, int] = {}
+        for item in self.items:
+            if item.year:
+                counts[str(item.year)] = counts.get(str(item.year), 0) + 1
+        years = sorted(counts, key=lambda y: -counts[y])[:limit]
+        if self.year and self.year not in years:
+            years[-1:] = [self.year]
+        return sorted(years, reverse=True)
+
+
+class MenuCache:
+    """
+    按用户缓存选择菜单的结果集，每个用户只保留最近一次搜索，超过有效期或用户数上限时淘汰
+    """
+
+    def __init__(self, ttl: float = 600, maxsize: int = 1000):
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._sessions: "OrderedDict[str, MenuSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __evict(self):
+        now = time.monotonic()
+        for key in [key for key, session in self._sessions.items() if session.expires <= now]:
+            del self._sessions[key]
+        while len(self._sessions) > self._maxsize:
+            self._sessions.popitem(last=False)
+
+    def create(self, userid: Any, items: List[Any]) -> MenuSession:
+        """
+        为用户创建新的菜单，替换之前的菜单
+        """
+        session = MenuSession(items, self._ttl)
+        with self._lock:
+            self._sessions.pop(str(userid), None)
+            self._sessions[str(userid)] = session
+            self.__evict()
+        return session
+
+    def get(self, userid: Any, sid: str) -> Optional[MenuSession]:
+        """
+        获取用户当前的菜单并刷新有效期，菜单已过期或已被新搜索替换时返回None
+        """
+        with self._lock:
+            self.__evict()
+            session = self._sessions.get(str(userid))
+            if not session or session.sid != sid:
+                return None
+            session.expires = time.monotonic() + self._ttl
+            self._sessions.move_to_end(str(userid))
+            return session
+
+    def discard(self, userid: Any):
+        with self._lock:
+            self._sessions.pop(str(userid), None)
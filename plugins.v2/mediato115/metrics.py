@@ -0,0 +1,160 @@
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+class LatencyHistogram:
+    """
+    固定分桶的耗时直方图，单位毫秒，内存占用恒定
+    """
+    # 分桶上界(毫秒)，最后一个桶收集超过上界的样本
+    BUCKETS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 60000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.BUCKETS) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    def observe(self, seconds: float):
+        """
+        记录一次耗时
+        """
+        ms = seconds * 1000
+        with self._lock:
+            self._counts[bisect.bisect_left(self.BUCKETS, ms)] += 1
+            self._count += 1
+            self._sum += ms
+            self._max = max(self._max, ms)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """
+        估算分位数，返回样本所在分桶的上界
+        """
+        with self._lock:
+            if not self._count:
+                return None
+            rank = pct * self._count
+            seen = 0
+            for i, count in enumerate(self._counts):
+                seen += count
+                if seen >= rank:
+                    return self.BUCKETS[i] if i < len(self.BUCKETS) else self._max
+        return self._max
+
+    def snapshot(self) -> Dict[str, object]:
+        """
+        导出直方图数据
+        """
+        with self._lock:
+            buckets: List[dict] = [{"le": le, "count": count} for le, count in zip(self.BUCKETS, self._counts)]
+            buckets.append({"le": "+Inf", "count": self._counts[-1]})
+            count, total, maximum = self._count, self._sum, self._max
+        return {
+            "count": count,
+            "avg_ms": round(total / count, 3) if count else None,
+            "max_ms": round(maximum, 3),
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "buckets": buckets,
+        }
+
+
+class MetricsRecorder:
+    """
+    插件运行指标：各阶段耗时直方图、失败计数，以及最近的阶段耗时和上传记录，
+    明细保存在固定长度的环形缓冲中，长时间运行内存占用不变
+    """
+    # 统计的阶段：数据库查询、路径校验、提交上传任务、文件传输
+    PHASES = ("lookup", "validate", "submit", "transfer")
+
+    def __init__(self, history: int = 200):
+        self._lock = threading.Lock()
+        self.phases: Dict[str, LatencyHistogram] = {phase: LatencyHistogram() for phase in self.PHASES}
+        self.failures: Dict[str, int] = {}
+        self.bytes_total = 0
+        self._samples: Dict[str, deque] = {phase: deque(maxlen=history) for phase in self.PHASES}
+        self._uploads: deque = deque(maxlen=history)
+
+    @contextmanager
+    def timer(self, phase: str):
+        """
+        统计代码块耗时
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def observe(self, phase: str, seconds: float):
+        """
+        记录一次阶段耗时
+        """
+        self.phases[phase].observe(seconds)
+        with self._lock:
+            self._samples[phase].append((time.time(), round(seconds * 1000, 3)))
+
+    def fail(self, reason: str):
+        """
+        失败计数
+        """
+        with self._lock:
+            self.failures[reason] = self.failures.get(reason, 0) + 1
+
+    def upload(self, title: str, path: str, size: int, seconds: float, success: bool):
+        """
+        记录一次文件传输
+        """
+        self.observe("transfer", seconds)
+        with self._lock:
+            if success:
+                self.bytes_total += size
+            self._uploads.append({
+                "time": time.time(),
+                "title": title,
+                "file": os.path.basename(path),
+                "bytes": size,
+                "seconds": round(seconds, 3),
+                "rate": round(size / seconds, 1) if success and seconds > 0 else 0,
+                "success": success,
+            })
+
+    def recent_samples(self, phase: str, limit: int = 50) -> List[tuple]:
+        """
+        最近的阶段耗时 [(时间戳, 毫秒)]
+        """
+        with self._lock:
+            return list(self._samples[phase])[-limit:]
+
+    def throughput(self) -> Optional[float]:
+        """
+        最近成功上传的单文件平均速率(字节/秒)，没有记录时返回None
+        """
+        with self._lock:
+            uploads = [upload for upload in self._uploads if upload["success"] and upload["seconds"] > 0]
+        seconds = sum(upload["seconds"] for upload in uploads)
+        return sum(upload["bytes"] for upload in uploads) / seconds if seconds else None
+
+    def recent_uploads(self, limit: int = 50) -> List[dict]:
+        """
+        最近的文件传输记录
+        """
+        with self._lock:
+            return list(self._uploads)[-limit:]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            failures = dict(self.failures)
+            bytes_total = self.bytes_total
+        return {
+            "phases": {phase: histogram.snapshot() for phase, histogram in self.phases.items()},
+            "failures": failures,
+            "bytes_total": bytes_total,
+            "recent_uploads": self.recent_uploads(),
+        }
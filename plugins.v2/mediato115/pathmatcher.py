@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from stat import S_ISREG
+from typing import Dict, Iterable, List, Optional
+
+
+def split_path(path: str) -> List[str]:
+    """
+    规范化路径并按目录层级拆分，消除 ".."、重复分隔符和末尾分隔符
+    """
+    path = os.path.normpath(path.strip())
+    return [part for part in path.replace("\\", "/").split("/") if part]
+
+
+class PathTrie:
+    """
+    允许目录的路径前缀树，按目录层级逐级匹配，检查耗时只与路径深度有关，
+    且 /media2 不会被误判为 /media 的子目录
+    """
+    # 节点上标记允许目录的键，不会与目录名冲突
+    _END = "\0"
+
+    def __init__(self, roots: Iterable[str] = ()):
+        self._root: Dict[str, dict] = {}
+        self._count = 0
+        for root in roots:
+            self.add(root)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, root: str):
+        node = self._root
+        for part in split_path(root):
+            node = node.setdefault(part, {})
+        if self._END not in node:
+            node[self._END] = root
+            self._count += 1
+
+    def match(self, path: str) -> Optional[str]:
+        """
+        返回包含该路径的允许目录，不在任何允许目录下时返回None
+        """
+        if not path:
+            return None
+        node = self._root
+        if self._END in node:
+            return node[self._END]
+        for part in split_path(path):
+            node = node.get(part)
+            if node is None:
+                return None
+            if self._END in node:
+                return node[self._END]
+        return None
+
+
+class StatCache:
+    """
+    带过期时间的文件状态缓存，慢速挂载上的重复检查不再重复系统调用，
+    同时缓存不存在的结果，条目数超过上限时淘汰最久未使用的
+    """
+
+    def __init__(self, ttl: float = 30, maxsize: int = 100000):
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def put(self, path: str, stat: Optional[os.stat_result]):
+        """
+        写入文件状态，stat为None表示文件不存在
+        """
+        with self._lock:
+            self._entries[path] = (time.monotonic() + self._ttl, stat)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def stat(self, path: str) -> Optional[os.stat_result]:
+        """
+        获取文件状态，文件不存在时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(path)
+                return entry[1]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        self.put(path, stat)
+        return stat
+
+    def dump(self) -> List[tuple]:
+        """
+        导出缓存的文件状态 (路径, 模式, 大小, 修改时间)，不存在的文件只有路径，供写入预热快照
+        """
+        with self._lock:
+            return [(path, stat.st_mode, stat.st_size, stat.st_mtime) if stat else (path,)
+                    for path, (_, stat) in self._entries.items()]
+
+    def load(self, entries: Iterable[tuple]):
+        """
+        导入预热快照中的文件状态，按新写入的条目计算有效期，已有的条目不覆盖
+        """
+        expires = time.monotonic() + self._ttl
+        with self._lock:
+            for entry in entries:
+                if entry[0] in self._entries:
+                    continue
+                stat = os.stat_result((entry[1], 0, 0, 0, 0, 0, entry[2], 0, entry[3], 0)) if len(entry) > 1 else None
+                self._entries[entry[0]] = (expires, stat)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def exists(self, path: str) -> bool:
+        return self.stat(path) is not None
+
+    def isfile(self, path: str) -> bool:
+        stat = self.stat(path)
+        return stat is not None and S_ISREG(stat.st_mode)
@@ -0,0 +1,536 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .pathmatcher import StatCache
+from .scanner import ScanCache, ScanSummary, scan_files
+from .scheduler import BandwidthProfile, Priority, UploadScheduler
+
+
+class UnitState:
+    """
+    上传单元状态
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    # 内容已存在于目标存储，无需传输
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+    # 结束状态
+    FINAL = (DONE, SKIPPED, FAILED)
+
+
+class UploadUnit:
+    """
+    上传单元，对应一个需要整理上传的文件
+    """
+    __slots__ = ("path", "size", "state", "error")
+
+    def __init__(self, path: str, size: int = 0, state: str = UnitState.PENDING, error: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.state = state
+        self.error = error
+
+    def to_list(self) -> list:
+        return [self.path, self.size, self.state, self.error]
+
+    @classmethod
+    def from_list(cls, data: list) -> "UploadUnit":
+        return cls(*data)
+
+
+class UploadJob:
+    """
+    上传任务，一个媒体根目录拆分成多个上传单元，整体作为检查点持久化
+    """
+
+    def __init__(self, job_id: str, title: str, root: str, target: str, units: List[UploadUnit],
+                 channel: Any = None, userid: Any = None, notify: bool = True,
+                 priority: int = Priority.INTERACTIVE, created: Optional[float] = None,
+                 started: Optional[float] = None, finished_at: Optional[float] = None, force: bool = False):
+        self.job_id = job_id
+        self.title = title
+        self.root = root
+        self.target = target
+        self.units = units
+        # 发起请求的用户
+        self.userid = userid
+        # 结束时需要单独通知的请求方 [渠道, 用户]，批量上传时由调用方汇总，不登记；重复请求合并时追加
+        self.subscribers: List[list] = [[channel, userid]] if notify else []
+        self.priority = priority
+        # 强制上传：不检查内容是否已上传过，用于目标存储上的文件已被删除后重新上传
+        self.force = force
+        self.created = created or time.time()
+        # 第一个单元开始上传及全部单元结束的时间
+        self.started = started
+        self.finished_at = finished_at
+
+    @staticmethod
+    def make_id(root: str, target: str, scope: str = "") -> str:
+        """
+        同一根目录和目标存储对应同一个任务ID，重复提交时续传未完成的单元，
+        scope区分只包含部分文件的任务，如媒体库同步，避免与整目录上传的任务相互合并
+        """
+        key = f"{scope}:{target}:{os.path.normpath(root)}" if scope else f"{target}:{os.path.normpath(root)}"
+        return hashlib.md5(key.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def key(self) -> str:
+        """
+        去重键：规范化的根目录和目标存储，不区分季集范围，同一目录的各任务共用
+        """
+        return self.make_id(self.root, self.target)
+
+    @property
+    def finished(self) -> bool:
+        return all(unit.state in UnitState.FINAL for unit in self.units)
+
+    def count(self, *states: str) -> int:
+        return sum(1 for unit in self.units if unit.state in states)
+
+    def size(self, *states: str) -> int:
+        return sum(unit.size for unit in self.units if unit.state in states)
+
+    def record(self) -> list:
+        """
+        任务结束后保存的紧凑记录，字段顺序见 UploadPipeline.RECORD_FIELDS
+        """
+        return [self.job_id, self.title, self.target, self.userid, self.created, self.started, self.finished_at,
+                self.count(UnitState.DONE), self.count(UnitState.SKIPPED), self.count(UnitState.FAILED),
+                self.size(UnitState.DONE)]
+
+    def merge(self, units: Iterable[UploadUnit]):
+        """
+        合并新扫描到的单元：待上传的沿用原单元，大小未变的保持原状态，失败的重置为待上传，新文件追加
+        """
+        existing = {unit.path: unit for unit in self.units}
+        merged = []
+        for unit in units:
+            old = existing.get(unit.path)
+            if old and old.state == UnitState.PENDING:
+                # 沿用已排队的单元，避免同一文件重复上传
+                old.size = unit.size
+                merged.append(old)
+            elif old and old.state != UnitState.FAILED and old.size == unit.size:
+                merged.append(old)
+            else:
+                merged.append(unit)
+        self.units = merged
+
+    def subscribe(self, subscribers: Iterable[list]):
+        """
+        追加需要通知的请求方，已登记的不重复追加
+        """
+        for subscriber in subscribers:
+            if list(subscriber) not in self.subscribers:
+                self.subscribers.append(list(subscriber))
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.job_id,
+            "title": self.title,
+            "root": self.root,
+            "target": self.target,
+            "userid": self.userid,
+            "subscribers": self.subscribers,
+            "priority": self.priority,
+            "force": self.force,
+            "created": self.created,
+            "started": self.started,
+            "units": [unit.to_list() for unit in self.units],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UploadJob":
+        job = cls(job_id=data["id"],
+                  title=data.get("title"),
+                  root=data.get("root"),
+                  target=data.get("target"),
+                  units=[UploadUnit.from_list(unit) for unit in data.get("units") or []],
+                  userid=data.get("userid"),
+                  notify=False,
+                  priority=data.get("priority", Priority.INTERACTIVE),
+                  force=data.get("force", False),
+                  created=data.get("created"),
+                  started=data.get("started"))
+        if "subscribers" in data:
+            job.subscribers = [list(subscriber) for subscriber in data["subscribers"] or []]
+        elif data.get("notify", True):
+            # 旧版检查点只记录了一个请求方
+            job.subscribers = [[data.get("channel"), data.get("userid")]]
+        return job
+
+
+def collect_units(root: str, media_exts: Iterable[str], sidecar_exts: Iterable[str] = (),
+                  stat_cache: Optional[StatCache] = None,
+                  scan_cache: Optional[ScanCache] = None,
+                  include: Optional[Set[str]] = None) -> Tuple[List[UploadUnit], ScanSummary]:
+    """
+    扫描根目录，媒体文件作为上传单元按路径排序，字幕、音轨等附属文件随媒体文件一起整理，只计入统计，
+    指定scan_cache时目录未变化则复用上次的扫描结果，指定include时只保留其中的文件
+    """
+    units = []
+    summary = ScanSummary()
+    if scan_cache:
+        files = scan_cache.scan(root, media_exts, sidecar_exts, stat_cache)
+    else:
+        files = scan_files(root, media_exts, sidecar_exts, stat_cache)
+    for path, size, is_media in files:
+        if include is not None and path not in include:
+            continue
+        summary.add(size, is_media)
+        if is_media:
+            units.append(UploadUnit(path=path, size=size))
+    units.sort(key=lambda unit: unit.path)
+    return units, summary
+
+
+class UploadPipeline:
+    """
+    可续传的上传流水线：任务按文件拆分为单元交给上传调度器执行，单元状态变化后写入检查点，
+    重启后只继续未完成的单元。检查点中的单元按组保存，状态变化只重写所在的组，
+    同一任务的写入间隔不少于CHECKPOINT_INTERVAL，期间的变化在下次写入、任务结束、停止或flush时一并保存
+    """
+    # 检查点数据键
+    INDEX_KEY = "upload_jobs"
+    JOB_KEY = "upload_job_{}"
+    CHUNK_KEY = "upload_job_{}_{}"
+    # 检查点中每组保存的单元数
+    CHUNK_SIZE = 100
+    # 同一任务两次写入单元状态的最短间隔(秒)
+    CHECKPOINT_INTERVAL = 5
+    # 已结束任务的记录
+    RECORDS_KEY = "upload_records"
+    RECORD_FIELDS = ("id", "title", "target", "userid", "created", "started", "finished",
+                     "done", "skipped", "failed", "bytes")
+    # 保留的任务记录数
+    RECORDS_LIMIT = 200
+
+    def __init__(self, store: Any,
+                 submit: Callable[[UploadJob, UploadUnit], Optional[Tuple[bool, str]]],
+                 on_finished: Optional[Callable[[UploadJob], None]] = None,
+                 skip: Optional[Callable[[UploadJob, UploadUnit], bool]] = None,
+                 concurrency: int = 2,
+                 profile: Optional[BandwidthProfile] = None,
+                 in_flight: Optional[Callable[[UploadJob, UploadUnit], bool]] = None,
+                 claim: Optional[Callable[[UploadJob], bool]] = None):
+        """
+        :param store: 检查点存储，需提供 get_data/save_data/del_data
+        :param submit: 上传单个单元，返回 (是否成功, 错误信息)，已转交后台执行时返回None，结果通过complete回报
+        :param on_finished: 任务全部单元结束后的回调
+        :param skip: 判断单元是否无需传输，强制上传的任务不检查
+        :param concurrency: 同时上传的单元数上限
+        :param profile: 带宽时段配置
+        :param in_flight: 判断上次停止前转交后台的单元是否仍在执行
+        :param claim: 恢复任务前认领，返回False的任务由其他进程执行，本进程不恢复
+        """
+        self._store = store
+        self._submit = submit
+        self._on_finished = on_finished
+        self._skip = skip
+        self._in_flight = in_flight
+        self._claim = claim
+        self._scheduler = UploadScheduler(run=self.__process, concurrency=concurrency, profile=profile)
+        self._jobs: Dict[str, UploadJob] = {}
+        # 已写入检查点索引的任务ID
+        self._indexed: List[str] = []
+        # 各任务检查点中单元所在的位置、尚未写入的组及上次写入的时间
+        self._positions: Dict[str, Dict[str, int]] = {}
+        self._dirty: Dict[str, Set[int]] = {}
+        self._saved_at: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def start(self) -> int:
+        """
+        启动调度器并恢复未完成的任务，返回恢复的任务数
+        """
+        resumed = 0
+        self._indexed = list(self._store.get_data(self.INDEX_KEY) or [])
+        for job_id in self._indexed:
+            job = self.__load(job_id)
+            if job is None:
+                continue
+            if not (job.count(UnitState.PENDING) or job.count(UnitState.RUNNING)):
+                continue
+            if self._claim and not self._claim(job):
+                continue
+            # 中断时正在上传的单元重新上传，仍在后台执行的继续等待结果
+            for unit in job.units:
+                if unit.state != UnitState.RUNNING:
+                    continue
+                if self._in_flight and self._in_flight(job, unit):
+                    self._scheduler.occupy()
+                else:
+                    unit.state = UnitState.PENDING
+            if job.count(UnitState.PENDING) or job.count(UnitState.RUNNING):
+                with self._lock:
+                    self._jobs[job.job_id] = job
+                self.__schedule(job)
+                resumed += 1
+        self._scheduler.start()
+        return resumed
+
+    def stop(self):
+        """
+        停止调度，正在上传的单元完成后退出，未完成的单元保留在检查点中
+        """
+        self._scheduler.stop()
+        self.flush()
+
+    def flush(self):
+        """
+        写入各任务尚未保存的单元状态
+        """
+        with self._lock:
+            for job_id in list(self._dirty):
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    self.__flush(job)
+
+    def submit(self, job: UploadJob) -> UploadJob:
+        """
+        提交任务，同一根目录存在未完成的任务时合并并续传
+        """
+        return self.submit_many([job])[0]
+
+    def submit_many(self, jobs: List[UploadJob]) -> List[UploadJob]:
+        """
+        同时提交多个任务，如同一媒体上传到多个存储。各任务相互独立地记录进度和失败，
+        待上传的单元按文件交错排队，同一文件的多次读取时间相近，后续读取可以命中系统页缓存
+        """
+        with self._lock:
+            jobs = [self.__merge(job) for job in jobs]
+        items = [(unit.path, i, job, unit) for i, job in enumerate(jobs)
+                 for unit in job.units if unit.state == UnitState.PENDING]
+        items.sort(key=lambda item: (item[0], item[1]))
+        for _, _, job, unit in items:
+            self._scheduler.submit(job.priority, unit.size, (job, unit))
+        for job in jobs:
+            # 合并后没有需要上传的单元，如上次失败的文件已删除、其余都已完成，直接结束任务
+            if job.finished:
+                self.__finish(job)
+        return jobs
+
+    def __merge(self, job: UploadJob) -> UploadJob:
+        """
+        登记任务并写入检查点，同一任务ID存在未完成的任务时合并
+        """
+        with self._lock:
+            current = self._jobs.get(job.job_id)
+            if current is None:
+                current = self.__load(job.job_id)
+                if current is not None:
+                    # 已结束的任务重新开始计时
+                    current.created, current.started = job.created, None
+            if current is not None:
+                current.merge(job.units)
+                # 各次请求的请求方都在结束时通知
+                current.subscribe(job.subscribers)
+                current.priority = min(current.priority, job.priority)
+                current.force = current.force or job.force
+                job = current
+            self._jobs[job.job_id] = job
+            self.__checkpoint(job)
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        队列状态：进行中的任务数、待上传单元数及大小、正在上传的单元大小、排队及正在上传的单元数，以及各目标存储的进度
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        targets: Dict[str, Dict[str, int]] = {}
+        for job in jobs:
+            target = targets.setdefault(job.target, {"jobs": 0, "pending_units": 0, "pending_bytes": 0,
+                                                     "running_units": 0, "running_bytes": 0, "done_units": 0,
+                                                     "failed_units": 0})
+            target["jobs"] += 1
+            target["pending_units"] += job.count(UnitState.PENDING)
+            target["pending_bytes"] += job.size(UnitState.PENDING)
+            target["running_units"] += job.count(UnitState.RUNNING)
+            target["running_bytes"] += job.size(UnitState.RUNNING)
+            target["done_units"] += job.count(UnitState.DONE) + job.count(UnitState.SKIPPED)
+            target["failed_units"] += job.count(UnitState.FAILED)
+        return {
+            "jobs": len(jobs),
+            "pending_units": sum(target["pending_units"] for target in targets.values()),
+            "pending_bytes": sum(target["pending_bytes"] for target in targets.values()),
+            "running_bytes": sum(target["running_bytes"] for target in targets.values()),
+            "queued": self._scheduler.depth,
+            "running": self._scheduler.running,
+            "targets": targets,
+        }
+
+    def get_job(self, job_id: str) -> Optional[UploadJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def busy_paths(self, target: str, key: Optional[str] = None) -> Set[str]:
+        """
+        上传到目标存储的进行中任务里待上传和正在上传的文件，指定key时只统计去重键相同的任务
+        """
+        with self._lock:
+            return {unit.path for job in self._jobs.values()
+                    if job.target == target and (key is None or job.key == key)
+                    for unit in job.units if unit.state in (UnitState.PENDING, UnitState.RUNNING)}
+
+    def records(self) -> List[dict]:
+        """
+        最近结束的任务记录
+        """
+        return [dict(zip(self.RECORD_FIELDS, record)) for record in self._store.get_data(self.RECORDS_KEY) or []]
+
+    def complete(self, job_id: str, path: str, state: bool, errmsg: Optional[str] = None) -> bool:
+        """
+        回报转交后台执行的单元结果并释放并发名额，找不到对应的执行中单元时返回False
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            unit = next((unit for unit in job.units
+                         if unit.path == path and unit.state == UnitState.RUNNING), None) if job else None
+            if unit is None:
+                return False
+            unit.state = UnitState.DONE if state else UnitState.FAILED
+            unit.error = None if state else errmsg
+            self.__checkpoint(job, unit)
+        self._scheduler.release()
+        self.__finish(job)
+        return True
+
+    def __schedule(self, job: UploadJob):
+        """
+        待上传的单元交给调度器排队
+        """
+        for unit in job.units:
+            if unit.state == UnitState.PENDING:
+                self._scheduler.submit(job.priority, unit.size, (job, unit))
+
+    def __load(self, job_id: str) -> Optional[UploadJob]:
+        """
+        读取任务检查点，兼容单元与任务信息保存在一起的旧版检查点
+        """
+        data = self._store.get_data(self.JOB_KEY.format(job_id))
+        if not data:
+            return None
+        if "units" not in data:
+            data = dict(data, units=[unit for n in range(data.get("chunks") or 0)
+                                     for unit in self._store.get_data(self.CHUNK_KEY.format(job_id, n)) or []])
+        return UploadJob.from_dict(data)
+
+    def __checkpoint(self, job: UploadJob, unit: Optional[UploadUnit] = None):
+        """
+        保存任务检查点：不指定单元时整体写入，如提交、合并后单元有增减；
+        指定单元时只记下其所在的组，距上次写入超过CHECKPOINT_INTERVAL才写入
+        """
+        with self._lock:
+            positions = self._positions.get(job.job_id)
+            if unit is None or positions is None or unit.path not in positions:
+                self.__save(job)
+                return
+            self._dirty.setdefault(job.job_id, set()).add(positions[unit.path] // self.CHUNK_SIZE)
+            if time.time() - self._saved_at.get(job.job_id, 0) >= self.CHECKPOINT_INTERVAL:
+                self.__flush(job)
+
+    def __save(self, job: UploadJob):
+        """
+        整体写入任务信息和全部单元
+        """
+        data = job.to_dict()
+        units = data.pop("units")
+        old = self._store.get_data(self.JOB_KEY.format(job.job_id)) or {}
+        data["chunks"] = (len(units) + self.CHUNK_SIZE - 1) // self.CHUNK_SIZE
+        for n in range(data["chunks"]):
+            self._store.save_data(self.CHUNK_KEY.format(job.job_id, n),
+                                  units[n * self.CHUNK_SIZE:(n + 1) * self.CHUNK_SIZE])
+        for n in range(data["chunks"], old.get("chunks") or 0):
+            self._store.del_data(self.CHUNK_KEY.format(job.job_id, n))
+        self._store.save_data(self.JOB_KEY.format(job.job_id), data)
+        self._positions[job.job_id] = {unit.path: i for i, unit in enumerate(job.units)}
+        self._dirty.pop(job.job_id, None)
+        self._saved_at[job.job_id] = time.time()
+        if job.job_id not in self._indexed:
+            self._indexed.append(job.job_id)
+            self._store.save_data(self.INDEX_KEY, self._indexed)
+
+    def __flush(self, job: UploadJob):
+        """
+        写入任务信息和有变化的组
+        """
+        chunks = self._dirty.pop(job.job_id, set())
+        for n in sorted(chunks):
+            self._store.save_data(self.CHUNK_KEY.format(job.job_id, n),
+                                  [unit.to_list() for unit in job.units[n * self.CHUNK_SIZE:(n + 1) * self.CHUNK_SIZE]])
+        data = job.to_dict()
+        data.pop("units")
+        data["chunks"] = (len(job.units) + self.CHUNK_SIZE - 1) // self.CHUNK_SIZE
+        self._store.save_data(self.JOB_KEY.format(job.job_id), data)
+        self._saved_at[job.job_id] = time.time()
+
+    def __forget(self, job: UploadJob):
+        """
+        删除任务检查点
+        """
+        data = self._store.get_data(self.JOB_KEY.format(job.job_id)) or {}
+        for n in range(data.get("chunks") or 0):
+            self._store.del_data(self.CHUNK_KEY.format(job.job_id, n))
+        self._store.del_data(self.JOB_KEY.format(job.job_id))
+        for cache in (self._positions, self._dirty, self._saved_at):
+            cache.pop(job.job_id, None)
+        if job.job_id in self._indexed:
+            self._indexed.remove(job.job_id)
+            self._store.save_data(self.INDEX_KEY, self._indexed)
+
+    def __finish(self, job: UploadJob):
+        """
+        任务结束：全部成功时清理检查点，有失败单元时保留以便下次续传
+        """
+        with self._lock:
+            # 同一任务的单元由多个线程并行处理，只结束一次
+            if not job.finished or self._jobs.get(job.job_id) is not job:
+                return
+            self._jobs.pop(job.job_id, None)
+            job.finished_at = time.time()
+            records = self._store.get_data(self.RECORDS_KEY) or []
+            records.append(job.record())
+            self._store.save_data(self.RECORDS_KEY, records[-self.RECORDS_LIMIT:])
+            if job.count(UnitState.FAILED):
+                self.__save(job)
+            else:
+                self.__forget(job)
+        if self._on_finished:
+            self._on_finished(job)
+
+    def __process(self, item: Tuple[UploadJob, UploadUnit]) -> Any:
+        """
+        处理调度器分派的单元，返回是否实际传输了文件，转交后台执行时返回 UploadScheduler.DEFERRED
+        """
+        job, unit = item
+        with self._lock:
+            # 重复排队或已处理的单元
+            if unit.state != UnitState.PENDING:
+                return False
+            unit.state = UnitState.RUNNING
+            job.started = job.started or time.time()
+            self.__checkpoint(job, unit)
+        transferred = False
+        if self._skip and not job.force and self._skip(job, unit):
+            unit.state = UnitState.SKIPPED
+        else:
+            transferred = True
+            try:
+                result = self._submit(job, unit)
+            except Exception as e:
+                result = (False, str(e))
+            if result is None:
+                return UploadScheduler.DEFERRED
+            state, errmsg = result
+            unit.state = UnitState.DONE if state else UnitState.FAILED
+            unit.error = None if state else errmsg
+        self.__checkpoint(job, unit)
+        self.__finish(job)
+        return transferred
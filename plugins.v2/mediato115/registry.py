@@ -0,0 +1,255 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class InflightRegistry:
+    """
+    跨进程的上传任务登记表：多个MoviePilot工作进程共用数据目录下的SQLite文件，
+    按规范化的根目录和目标存储登记各进程正在上传的文件。相同目录的上传请求，不论季集范围、是否来自媒体库同步，
+    其中已由其他存活的进程上传的文件不再重复传输，并记录节省的文件数和大小；需要通知的请求登记为该进程的订阅者，
+    由其在上传结束后一并通知。所属进程退出后登记自动失效：同一主机上按进程号判断，其他主机按心跳超时判断，
+    失效登记的订阅者由下一个认领该目录的进程接管
+    """
+    # 心跳刷新间隔(秒)
+    HEARTBEAT_INTERVAL = 60
+    # 保留的合并记录数
+    LOG_LIMIT = 500
+    # 按文件查询登记时每条语句的参数个数，低于SQLite的参数上限
+    QUERY_BATCH = 500
+
+    def __init__(self, db_path: str, stale_after: float = 12 * 3600):
+        self._stale_after = stale_after
+        self._host = socket.gethostname()
+        self.owner = f"{self._host}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._last_touch = 0.0
+        # 事务由 BEGIN IMMEDIATE 显式开启，同一时刻只有一个进程能认领
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(claims)")]
+        if "files" in columns:
+            # 旧版本把登记的文件列表整体存为JSON，按文件查询重叠需要逐条解析，登记只在上传期间有效，直接重建
+            self._conn.execute("DROP TABLE claims")
+        self._conn.executescript("""
+            DROP TABLE IF EXISTS inflight;
+            CREATE TABLE IF NOT EXISTS claims (
+                key TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                root TEXT NOT NULL,
+                target TEXT NOT NULL,
+                title TEXT,
+                claimed_at REAL NOT NULL,
+                heartbeat REAL NOT NULL,
+                PRIMARY KEY (key, owner)
+            );
+            CREATE INDEX IF NOT EXISTS idx_claims_owner ON claims (owner);
+            CREATE TABLE IF NOT EXISTS claim_files (
+                target TEXT NOT NULL,
+                path TEXT NOT NULL,
+                key TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                PRIMARY KEY (target, path, key, owner)
+            );
+            CREATE INDEX IF NOT EXISTS idx_claim_files_owner ON claim_files (owner, key);
+            CREATE TABLE IF NOT EXISTS subscribers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                title TEXT,
+                target TEXT,
+                channel TEXT,
+                userid TEXT,
+                added_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_subscribers_key ON subscribers (key, owner);
+            CREATE TABLE IF NOT EXISTS dedup_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                target TEXT NOT NULL,
+                title TEXT,
+                owner TEXT NOT NULL,
+                attached_at REAL NOT NULL,
+                saved_files INTEGER NOT NULL,
+                saved_bytes INTEGER NOT NULL
+            );
+        """)
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __alive(self, owner: str, heartbeat: float) -> bool:
+        """
+        登记的所属进程是否仍在执行该任务
+        """
+        if owner == self.owner:
+            return True
+        host, _, rest = owner.partition(":")
+        pid = rest.partition(":")[0]
+        if host == self._host and pid.isdigit():
+            # 同一进程中已被替换的插件实例
+            if int(pid) == os.getpid():
+                return False
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                return False
+            except PermissionError:
+                pass
+            except OSError:
+                return False
+        return time.time() - heartbeat < self._stale_after
+
+    def claim(self, key: str, root: str, target: str, title: Optional[str], files: Iterable[str],
+              subscriber: Optional[Tuple[Any, Any]] = None) -> Tuple[Optional[str], Set[str]]:
+        """
+        认领目录中的文件：其中已由其他存活的进程登记的文件留给该进程上传，其余登记为本进程上传。
+        按 (目标存储, 文件) 查找其他进程登记的相同文件，上传命令的剧集根目录与媒体库同步的子目录相互去重。
+        返回 (其他进程标识, 其中已由其他进程上传的文件)，没有重叠时为 (None, 空集合)。
+        指定subscriber (渠道, 用户) 且有重叠时在同一事务中登记为该进程的订阅者，由其在上传结束后通知。
+        失效的登记在认领时清除，没有存活的登记的订阅者转由本进程通知
+        """
+        files = set(files)
+        now = time.time()
+        other, other_key, busy = None, None, set()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                alive: Dict[str, bool] = {}
+                for path, row_key, owner, heartbeat in self.__overlaps(target, files):
+                    if owner not in alive:
+                        alive[owner] = heartbeat is not None and self.__alive(owner, heartbeat)
+                        if not alive[owner]:
+                            self._conn.execute("DELETE FROM claims WHERE owner = ?", (owner,))
+                            self._conn.execute("DELETE FROM claim_files WHERE owner = ?", (owner,))
+                    if alive[owner]:
+                        other, other_key = (other, other_key) if other else (owner, row_key)
+                        busy.add(path)
+                if other and subscriber:
+                    channel, userid = subscriber
+                    self._conn.execute("INSERT INTO subscribers "
+                                       "(key, owner, title, target, channel, userid, added_at) "
+                                       "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                       (other_key, other, title, target, None if channel is None else str(channel),
+                                        None if userid is None else str(userid), now))
+                mine = files - busy
+                if mine:
+                    self._conn.execute("INSERT OR REPLACE INTO claims "
+                                       "(key, owner, root, target, title, claimed_at, heartbeat) "
+                                       "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                       (key, self.owner, os.path.normpath(root), target, title, now, now))
+                    self._conn.executemany("INSERT OR IGNORE INTO claim_files (target, path, key, owner) "
+                                           "VALUES (?, ?, ?, ?)",
+                                           ((target, path, key, self.owner) for path in mine))
+                    # 所属进程已失效或已停止、不再登记该目录的订阅者，其等待的文件由本进程上传，转由本进程通知
+                    self._conn.execute("UPDATE subscribers SET owner = ? WHERE key = ? AND owner NOT IN "
+                                       "(SELECT owner FROM claims WHERE key = ?)", (self.owner, key, key))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return other, busy
+
+    def __overlaps(self, target: str, files: Set[str]) -> List[Tuple[str, str, str, Optional[float]]]:
+        """
+        其他进程登记的相同文件 [(路径, 去重键, 所属进程, 心跳)]，按 (目标存储, 路径) 索引分批查询
+        """
+        paths = list(files)
+        rows = []
+        for i in range(0, len(paths), self.QUERY_BATCH):
+            batch = paths[i:i + self.QUERY_BATCH]
+            rows.extend(self._conn.execute(
+                "SELECT f.path, f.key, f.owner, c.heartbeat FROM claim_files f "
+                "LEFT JOIN claims c ON c.key = f.key AND c.owner = f.owner "
+                f"WHERE f.target = ? AND f.owner != ? AND f.path IN ({','.join('?' * len(batch))})",
+                (target, self.owner, *batch)).fetchall())
+        return rows
+
+    def attach(self, job_id: str, target: str, title: Optional[str], owner: str, files: int, size: int):
+        """
+        记录一次重复请求并入已有任务，以及因此少传的文件数和大小
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("INSERT INTO dedup_log "
+                                   "(job_id, target, title, owner, attached_at, saved_files, saved_bytes) "
+                                   "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                   (job_id, target, title, owner, time.time(), files, size))
+                self._conn.execute("DELETE FROM dedup_log WHERE id <= "
+                                   "(SELECT MAX(id) FROM dedup_log) - ?", (self.LOG_LIMIT,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def release(self, key: str) -> List[Dict[str, Any]]:
+        """
+        本进程该目录的上传全部结束，移除登记，返回并移除等待本进程通知的订阅者
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM claims WHERE key = ? AND owner = ?", (key, self.owner))
+                self._conn.execute("DELETE FROM claim_files WHERE owner = ? AND key = ?", (self.owner, key))
+                rows = self._conn.execute("SELECT title, target, channel, userid FROM subscribers "
+                                          "WHERE key = ? AND owner = ? ORDER BY id", (key, self.owner)).fetchall()
+                self._conn.execute("DELETE FROM subscribers WHERE key = ? AND owner = ?", (key, self.owner))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [dict(zip(("title", "target", "channel", "userid"), row)) for row in rows]
+
+    def release_all(self):
+        """
+        插件停止，移除本进程的全部登记，未完成的任务由下次启动的进程认领后续传，订阅者随之转交
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM claims WHERE owner = ?", (self.owner,))
+                self._conn.execute("DELETE FROM claim_files WHERE owner = ?", (self.owner,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def touch(self):
+        """
+        刷新本进程登记的心跳，间隔不足HEARTBEAT_INTERVAL时跳过
+        """
+        now = time.time()
+        if now - self._last_touch < self.HEARTBEAT_INTERVAL:
+            return
+        self._last_touch = now
+        with self._lock:
+            self._conn.execute("UPDATE claims SET heartbeat = ? WHERE owner = ?", (now, self.owner))
+
+    def stats(self, recent: int = 10) -> Dict[str, Any]:
+        """
+        登记中的目录数、等待通知的订阅者数、重复请求合并次数及节省的文件数和大小、最近的合并记录
+        """
+        with self._lock:
+            inflight, mine = self._conn.execute("SELECT COUNT(DISTINCT key), COUNT(DISTINCT CASE WHEN owner = ? "
+                                                "THEN key END) FROM claims", (self.owner,)).fetchone()
+            waiting, = self._conn.execute("SELECT COUNT(*) FROM subscribers").fetchone()
+            attached, files, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(saved_files), 0), "
+                                                       "COALESCE(SUM(saved_bytes), 0) FROM dedup_log").fetchone()
+            rows: List[tuple] = self._conn.execute("SELECT title, target, attached_at, saved_files, saved_bytes "
+                                                   "FROM dedup_log ORDER BY id DESC LIMIT ?", (recent,)).fetchall()
+        return {
+            "inflight": inflight,
+            "inflight_local": mine,
+            "subscribers": waiting,
+            "attached": attached,
+            "saved_files": files,
+            "saved_bytes": size,
+            "recent": [dict(zip(("title", "target", "attached_at", "saved_files", "saved_bytes"), row))
+                       for row in rows],
+        }
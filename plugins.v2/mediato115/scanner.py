@@ -0,0 +1,207 @@
+import os
+import threading
+from collections import OrderedDict
+from stat import S_ISREG
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .pathmatcher import StatCache
+
+
+class ScanSummary:
+    """
+    目录扫描统计：媒体文件和字幕、音轨等附属文件的数量与大小
+    """
+    __slots__ = ("media_files", "media_bytes", "sidecar_files", "sidecar_bytes")
+
+    def __init__(self):
+        self.media_files = 0
+        self.media_bytes = 0
+        self.sidecar_files = 0
+        self.sidecar_bytes = 0
+
+    @property
+    def files(self) -> int:
+        return self.media_files + self.sidecar_files
+
+    @property
+    def bytes(self) -> int:
+        return self.media_bytes + self.sidecar_bytes
+
+    def add(self, size: int, is_media: bool):
+        if is_media:
+            self.media_files += 1
+            self.media_bytes += size
+        else:
+            self.sidecar_files += 1
+            self.sidecar_bytes += size
+
+
+def scan_files(root: str, media_exts: Iterable[str], sidecar_exts: Iterable[str] = (),
+               stat_cache: Optional[StatCache] = None,
+               dirs: Optional[List[Tuple[str, float]]] = None) -> Iterator[Tuple[str, int, bool]]:
+    """
+    流式遍历根目录，逐个产出 (路径, 大小, 是否媒体文件)，只保留当前遍历路径上的目录句柄，
+    内存占用与文件数量无关，遍历得到的文件状态写入缓存供后续检查复用。
+    指定dirs时记录遍历到的各目录（根为文件时记录文件本身）及其修改时间
+    """
+    media_exts = {ext.lower() for ext in media_exts}
+    sidecar_exts = {ext.lower() for ext in sidecar_exts}
+
+    if stat_cache:
+        root_stat = stat_cache.stat(root)
+    else:
+        try:
+            root_stat = os.stat(root)
+        except OSError:
+            root_stat = None
+    if root_stat is None:
+        return
+    if dirs is not None:
+        dirs.append((root, root_stat.st_mtime))
+    if S_ISREG(root_stat.st_mode):
+        ext = os.path.splitext(root)[1].lower()
+        if ext in media_exts or ext in sidecar_exts:
+            yield root, root_stat.st_size, ext in media_exts
+        return
+
+    try:
+        stack = [os.scandir(root)]
+    except OSError:
+        return
+    try:
+        while stack:
+            try:
+                entry = next(stack[-1])
+            except StopIteration:
+                stack.pop().close()
+                continue
+            except OSError:
+                stack.pop().close()
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if dirs is not None:
+                        dirs.append((entry.path, entry.stat(follow_symlinks=False).st_mtime))
+                    stack.append(os.scandir(entry.path))
+                    continue
+            except OSError:
+                continue
+            ext = os.path.splitext(entry.name)[1].lower()
+            is_media = ext in media_exts
+            if not is_media and ext not in sidecar_exts:
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if stat_cache:
+                stat_cache.put(entry.path, stat)
+            yield entry.path, stat.st_size, is_media
+    finally:
+        for iterator in stack:
+            iterator.close()
+
+
+class ScanCache:
+    """
+    目录扫描结果缓存：记录扫描时各目录的修改时间，再次扫描同一根目录时只检查这些目录，
+    均未变化则直接复用上次的文件列表，不再逐个列出目录和读取文件状态。
+    目录中增删、重命名文件都会改变目录修改时间，原地改写文件内容不会，由上传时的哈希校验兜底。
+    缓存按文件总数限制：文件数超过单个根目录上限的目录只流式扫描、不缓存，总数超出时淘汰最久未用的根目录
+    """
+
+    def __init__(self, maxsize: int = 1024, max_files: int = 100000, max_root_files: int = 10000):
+        self._maxsize = maxsize
+        self._max_files = max_files
+        self._max_root_files = min(max_root_files, max_files)
+        # 根目录 -> (扩展名, 目录及修改时间, 文件列表)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # 已缓存的文件总数
+        self._files = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def files(self) -> int:
+        return self._files
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._files = 0
+
+    def scan(self, root: str, media_exts: Iterable[str], sidecar_exts: Iterable[str] = (),
+             stat_cache: Optional[StatCache] = None) -> Iterator[Tuple[str, int, bool]]:
+        """
+        扫描根目录，逐个产出 (路径, 大小, 是否媒体文件)，目录均未变化时复用缓存，
+        未命中时流式扫描，文件数不超过单个根目录上限且完整遍历后才写入缓存
+        """
+        exts = (tuple(sorted(ext.lower() for ext in media_exts)), tuple(sorted(ext.lower() for ext in sidecar_exts)))
+        with self._lock:
+            entry = self._entries.get(root)
+        if entry and entry[0] == exts and self.__unchanged(entry[1]):
+            with self._lock:
+                if root in self._entries:
+                    self._entries.move_to_end(root)
+            yield from entry[2]
+            return
+        dirs: Optional[List[Tuple[str, float]]] = []
+        files: Optional[List[Tuple[str, int, bool]]] = []
+        for file in scan_files(root, media_exts, sidecar_exts, stat_cache, dirs=dirs):
+            if files is not None:
+                files.append(file)
+                if len(files) > self._max_root_files:
+                    # 文件过多的目录不缓存，不再保留已扫描的列表
+                    files = None
+                    dirs.clear()
+            yield file
+        with self._lock:
+            self.__discard(root)
+            if files is not None and dirs:
+                self._entries[root] = (exts, dirs, files)
+                self._files += len(files)
+                self.__evict()
+
+    def __discard(self, root: str):
+        entry = self._entries.pop(root, None)
+        if entry is not None:
+            self._files -= len(entry[2])
+
+    def __evict(self):
+        while self._entries and (len(self._entries) > self._maxsize or self._files > self._max_files):
+            _, entry = self._entries.popitem(last=False)
+            self._files -= len(entry[2])
+
+    @staticmethod
+    def __unchanged(dirs: List[Tuple[str, float]]) -> bool:
+        """
+        目录修改时间直接读取，不经过文件状态缓存，刚加入的文件也能立即发现
+        """
+        for path, mtime in dirs:
+            try:
+                if os.stat(path).st_mtime != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def dump(self) -> Dict[str, Any]:
+        """
+        导出缓存内容，供写入预热快照
+        """
+        with self._lock:
+            return {root: entry for root, entry in self._entries.items()}
+
+    def load(self, entries: Dict[str, Any]):
+        """
+        导入预热快照中的扫描结果，已有的条目不覆盖
+        """
+        with self._lock:
+            for root, (exts, dirs, files) in entries.items():
+                if root not in self._entries and len(files) <= self._max_root_files:
+                    self._entries[root] = (tuple(map(tuple, exts)), [tuple(x) for x in dirs],
+                                           [tuple(x) for x in files])
+                    self._files += len(files)
+            self.__evict()
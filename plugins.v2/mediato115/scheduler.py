@@ -0,0 +1,212 @@
+import heapq
+import itertools
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+from app.log import logger
+
+# 带宽时段配置，如 "08:00-23:00 10" 表示该时段限速10MB/s，0表示不限速
+PROFILE_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*[=\s]\s*(\d+(?:\.\d+)?)\s*$")
+
+
+class Priority:
+    """
+    上传优先级，数值越小越优先
+    """
+    # 单个媒体的交互式上传
+    INTERACTIVE = 0
+    # 批量上传
+    BATCH = 10
+    # 媒体库定时同步
+    SYNC = 20
+
+
+class BandwidthProfile:
+    """
+    按时段配置的带宽限制，单位字节/秒，未配置的时段不限速
+    """
+
+    def __init__(self, rules: Optional[List[Tuple[int, int, float]]] = None):
+        # (开始分钟, 结束分钟, 字节/秒)
+        self.rules = rules or []
+
+    @classmethod
+    def parse(cls, text: str) -> Tuple["BandwidthProfile", List[str]]:
+        """
+        解析时段配置，每行一个时段，返回配置和无法解析的行
+        """
+        rules, invalid = [], []
+        for line in (text or "").splitlines():
+            if not line.strip():
+                continue
+            match = PROFILE_PATTERN.match(line)
+            if not match:
+                invalid.append(line.strip())
+                continue
+            start_h, start_m, end_h, end_m, rate = match.groups()
+            start, end = int(start_h) * 60 + int(start_m), int(end_h) * 60 + int(end_m)
+            if start >= 24 * 60 or end > 24 * 60:
+                invalid.append(line.strip())
+                continue
+            rules.append((start, end, float(rate) * 1024 * 1024))
+        return cls(rules), invalid
+
+    def rate(self, now: Optional[datetime] = None) -> float:
+        """
+        当前时段的带宽限制，0表示不限速
+        """
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        for start, end, rate in self.rules:
+            # 支持跨零点的时段，如 23:00-07:00
+            if start <= minute < end if start < end else (minute >= start or minute < end):
+                return rate
+        return 0
+
+
+class TokenBucket:
+    """
+    令牌桶：按当前时段速率补充令牌，单个文件可以透支，透支部分由后续任务等待偿还，
+    从而把平均提交速率控制在限制以内
+    """
+
+    def __init__(self, profile: BandwidthProfile, burst_seconds: float = 1.0):
+        self._profile = profile
+        self._burst_seconds = burst_seconds
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __refill(self, rate: float):
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._updated) * rate, rate * self._burst_seconds)
+        self._updated = now
+
+    def refund(self, size: int):
+        """
+        归还未实际使用的令牌
+        """
+        with self._lock:
+            rate = self._profile.rate()
+            if rate:
+                self._tokens = min(self._tokens + size, rate * self._burst_seconds)
+
+    def acquire(self, size: int, stop_event: threading.Event) -> bool:
+        """
+        获取令牌，令牌不足时等待，停止时返回False
+        """
+        while not stop_event.is_set():
+            with self._lock:
+                rate = self._profile.rate()
+                if not rate:
+                    self._tokens = 0.0
+                    self._updated = time.monotonic()
+                    return True
+                self.__refill(rate)
+                if self._tokens >= 0:
+                    self._tokens -= size
+                    return True
+                wait = min(-self._tokens / rate, 60)
+            # 分段等待，以便及时响应时段切换和停止
+            stop_event.wait(wait)
+        return False
+
+
+class UploadScheduler:
+    """
+    上传调度器：全局并发上限、按时段的带宽限制和优先级队列，
+    高优先级的任务先出队，同优先级按提交顺序执行
+    """
+    # 任务已转交后台执行，完成后由调用方通过release释放占用的并发名额
+    DEFERRED = object()
+
+    def __init__(self, run: Callable[[Any], bool], concurrency: int = 2,
+                 profile: Optional[BandwidthProfile] = None, name: str = "mediato115-upload"):
+        """
+        :param run: 执行单个任务，返回是否实际占用了带宽，返回DEFERRED时任务在后台继续执行
+        :param concurrency: 同时执行的任务数上限
+        :param profile: 带宽时段配置
+        """
+        self._run = run
+        self._concurrency = max(1, concurrency)
+        self._bucket = TokenBucket(profile or BandwidthProfile())
+        self._name = name
+        self._heap: List[Tuple[int, int, int, Any]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # 占用并发名额的任务数，包括转交后台尚未完成的任务
+        self.running = 0
+
+    @property
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def start(self):
+        self._stop_event.clear()
+        for i in range(self._concurrency):
+            thread = threading.Thread(target=self.__run, name=f"{self._name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        停止调度，正在执行的任务完成后退出，排队中的任务丢弃
+        """
+        self._stop_event.set()
+        with self._cond:
+            self._heap.clear()
+            self._cond.notify_all()
+        self._threads = []
+
+    def submit(self, priority: int, size: int, item: Any):
+        """
+        提交任务
+        """
+        with self._cond:
+            heapq.heappush(self._heap, (priority, next(self._counter), size, item))
+            self._cond.notify()
+
+    def occupy(self):
+        """
+        占用一个并发名额，用于恢复重启前已转交后台、仍在执行的任务
+        """
+        with self._cond:
+            self.running += 1
+
+    def release(self):
+        """
+        释放一个并发名额
+        """
+        with self._cond:
+            self.running = max(0, self.running - 1)
+            self._cond.notify()
+
+    def __run(self):
+        while not self._stop_event.is_set():
+            with self._cond:
+                while (not self._heap or self.running >= self._concurrency) and not self._stop_event.is_set():
+                    self._cond.wait()
+                if self._stop_event.is_set():
+                    return
+                _, _, size, item = heapq.heappop(self._heap)
+                self.running += 1
+            if not self._bucket.acquire(size, self._stop_event):
+                return
+            deferred = False
+            try:
+                result = self._run(item)
+                deferred = result is self.DEFERRED
+                if not result:
+                    self._bucket.refund(size)
+            except Exception as e:
+                self._bucket.refund(size)
+                logger.error(f"上传任务执行失败：{str(e)}")
+            finally:
+                if not deferred:
+                    self.release()
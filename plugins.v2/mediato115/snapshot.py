@@ -0,0 +1,65 @@
+import marshal
+import os
+import struct
+import sys
+import threading
+from typing import Any, Dict, Optional
+
+
+class WarmSnapshot:
+    """
+    预热快照：标题索引条目、文件状态和目录扫描结果以 marshal 二进制格式整体保存在数据目录，
+    插件重载后读取一次即可恢复，无需重新查询数据库和遍历文件系统。
+    文件头记录格式版本和Python版本，不一致或文件损坏时视为没有快照；写入先写临时文件再替换，不会读到写了一半的快照
+    """
+    MAGIC = b"MT115WS1"
+    # 魔数、marshal格式版本、Python主次版本
+    HEADER = struct.Struct("<8sBBB")
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def __header(self) -> bytes:
+        return self.HEADER.pack(self.MAGIC, marshal.version, sys.version_info[0], sys.version_info[1])
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        读取快照，没有快照或快照不可用时返回None
+        """
+        try:
+            with open(self._path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        header = self.__header()
+        if not data.startswith(header):
+            return None
+        try:
+            snapshot = marshal.loads(memoryview(data)[len(header):])
+        except (EOFError, ValueError, TypeError):
+            return None
+        return snapshot if isinstance(snapshot, dict) else None
+
+    def save(self, snapshot: Dict[str, Any]) -> int:
+        """
+        写入快照，返回写入的字节数
+        """
+        data = self.__header() + marshal.dumps(snapshot)
+        tmp_path = f"{self._path}.tmp"
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path)
+        return len(data)
+
+    def clear(self):
+        with self._lock:
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
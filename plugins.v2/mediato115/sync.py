@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.log import logger
+from .journal import SyncJournal
+from .pathmatcher import PathTrie
+from .pipeline import UploadUnit
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+class SyncResult:
+    """
+    一次同步的统计
+    """
+    __slots__ = ("mode", "dirs_scanned", "dirs_pruned", "files_queued", "bytes_queued", "unsettled",
+                 "started", "seconds")
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        # 列出了内容的目录数
+        self.dirs_scanned = 0
+        # 修改时间未变而跳过列出的目录数
+        self.dirs_pruned = 0
+        self.files_queued = 0
+        self.bytes_queued = 0
+        # 仍在写入、等待下次同步的文件数
+        self.unsettled = 0
+        self.started = time.time()
+        self.seconds = 0.0
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+class _DirtyHandler(FileSystemEventHandler):
+
+    def __init__(self, watcher: "DirtyWatcher"):
+        super().__init__()
+        self._watcher = watcher
+
+    def on_any_event(self, event):
+        paths = [event.src_path, getattr(event, "dest_path", None)]
+        for path in filter(None, paths):
+            path = os.fsdecode(path)
+            if event.is_directory:
+                self._watcher.mark(path)
+            self._watcher.mark(os.path.dirname(path))
+
+
+class DirtyWatcher:
+    """
+    文件系统监控：记录发生变化的目录，同步时只需处理这些目录，监控不可用时返回None由调用方回退到目录遍历
+    """
+
+    def __init__(self):
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        self._observer = None
+
+    @property
+    def available(self) -> bool:
+        return Observer is not None
+
+    def start(self, roots: Iterable[str]) -> bool:
+        """
+        开始监控，任一目录无法监控时放弃监控
+        """
+        if Observer is None:
+            return False
+        observer = Observer()
+        handler = _DirtyHandler(self)
+        try:
+            for root in roots:
+                if os.path.isdir(root):
+                    observer.schedule(handler, root, recursive=True)
+            observer.daemon = True
+            observer.start()
+        except Exception as e:
+            # 如inotify监控数量达到上限
+            logger.warning(f"无法监控媒体目录变化，将使用目录遍历同步：{str(e)}")
+            try:
+                observer.stop()
+            except Exception:
+                pass
+            return False
+        self._observer = observer
+        return True
+
+    def stop(self):
+        if self._observer:
+            try:
+                self._observer.stop()
+            except Exception:
+                pass
+            self._observer = None
+
+    def mark(self, path: str):
+        with self._lock:
+            self._dirty.add(path)
+
+    def drain(self) -> Optional[Set[str]]:
+        """
+        取出并清空变化的目录，监控已停止时返回None
+        """
+        if not self._observer or not self._observer.is_alive():
+            return None
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        return dirty
+
+
+class LibrarySync:
+    """
+    媒体库增量同步：对比同步日志找出新增或变化的媒体文件。
+    目录遍历模式下修改时间未变的目录只按日志中的子目录继续向下，不再列出内容，
+    监控模式下只处理发生变化的目录，全量首遍之后每次同步的耗时与变化量成正比
+    """
+    # 每处理多少个目录提交一次日志
+    COMMIT_EVERY = 500
+
+    def __init__(self, journal: SyncJournal, roots: List[str], media_exts: Iterable[str], target: str,
+                 settle: float = 120):
+        """
+        :param settle: 最近修改时间在该秒数内的文件视为仍在写入，留到下次同步
+        """
+        self._journal = journal
+        self._roots = [os.path.normpath(root) for root in roots]
+        self._matcher = PathTrie(self._roots)
+        self._media_exts = {ext.lower() for ext in media_exts}
+        self._target = target
+        self._settle = settle
+
+    def walk(self, result: SyncResult, full: bool = False) -> Iterator[Tuple[str, List[UploadUnit]]]:
+        """
+        遍历全部媒体目录，full为True时忽略目录修改时间，逐个产出 (目录, 待上传单元)
+        """
+        return self.__run(list(self._roots), result, force=full, descend_known=True)
+
+    def changed(self, dirty: Iterable[str], result: SyncResult) -> Iterator[Tuple[str, List[UploadUnit]]]:
+        """
+        只处理监控到变化的目录及上次未同步完成的目录，已记录的子目录由监控负责，不再向下遍历
+        """
+        dirs = {os.path.normpath(path) for path in dirty}
+        dirs.update(self._journal.pending_dirs(self._target))
+        return self.__run([path for path in dirs if self._matcher.match(path)], result,
+                          force=True, descend_known=False)
+
+    def __run(self, stack: List[str], result: SyncResult, force: bool,
+              descend_known: bool) -> Iterator[Tuple[str, List[UploadUnit]]]:
+        start = time.perf_counter()
+        processed = 0
+        try:
+            while stack:
+                directory = stack.pop()
+                processed += 1
+                if processed % self.COMMIT_EVERY == 0:
+                    self._journal.commit()
+                try:
+                    stat = os.stat(directory)
+                except OSError:
+                    self._journal.remove_dir(directory, self._target)
+                    continue
+                known, mtime = self._journal.get_dir(directory, self._target)
+                if known and not force and mtime == stat.st_mtime:
+                    result.dirs_pruned += 1
+                    stack.extend(self._journal.children(directory, self._target))
+                    continue
+                try:
+                    units, subdirs, unsettled = self.__scan(directory)
+                except OSError as e:
+                    logger.warning(f"无法列出目录：{directory} - {str(e)}")
+                    continue
+                result.dirs_scanned += 1
+                result.unsettled += unsettled
+                known_children = set(self._journal.children(directory, self._target)) if known else set()
+                parent = os.path.dirname(directory) if directory not in self._roots else None
+                # 有待上传或仍在写入的文件时不记录修改时间，下次同步再次检查
+                clean = not units and not unsettled
+                self._journal.update_dir(directory, self._target, parent, stat.st_mtime if clean else None, subdirs)
+                stack.extend(subdir for subdir in subdirs if descend_known or subdir not in known_children)
+                if units:
+                    result.files_queued += len(units)
+                    result.bytes_queued += sum(unit.size for unit in units)
+                    yield directory, units
+        finally:
+            self._journal.commit()
+            result.seconds = round(time.perf_counter() - start, 3)
+
+    def __scan(self, directory: str) -> Tuple[List[UploadUnit], List[str], int]:
+        """
+        列出目录，返回未同步或已变化的媒体文件、子目录及仍在写入的文件数，目录无法列出时抛出OSError
+        """
+        synced = self._journal.synced_files(directory, self._target)
+        units, subdirs, unsettled = [], [], 0
+        now = time.time()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                    if os.path.splitext(entry.name)[1].lower() not in self._media_exts:
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if synced.get(entry.path) == (stat.st_size, stat.st_mtime):
+                    continue
+                if now - stat.st_mtime < self._settle:
+                    unsettled += 1
+                    continue
+                units.append(UploadUnit(path=entry.path, size=stat.st_size))
+        units.sort(key=lambda unit: unit.path)
+        return units, subdirs, unsettled
@@ -0,0 +1,444 @@
+import heapq
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:
+    # 未安装pypinyin时不支持拼音和拼音首字母查询
+    Style = lazy_pinyin = None
+
+# 别名类型，匹配质量相同时按此排序
+ALIAS_TITLE, ALIAS_ORIGINAL, ALIAS_PINYIN, ALIAS_INITIALS = range(4)
+# 匹配类别，越小越好
+MATCH_EXACT, MATCH_PREFIX, MATCH_SUBSTRING, MATCH_WORDS, MATCH_FUZZY = range(5)
+
+_WORD_SEPARATORS = re.compile(r"[\W_]+")
+
+
+class MediaRecord:
+    """
+    媒体服务器条目的轻量快照，字段名与MediaServerItem保持一致
+    """
+    __slots__ = ("item_id", "title", "original_title", "year", "item_type", "path", "lst_mod_date")
+
+    def __init__(self, item_id: str, title: str, original_title: Optional[str] = None, year: Optional[str] = None,
+                 item_type: Optional[str] = None, path: Optional[str] = None, lst_mod_date: Optional[str] = None):
+        self.item_id = item_id
+        self.title = title
+        self.original_title = original_title
+        self.year = year
+        self.item_type = item_type
+        self.path = path
+        self.lst_mod_date = lst_mod_date
+
+    @classmethod
+    def from_item(cls, item: Any) -> "MediaRecord":
+        """
+        从MediaServerItem或同名字段的查询结果行构造
+        """
+        return cls(item_id=str(item.item_id),
+                   title=item.title,
+                   original_title=getattr(item, "original_title", None),
+                   year=getattr(item, "year", None),
+                   item_type=getattr(item, "item_type", None),
+                   path=getattr(item, "path", None),
+                   lst_mod_date=getattr(item, "lst_mod_date", None))
+
+
+def _fold(text: Optional[str]) -> str:
+    """
+    全半角统一、忽略大小写
+    """
+    return unicodedata.normalize("NFKC", text).casefold() if text else ""
+
+
+def normalize(text: Optional[str]) -> str:
+    """
+    标题归一化：全半角统一、忽略大小写，只保留文字和数字
+    """
+    return _WORD_SEPARATORS.sub("", _fold(text))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    按空白和标点切分为归一化的词，连续的中文作为一个词
+    """
+    return [word for word in _WORD_SEPARATORS.split(_fold(text)) if word]
+
+
+def ngrams(key: str, n: int = 2) -> Set[str]:
+    """
+    切分n-gram，不足n个字符时整体作为一个gram
+    """
+    if len(key) <= n:
+        return {key} if key else set()
+    return {key[i:i + n] for i in range(len(key) - n + 1)}
+
+
+def pinyin_keys(text: Optional[str]) -> Tuple[str, str]:
+    """
+    中文标题的全拼和拼音首字母，不含中文或未安装pypinyin时返回空字符串
+    """
+    if lazy_pinyin is None or not text or not any("\u4e00" <= ch <= "\u9fff" for ch in text):
+        return "", ""
+    return (normalize("".join(lazy_pinyin(text))),
+            normalize("".join(lazy_pinyin(text, style=Style.FIRST_LETTER))))
+
+
+def analyze_record(record: Any) -> Tuple[List[Tuple[int, str]], Set[str]]:
+    """
+    条目可供匹配的别名 (别名类型, 归一化文本) 及标题中的词。
+    别名包括标题、原始标题、标题全拼、标题拼音首字母，重复的只保留一个
+    """
+    title, original = _fold(record.title), _fold(getattr(record, "original_title", None))
+    pinyin, initials = pinyin_keys(record.title)
+    aliases = []
+    for kind, key in ((ALIAS_TITLE, _WORD_SEPARATORS.sub("", title)),
+                      (ALIAS_ORIGINAL, _WORD_SEPARATORS.sub("", original)),
+                      (ALIAS_PINYIN, pinyin),
+                      (ALIAS_INITIALS, initials)):
+        if key and all(key != other for _, other in aliases):
+            aliases.append((kind, key))
+    words = {word for text in (title, original) for word in _WORD_SEPARATORS.split(text) if word}
+    return aliases, words
+
+
+def match_rank(key: str, query: str) -> Optional[Tuple[int, int, int]]:
+    """
+    计算匹配质量，越小越好：完全匹配 < 前缀匹配 < 包含匹配，其次按匹配位置和多余长度
+    不匹配时返回None
+    """
+    pos = key.find(query)
+    if pos < 0:
+        return None
+    if key == query:
+        kind = MATCH_EXACT
+    elif pos == 0:
+        kind = MATCH_PREFIX
+    else:
+        kind = MATCH_SUBSTRING
+    return kind, pos, len(key) - len(query)
+
+
+def score_aliases(aliases: List[Tuple[int, str]], query: str, words: List[str]) -> Optional[Tuple[int, ...]]:
+    """
+    按别名计算最佳匹配质量 (匹配类别, 编辑距离, 别名类型, 匹配位置, 多余长度)，
+    整体不匹配时多个词分别出现在别名中也算匹配，不匹配时返回None
+    """
+    best = None
+    for kind, key in aliases:
+        rank = match_rank(key, query)
+        if rank is not None:
+            score = (rank[0], 0, kind, rank[1], rank[2])
+            if best is None or score < best:
+                best = score
+    if best is None and len(words) > 1 and all(any(word in key for _, key in aliases) for word in words):
+        best = (MATCH_WORDS, 0, ALIAS_TITLE, 0, 0)
+    return best
+
+
+def fuzzy_limit(query: str) -> int:
+    """
+    允许的编辑距离：短查询要求精确，越长容错越多，最多2
+    """
+    if len(query) <= 3:
+        return 0
+    return 1 if len(query) <= 7 else 2
+
+
+def bounded_distance(query: str, key: str, limit: int) -> Optional[int]:
+    """
+    查询词与标题中最接近的一段之间的编辑距离，超过limit时提前结束并返回None
+    """
+    if len(query) - limit > len(key):
+        return None
+    previous = [0] * (len(key) + 1)
+    for i, qc in enumerate(query, 1):
+        current = [i]
+        lowest = i
+        for j, kc in enumerate(key, 1):
+            value = min(previous[j - 1] + (qc != kc), current[j - 1] + 1, previous[j] + 1)
+            current.append(value)
+            if value < lowest:
+                lowest = value
+        if lowest > limit:
+            return None
+        previous = current
+    distance = min(previous)
+    return distance if distance <= limit else None
+
+
+def rank_records(records: Iterable[Any], title: str) -> List[Tuple[int, Any]]:
+    """
+    过滤出标题或原始标题、拼音匹配查询词的条目，按匹配质量排序，返回 [(匹配类别, 条目)]
+    """
+    query = normalize(title)
+    words = tokenize(title)
+    scored = []
+    for record in records:
+        score = score_aliases(analyze_record(record)[0], query, words) if query else None
+        if score is not None:
+            scored.append((score, record.title or "", str(record.item_id), record))
+    scored.sort(key=lambda x: x[:3])
+    return [(x[0][0], x[3]) for x in scored]
+
+
+def exact_matches(records: Iterable[Any], title: str) -> List[Any]:
+    """
+    标题或原始标题与查询词完全一致的条目
+    """
+    query = normalize(title)
+    return [record for record in records
+            if query and query in (normalize(record.title), normalize(getattr(record, "original_title", None)))]
+
+
+class TitleIndex:
+    """
+    媒体标题内存索引，替代数据库的 ilike '%title%' 全表扫描，别名包括标题、原始标题和中文标题的拼音：
+    - 别名二元组倒排表：包含查询词的条目
+    - 单字倒排表：别名中出现的每个字，单字查询和多个词中的单字词都能直接定位，不必扫描全部条目
+    - 别名三元组倒排表：没有精确匹配时，按共有的n-gram数筛出候选再计算编辑距离，容忍输错字
+    - 别名首字倒排表：只取前若干个结果时，完全匹配和前缀匹配足够则只在首字相同的条目中打分
+    """
+    NGRAM = 2
+    FUZZY_NGRAM = 3
+    # 计算编辑距离的候选条目数上限
+    FUZZY_CANDIDATES = 50
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._records: Dict[str, MediaRecord] = {}
+        self._aliases: Dict[str, List[Tuple[int, str]]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        # 三元组只用于计数，多数只对应少量条目，用列表比集合节省内存
+        self._trigrams: Dict[str, List[str]] = {}
+        self._chars: Dict[str, Set[str]] = {}
+        # 首字只用于取前若干个结果，用列表节省内存
+        self._heads: Dict[str, List[str]] = {}
+        self._ready = False
+        # 已索引数据对应的媒体库版本：(条目数, 最后更新时间)
+        self.version: Optional[Tuple[int, Optional[str]]] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @classmethod
+    def __keys(cls, aliases: List[Tuple[int, str]]) -> Tuple[Set[str], Set[str], Set[str], Set[str]]:
+        """
+        条目在各倒排表中的键：别名二元组、别名三元组、别名中的字、别名首字
+        """
+        grams, trigrams, chars = set(), set(), set()
+        for _, key in aliases:
+            grams |= ngrams(key, cls.NGRAM)
+            trigrams |= ngrams(key, cls.FUZZY_NGRAM)
+            chars.update(key)
+        return grams, trigrams, chars, {key[0] for _, key in aliases}
+
+    def __add(self, record: MediaRecord, records: Dict[str, MediaRecord], aliases: Dict[str, List[Tuple[int, str]]],
+              tables: Tuple[dict, dict, dict, dict]):
+        item_id = record.item_id
+        record_aliases = analyze_record(record)[0]
+        records[item_id] = record
+        aliases[item_id] = record_aliases
+        grams, trigrams, chars, heads = self.__keys(record_aliases)
+        for table, keys in ((tables[0], grams), (tables[2], chars)):
+            for key in keys:
+                posting = table.get(key)
+                if posting is None:
+                    table[key] = {item_id}
+                else:
+                    posting.add(item_id)
+        for table, keys in ((tables[1], trigrams), (tables[3], heads)):
+            for key in keys:
+                posting = table.get(key)
+                if posting is None:
+                    table[key] = [item_id]
+                else:
+                    posting.append(item_id)
+
+    def build(self, records: Iterable[MediaRecord], version: Optional[Tuple[int, Optional[str]]] = None):
+        """
+        全量构建索引，构建完成后整体替换，构建期间不影响查询
+        """
+        new_records: Dict[str, MediaRecord] = {}
+        new_aliases: Dict[str, List[Tuple[int, str]]] = {}
+        tables: Tuple[dict, dict, dict, dict] = ({}, {}, {}, {})
+        for record in records:
+            self.__add(record, new_records, new_aliases, tables)
+        with self._lock:
+            self._records = new_records
+            self._aliases = new_aliases
+            self._postings, self._trigrams, self._chars, self._heads = tables
+            self.version = version
+            self._ready = True
+
+    def dump(self) -> Tuple[List[tuple], Optional[Tuple[int, Optional[str]]]]:
+        """
+        导出全部条目（按MediaRecord字段顺序的元组）和索引版本，供写入预热快照
+        """
+        with self._lock:
+            records = [tuple(getattr(record, field) for field in MediaRecord.__slots__)
+                       for record in self._records.values()]
+            return records, self.version
+
+    def upsert(self, record: MediaRecord):
+        """
+        新增或更新单个条目
+        """
+        with self._lock:
+            self.remove(record.item_id)
+            self.__add(record, self._records, self._aliases,
+                       (self._postings, self._trigrams, self._chars, self._heads))
+
+    def remove(self, item_id: str):
+        """
+        删除单个条目
+        """
+        with self._lock:
+            record = self._records.pop(item_id, None)
+            if record is None:
+                return
+            self._aliases.pop(item_id, None)
+            # 倒排表的键不单独保存，按条目重新计算
+            keys = self.__keys(analyze_record(record)[0])
+            for table, table_keys in zip((self._postings, self._trigrams, self._chars, self._heads), keys):
+                for key in table_keys:
+                    posting = table.get(key)
+                    if posting is None:
+                        continue
+                    if isinstance(posting, list):
+                        if item_id in posting:
+                            posting.remove(item_id)
+                    else:
+                        posting.discard(item_id)
+                    if not posting:
+                        del table[key]
+
+    def get(self, item_id: str) -> Optional[MediaRecord]:
+        """
+        按item_id获取条目
+        """
+        return self._records.get(str(item_id))
+
+    def __intersect(self, key: str) -> Iterable[str]:
+        """
+        别名包含key的候选条目，key短于二元组时按单字倒排表查找
+        """
+        if len(key) < self.NGRAM:
+            return self._chars.get(key, ())
+        postings = []
+        for gram in ngrams(key, self.NGRAM):
+            posting = self._postings.get(gram)
+            if not posting:
+                return ()
+            postings.append(posting)
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:]) if len(postings) > 1 else postings[0]
+
+    def __word_candidates(self, words: List[str]) -> Set[str]:
+        """
+        每个词都出现在别名中的候选条目
+        """
+        candidates: Optional[Set[str]] = None
+        for word in sorted(words, key=len, reverse=True):
+            found = self.__intersect(word)
+            candidates = set(found) if candidates is None else candidates.intersection(found)
+            if not candidates:
+                return set()
+        return candidates or set()
+
+    def __fuzzy(self, query: str) -> List[Tuple[Tuple[int, ...], str, str]]:
+        """
+        按编辑距离模糊匹配：每处编辑最多破坏n个n-gram，共有n-gram数不足的条目不可能在容错范围内，
+        剩余候选按共有n-gram数取前若干个计算编辑距离。查询较短时三元组筛不出候选，改用二元组
+        """
+        limit = fuzzy_limit(query)
+        if not limit:
+            return []
+        n, postings = self.FUZZY_NGRAM, self._trigrams
+        if len(query) - n + 1 - n * limit < 1:
+            n, postings = self.NGRAM, self._postings
+        grams = ngrams(query, n)
+        need = len(grams) - n * limit
+        if need < 1:
+            return []
+        counts: Counter = Counter()
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting:
+                counts.update(posting)
+        candidates = heapq.nlargest(self.FUZZY_CANDIDATES,
+                                    ((shared, item_id) for item_id, shared in counts.items() if shared >= need))
+        scored = []
+        for _, item_id in candidates:
+            best = None
+            for kind, key in self._aliases[item_id]:
+                distance = bounded_distance(query, key, limit)
+                if distance is not None:
+                    score = (MATCH_FUZZY, distance, kind, 0, abs(len(key) - len(query)))
+                    if best is None or score < best:
+                        best = score
+            if best is not None:
+                scored.append((best, self._records[item_id].title or "", item_id))
+        return scored
+
+    def __score(self, item_ids: Iterable[str], query: str, words: List[str],
+                worst: int = MATCH_WORDS) -> List[Tuple[Tuple[int, ...], str, str]]:
+        """
+        为候选条目打分，只保留匹配类别不差于worst的条目
+        """
+        aliases = self._aliases
+        records = self._records
+        scored = []
+        for item_id in item_ids:
+            score = score_aliases(aliases[item_id], query, words)
+            if score is not None and score[0] <= worst:
+                scored.append((score, records[item_id].title or "", item_id))
+        return scored
+
+    def search(self, title: str, limit: Optional[int] = None) -> List[MediaRecord]:
+        """
+        按标题查询，结果按匹配质量排序，见search_ranked
+        """
+        return [record for _, record in self.search_ranked(title, limit)]
+
+    def search_ranked(self, title: str, limit: Optional[int] = None) -> List[Tuple[int, MediaRecord]]:
+        """
+        按标题查询，返回 [(匹配类别, 条目)]，按匹配质量排序：完全匹配、前缀、包含、多个词分别匹配，
+        都没有时按编辑距离模糊匹配。
+        指定limit时只返回最好的limit个：完全匹配和前缀匹配优于其他匹配，且其别名都以查询词的首字开头，
+        候选较多时先在首字倒排表中找这两类匹配，足够limit个时不再为其余候选打分
+        """
+        query = normalize(title)
+        if not query:
+            return []
+        words = tokenize(title)
+        with self._lock:
+            candidates = self.__intersect(query)
+            if len(words) > 1:
+                candidates = set(candidates) | self.__word_candidates(words)
+            scored = None
+            if limit and len(candidates) > limit:
+                heads = self._heads.get(query[0], ())
+                if len(heads) < len(candidates):
+                    scored = self.__score(set(heads), query, words, worst=MATCH_PREFIX)
+                    if len(scored) < limit:
+                        scored = None
+            if scored is None:
+                scored = self.__score(candidates, query, words)
+            if not scored:
+                scored = self.__fuzzy(query)
+            records = self._records
+        if limit:
+            scored = heapq.nsmallest(limit, scored)
+        else:
+            scored.sort()
+        return [(x[0][0], records[x[2]]) for x in scored]
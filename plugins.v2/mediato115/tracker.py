@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class InflightTransfer:
+    """
+    已转交后台整理、等待结果事件的文件，job_ids为等待该结果的全部任务，先提交的在前
+    """
+    __slots__ = ("job_ids", "title", "target", "path", "size", "started", "deadline")
+
+    def __init__(self, job_ids: List[str], title: str, target: str, path: str, size: int, started: float,
+                 deadline: float):
+        self.job_ids = job_ids
+        self.title = title
+        self.target = target
+        self.path = path
+        self.size = size
+        self.started = started
+        self.deadline = deadline
+
+
+class TransferTracker:
+    """
+    后台整理登记表：提交整理前按源文件路径和目标存储登记，收到整理完成或失败事件时找回对应的任务，
+    无需轮询整理状态，也不为每个任务保留线程。
+    同一文件正在整理到同一存储时，其他任务并入已有的登记等待同一个结果，不重复提交整理；
+    同一文件可能同时整理到多个存储，事件未带目标存储时按登记先后取回。
+    事件丢失时按超时清理，超时按文件大小和最低速率估算
+    """
+
+    def __init__(self, min_timeout: float = 3600, min_rate: float = 512 * 1024):
+        self._min_timeout = min_timeout
+        self._min_rate = min_rate
+        # 源文件路径 -> 目标存储 -> 登记，按登记先后排列
+        self._transfers: Dict[str, Dict[str, InflightTransfer]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(targets) for targets in self._transfers.values())
+
+    @staticmethod
+    def __key(path: str) -> str:
+        return os.path.normpath(path)
+
+    def track(self, job_id: str, title: str, target: str, path: str, size: int) -> Tuple[InflightTransfer, bool]:
+        """
+        登记即将提交整理的文件，返回 (登记, 是否并入已有的登记)。
+        并入时无需再提交整理；已超时的登记由新的整理接替，原来等待的任务一并等待新的结果
+        """
+        now = time.time()
+        with self._lock:
+            targets = self._transfers.setdefault(self.__key(path), {})
+            current = targets.get(target)
+            if current is not None and current.deadline > now:
+                if job_id not in current.job_ids:
+                    current.job_ids.append(job_id)
+                return current, True
+            job_ids = [i for i in current.job_ids if i != job_id] if current is not None else []
+            transfer = InflightTransfer(job_ids=job_ids + [job_id], title=title, target=target, path=path,
+                                        size=size, started=now,
+                                        deadline=now + max(self._min_timeout, size / self._min_rate))
+            targets.pop(target, None)
+            targets[target] = transfer
+        return transfer, False
+
+    def resolve(self, path: str, target: Optional[str] = None) -> Optional[InflightTransfer]:
+        """
+        取回并移除文件的登记，未指定目标存储时取最早的登记，不是本插件提交的整理时返回None
+        """
+        key = self.__key(path)
+        with self._lock:
+            targets = self._transfers.get(key)
+            if not targets:
+                return None
+            if target is None:
+                target = next(iter(targets))
+            transfer = targets.pop(target, None)
+            if not targets:
+                del self._transfers[key]
+            return transfer
+
+    def contains(self, job_id: str, path: str, target: str) -> bool:
+        with self._lock:
+            transfer = self._transfers.get(self.__key(path), {}).get(target)
+        return transfer is not None and job_id in transfer.job_ids
+
+    def expired(self) -> List[InflightTransfer]:
+        """
+        取回并移除已超时仍未收到结果的登记
+        """
+        now = time.time()
+        expired = []
+        with self._lock:
+            for key in list(self._transfers):
+                targets = self._transfers[key]
+                for target in [target for target, transfer in targets.items() if transfer.deadline <= now]:
+                    expired.append(targets.pop(target))
+                if not targets:
+                    del self._transfers[key]
+        return expired
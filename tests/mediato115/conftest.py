@@ -0,0 +1,13 @@
+"""
+测试公共配置：注册基准测试中的MoviePilot替身模块后导入插件包
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "benchmarks" / "mediato115"))
+
+import _moviepilot  # noqa: E402
+
+_moviepilot.install()
+sys.path.insert(0, str(ROOT / "plugins.v2"))
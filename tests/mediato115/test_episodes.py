@@ -0,0 +1,79 @@
+"""
+季集范围：解析命令末尾的季集范围和文件名中的季集编号，按范围选择需要上传的文件
+"""
+import pytest
+
+from mediato115.episodes import EpisodeIndex, EpisodeSelection, parse_episode, split_episode_spec
+
+LAST = 1 << 30
+
+
+@pytest.mark.parametrize("text, ranges", [
+    ("S02", [((2, 0), (2, LAST))]),
+    ("s01e05", [((1, 5), (1, 5))]),
+    ("S01E05-E10", [((1, 5), (1, 10))]),
+    ("S01E05-10", [((1, 5), (1, 10))]),
+    ("S01-S03", [((1, 0), (3, LAST))]),
+    ("S01-03", [((1, 0), (3, LAST))]),
+    ("S01E05-S02E03", [((1, 5), (2, 3))]),
+    ("S01E05-S02", [((1, 5), (2, LAST))]),
+])
+def test_spec_is_parsed(text, ranges):
+    assert EpisodeSelection.parse(text).ranges == ranges
+
+
+@pytest.mark.parametrize("text", ["S03-S01", "S01E10-E05", "S01-E03", "E05", "2049", "S01E05E06", "Season1"])
+def test_invalid_or_reversed_spec_is_rejected(text):
+    assert EpisodeSelection.parse(text) is None
+
+
+def test_split_episode_spec():
+    title, selection = split_episode_spec("Breaking Bad S01 s03e01-e04")
+    assert title == "Breaking Bad"
+    assert selection.label == "S01 S03E01-E04"
+    assert selection.ranges == [((1, 0), (1, LAST)), ((3, 1), (3, 4))]
+    # 没有季集范围，或只剩季集范围时作为名称
+    assert split_episode_spec("Blade Runner 2049") == ("Blade Runner 2049", None)
+    assert split_episode_spec("S01") == ("S01", None)
+
+
+@pytest.mark.parametrize("path, episode", [
+    ("/tv/Show/Season 1/Show.S01E03.1080p.mkv", (1, 3, 3)),
+    ("/tv/Show/Show.S02E01E02.mkv", (2, 1, 2)),
+    ("/tv/Show/Show.S02E01-E03.mkv", (2, 1, 3)),
+    ("/tv/Show/Show.S02E01-02.mkv", (2, 1, 2)),
+    ("/tv/Show/Show.s01.e07.mkv", (1, 7, 7)),
+    # 分辨率不是结束集编号
+    ("/tv/Show/Show.S01E01-1080p.mkv", (1, 1, 1)),
+    # 只有集编号时季取自所在的季目录
+    ("/tv/Show/Season 2/EP05.mkv", (2, 5, 5)),
+    ("/tv/Show/第3季/第12集.mkv", (3, 12, 12)),
+    ("/tv/Show/Specials/E01.mkv", (0, 1, 1)),
+    ("/tv/Show/E04.mkv", (1, 4, 4)),
+])
+def test_file_episode_is_parsed(path, episode):
+    assert parse_episode(path) == episode
+
+
+@pytest.mark.parametrize("path", ["/tv/Show/Show.mkv", "/tv/Show/Season 1/poster.jpg", "/tv/Show/Best.1080p.mkv",
+                                  "/tv/Show/Xs01e01.mkv"])
+def test_file_without_episode_is_unknown(path):
+    assert parse_episode(path) is None
+
+
+def test_index_selects_files_in_range():
+    files = [f"/tv/Show/Season 1/Show.S01E{i:02d}.mkv" for i in range(1, 11)] + [
+        "/tv/Show/Season 2/Show.S02E01E02.mkv",
+        "/tv/Show/Season 2/Show.S02E03.mkv",
+        "/tv/Show/Show.nfo",
+    ]
+    index = EpisodeIndex(files)
+    assert len(index) == 12 and index.unknown == 1
+    assert index.describe() == "S01(E01-E10)、S02(E01-E03)"
+    assert index.select(EpisodeSelection.parse("S01E09-S02E01")) == {
+        "/tv/Show/Season 1/Show.S01E09.mkv", "/tv/Show/Season 1/Show.S01E10.mkv",
+        "/tv/Show/Season 2/Show.S02E01E02.mkv"}
+    # 多集文件与范围有重叠即选中
+    assert index.select(EpisodeSelection.parse("S02E02")) == {"/tv/Show/Season 2/Show.S02E01E02.mkv"}
+    _, selection = split_episode_spec("Show S01E01 S02")
+    assert len(index.select(selection)) == 3
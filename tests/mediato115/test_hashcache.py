@@ -0,0 +1,169 @@
+"""
+已上传内容跳过：替身存储记录已有内容的SHA1，上传流水线跳过已存在的文件并记为已上传
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+
+from mediato115.hashcache import HashCache
+from mediato115.pipeline import UnitState, UploadJob, UploadPipeline, UploadUnit
+
+TARGET = "u115"
+
+
+class FakeStorage:
+    """
+    模拟115：按SHA1记录已有的内容，上传时计算收到的文件的SHA1
+    """
+
+    def __init__(self, known=()):
+        self.known = set(known)
+        self.received = []
+
+    def exists(self, target: str, sha1: str) -> bool:
+        return target == TARGET and sha1 in self.known
+
+    def upload(self, job: UploadJob, unit: UploadUnit):
+        with open(unit.path, "rb") as f:
+            self.known.add(hashlib.sha1(f.read()).hexdigest().upper())
+        self.received.append(os.path.basename(unit.path))
+        return True, ""
+
+
+class Store(dict):
+
+    def get_data(self, key):
+        return self.get(key)
+
+    def save_data(self, key, value):
+        self[key] = value
+
+    def del_data(self, key):
+        self.pop(key, None)
+
+
+def _write(path, content: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(content)
+    return str(path)
+
+
+def _sha1(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest().upper()
+
+
+def _run(cache: HashCache, storage: FakeStorage, paths, force: bool = False) -> UploadJob:
+    """
+    按插件的方式提交一个任务：跳过已上传的内容，上传成功后记录内容哈希，强制上传时先移除已上传记录
+    """
+    finished = threading.Event()
+
+    def submit(job, unit):
+        if job.force:
+            cache.forget(unit.path, job.target)
+        result = storage.upload(job, unit)
+        cache.mark_uploaded(unit.path, job.target)
+        return result
+
+    pipeline = UploadPipeline(store=Store(), submit=submit,
+                              skip=lambda job, unit: cache.is_uploaded(unit.path, job.target),
+                              on_finished=lambda job: finished.set())
+    pipeline.start()
+    try:
+        job = pipeline.submit(UploadJob(job_id=UploadJob.make_id("/media", TARGET), title="test", root="/media",
+                                        target=TARGET, units=[UploadUnit(path=path) for path in paths],
+                                        force=force))
+        assert finished.wait(5)
+    finally:
+        pipeline.stop()
+    return job
+
+
+def test_known_content_is_skipped_and_marked_done(tmp_path):
+    a = _write(tmp_path / "a.mkv", b"movie a")
+    b = _write(tmp_path / "b.mkv", b"movie b")
+    storage = FakeStorage(known={_sha1(b"movie a")})
+    cache = HashCache(str(tmp_path / "hashcache.db"), remote=storage.exists)
+    try:
+        job = _run(cache, storage, [a, b])
+        assert {unit.path: unit.state for unit in job.units} == {a: UnitState.SKIPPED, b: UnitState.DONE}
+        assert storage.received == ["b.mkv"]
+        # 远端查询命中和上传成功的内容都已记录，之后无需再查询
+        storage.known.clear()
+        assert cache.is_uploaded(a, TARGET)
+        assert cache.is_uploaded(b, TARGET)
+        assert not cache.is_uploaded(a, "alipan")
+    finally:
+        cache.close()
+
+
+def test_same_content_at_another_path_is_skipped(tmp_path):
+    storage = FakeStorage()
+    cache = HashCache(str(tmp_path / "hashcache.db"))
+    try:
+        _run(cache, storage, [_write(tmp_path / "a.mkv", b"movie a")])
+        job = _run(cache, storage, [_write(tmp_path / "copy.mkv", b"movie a"),
+                                    _write(tmp_path / "c.mkv", b"movie c")])
+        assert [unit.state for unit in job.units] == [UnitState.SKIPPED, UnitState.DONE]
+        assert storage.received == ["a.mkv", "c.mkv"]
+    finally:
+        cache.close()
+
+
+def test_force_uploads_known_content_again(tmp_path):
+    a = _write(tmp_path / "a.mkv", b"movie a")
+    storage = FakeStorage()
+    cache = HashCache(str(tmp_path / "hashcache.db"))
+    try:
+        _run(cache, storage, [a])
+        # 网盘上的文件已被删除，强制上传不检查记录
+        storage.known.clear()
+        job = _run(cache, storage, [a, _write(tmp_path / "copy.mkv", b"movie a")], force=True)
+        assert [unit.state for unit in job.units] == [UnitState.DONE, UnitState.DONE]
+        assert storage.received == ["a.mkv", "a.mkv", "copy.mkv"]
+        assert cache.is_uploaded(a, TARGET)
+    finally:
+        cache.close()
+
+
+def test_forget_clears_record_for_same_content(tmp_path):
+    storage = FakeStorage()
+    cache = HashCache(str(tmp_path / "hashcache.db"))
+    try:
+        _run(cache, storage, [_write(tmp_path / "a.mkv", b"movie a")])
+        copy = _write(tmp_path / "copy.mkv", b"movie a")
+        assert cache.is_uploaded(copy, TARGET)
+        cache.forget(copy, TARGET)
+        assert not cache.is_uploaded(copy, TARGET)
+    finally:
+        cache.close()
+
+
+def test_changed_file_is_hashed_again(tmp_path):
+    path = tmp_path / "a.mkv"
+    storage = FakeStorage()
+    cache = HashCache(str(tmp_path / "hashcache.db"))
+    try:
+        _run(cache, storage, [_write(path, b"movie a")])
+        _write(path, b"movie a, director's cut")
+        os.utime(path, (1, 1))
+        assert cache.get(str(path)) == _sha1(b"movie a, director's cut")
+        assert not cache.is_uploaded(str(path), TARGET)
+    finally:
+        cache.close()
+
+
+def test_legacy_cache_with_preflight_hash_is_rebuilt(tmp_path):
+    db_path = str(tmp_path / "hashcache.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE file_hash (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, "
+                 "sha1 TEXT NOT NULL, preid TEXT NOT NULL)")
+    conn.commit()
+    conn.close()
+    path = _write(tmp_path / "a.mkv", b"movie a")
+    cache = HashCache(db_path)
+    try:
+        assert cache.get(path) == _sha1(b"movie a")
+    finally:
+        cache.close()
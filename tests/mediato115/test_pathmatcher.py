@@ -0,0 +1,34 @@
+"""
+允许目录匹配：按目录层级匹配前缀，同名前缀的兄弟目录和 ".." 跳出的路径不在允许目录下
+"""
+from mediato115.pathmatcher import PathTrie, split_path
+
+
+def test_sibling_with_common_prefix_is_not_matched():
+    trie = PathTrie(["/media"])
+    assert trie.match("/media/movies/a.mkv") == "/media"
+    assert trie.match("/media") == "/media"
+    assert trie.match("/media2/movies/a.mkv") is None
+    assert trie.match("/med") is None
+
+
+def test_parent_references_cannot_escape_root():
+    trie = PathTrie(["/media/movies"])
+    assert trie.match("/media/movies/../../etc/passwd") is None
+    assert trie.match("/media/movies/../tv/a.mkv") is None
+    assert trie.match("/media/tv/../movies/a.mkv") == "/media/movies"
+    assert trie.match("/media/movies/a/../b.mkv") == "/media/movies"
+
+
+def test_roots_are_normalized():
+    trie = PathTrie(["/media/movies/", "/data//tv", "/media/movies"])
+    assert len(trie) == 2
+    assert trie.match("/data/tv/show/S01E01.mkv") == "/data//tv"
+    assert trie.match("/media//movies/a.mkv") == "/media/movies/"
+    assert split_path("/media//movies/./a/../b/") == ["media", "movies", "b"]
+
+
+def test_empty_path_and_no_roots():
+    assert PathTrie().match("/media/a.mkv") is None
+    assert PathTrie(["/media"]).match("") is None
+    assert PathTrie(["/"]).match("/anything/a.mkv") == "/"
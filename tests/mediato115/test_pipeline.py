@@ -0,0 +1,122 @@
+"""
+上传检查点：单元按组保存，状态变化只重写所在的组，停止后可从检查点续传
+"""
+import json
+import threading
+
+from mediato115.pipeline import UnitState, UploadJob, UploadPipeline, UploadUnit
+
+TARGET = "u115"
+
+
+class Store(dict):
+    """
+    记录写入量的检查点存储
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.written = 0
+
+    def get_data(self, key):
+        return self.get(key)
+
+    def save_data(self, key, value):
+        self.written += len(json.dumps(value))
+        self[key] = value
+
+    def del_data(self, key):
+        self.pop(key, None)
+
+
+def _job(count: int) -> UploadJob:
+    return UploadJob(job_id=UploadJob.make_id("/media/show", TARGET), title="show", root="/media/show",
+                     target=TARGET, units=[UploadUnit(path=f"/media/show/S01/E{i:04d}.mkv", size=1)
+                                           for i in range(count)])
+
+
+def _run(store: Store, count: int, fail=()) -> UploadJob:
+    finished = threading.Event()
+    pipeline = UploadPipeline(store=store, submit=lambda job, unit: (unit.path not in fail, "失败"),
+                              on_finished=lambda job: finished.set(), concurrency=4)
+    pipeline.start()
+    try:
+        job = pipeline.submit(_job(count))
+        assert finished.wait(10)
+    finally:
+        pipeline.stop()
+    return job
+
+
+def test_write_volume_grows_linearly_with_units():
+    small, large = Store(), Store()
+    _run(small, 200)
+    _run(large, 2000)
+    # 每个单元写入两次状态，整体重写时写入量随单元数平方增长
+    assert large.written < small.written * 20
+
+
+def test_failed_units_are_resumed_from_chunks():
+    store = Store()
+    failed = {"/media/show/S01/E0150.mkv", "/media/show/S01/E0003.mkv"}
+    job = _run(store, 250, fail=failed)
+    assert job.count(UnitState.FAILED) == 2
+    assert store.get_data(UploadPipeline.JOB_KEY.format(job.job_id))["chunks"] == 3
+    resumed = []
+    finished = threading.Event()
+    pipeline = UploadPipeline(store=store, submit=lambda job, unit: resumed.append(unit.path) or (True, ""),
+                              on_finished=lambda job: finished.set())
+    pipeline.start()
+    try:
+        # 重新提交只上传失败的单元
+        job = pipeline.submit(_job(250))
+        assert finished.wait(5)
+        assert job.count(UnitState.DONE) == 250
+    finally:
+        pipeline.stop()
+    assert sorted(resumed) == sorted(failed)
+    # 全部完成后检查点连同各组一起删除
+    assert not [key for key in store if key.startswith("upload_job_")]
+
+
+def test_legacy_checkpoint_with_inline_units_is_loaded():
+    store = Store()
+    job = _job(3)
+    job.units[0].state = UnitState.DONE
+    store.save_data(UploadPipeline.INDEX_KEY, [job.job_id])
+    store.save_data(UploadPipeline.JOB_KEY.format(job.job_id), job.to_dict())
+    resumed = []
+    finished = threading.Event()
+    pipeline = UploadPipeline(store=store, submit=lambda job, unit: resumed.append(unit.path) or (True, ""),
+                              on_finished=lambda job: finished.set())
+    assert pipeline.start() == 1
+    try:
+        assert finished.wait(5)
+    finally:
+        pipeline.stop()
+    assert resumed == [unit.path for unit in job.units[1:]]
+
+
+def test_running_units_count_as_remaining():
+    started, release, finished = threading.Event(), threading.Event(), threading.Event()
+
+    def submit(job, unit):
+        started.set()
+        release.wait(5)
+        return True, ""
+
+    pipeline = UploadPipeline(store=Store(), submit=submit, on_finished=lambda job: finished.set(), concurrency=1)
+    pipeline.start()
+    try:
+        job = pipeline.submit(_job(3))
+        assert started.wait(5)
+        # 正在上传的单元尚未完成，待上传数量和预计耗时都要计入
+        assert job.count(UnitState.PENDING, UnitState.RUNNING) == 3
+        stats = pipeline.stats()
+        assert stats["pending_bytes"] + stats["running_bytes"] == 3
+        assert stats["running_bytes"] == 1
+        release.set()
+        assert finished.wait(5)
+    finally:
+        release.set()
+        pipeline.stop()
@@ -0,0 +1,63 @@
+"""
+跨进程登记表：停止的进程留下的订阅者由下一个认领该目录的进程接管并通知
+"""
+import socket
+import sqlite3
+
+from mediato115.registry import InflightRegistry
+
+KEY = "k"
+FILE = "/m/a.mkv"
+
+
+def make_registry(db_path, pid):
+    registry = InflightRegistry(str(db_path))
+    # 同一主机上存活的其他进程
+    registry.owner = f"{socket.gethostname()}:{pid}:{registry.owner.rsplit(':', 1)[1]}"
+    return registry
+
+
+def test_subscribers_survive_release_all(tmp_path):
+    db_path = tmp_path / "inflight.db"
+    a, b, c = (make_registry(db_path, 1) for _ in range(3))
+    assert b.claim(KEY, "/m", "u115", "M", [FILE]) == (None, set())
+    owner, busy = a.claim(KEY, "/m", "u115", "M", [FILE], ("tg", "alice"))
+    assert owner == b.owner and busy == {FILE}
+    b.release_all()
+    assert c.claim(KEY, "/m", "u115", "M", [FILE]) == (None, set())
+    assert c.release(KEY) == [{"title": "M", "target": "u115", "channel": "tg", "userid": "alice"}]
+    assert c.stats()["subscribers"] == 0
+
+
+def test_live_owner_keeps_its_subscribers(tmp_path):
+    db_path = tmp_path / "inflight.db"
+    a, b, c = (make_registry(db_path, 1) for _ in range(3))
+    b.claim(KEY, "/m", "u115", "M", [FILE])
+    a.claim(KEY, "/m", "u115", "M", [FILE], ("tg", "alice"))
+    # 其他文件由c上传，订阅者仍由b通知
+    assert c.claim(KEY, "/m", "u115", "M", [FILE, "/m/b.mkv"]) == (b.owner, {FILE})
+    assert c.release(KEY) == []
+    assert [row["userid"] for row in b.release(KEY)] == ["alice"]
+
+
+def test_overlap_is_found_across_keys_by_file(tmp_path):
+    db_path = tmp_path / "inflight.db"
+    a, b = (make_registry(db_path, 1) for _ in range(2))
+    # 上传命令登记剧集根目录，媒体库同步按子目录认领
+    a.claim("show", "/m/show", "u115", "Show", [f"/m/show/S01/e{i}.mkv" for i in range(3)])
+    owner, busy = b.claim("season", "/m/show/S01", "u115", "S01", ["/m/show/S01/e2.mkv", "/m/show/S01/e3.mkv"])
+    assert owner == a.owner and busy == {"/m/show/S01/e2.mkv"}
+    assert b.claim("other", "/m/show", "alipan", "Show", ["/m/show/S01/e0.mkv"]) == (None, set())
+
+
+def test_legacy_claims_with_file_list_are_rebuilt(tmp_path):
+    db_path = tmp_path / "inflight.db"
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("CREATE TABLE claims (key TEXT NOT NULL, owner TEXT NOT NULL, root TEXT NOT NULL, "
+                 "target TEXT NOT NULL, title TEXT, files TEXT NOT NULL, claimed_at REAL NOT NULL, "
+                 "heartbeat REAL NOT NULL, PRIMARY KEY (key, owner))")
+    conn.commit()
+    conn.close()
+    registry = make_registry(db_path, 1)
+    assert registry.claim(KEY, "/m", "u115", "M", [FILE]) == (None, set())
+    assert registry.stats()["inflight"] == 1
@@ -0,0 +1,35 @@
+"""
+标题索引按limit只取前若干个结果时，与完整排序的前若干个一致
+"""
+from mediato115.titleindex import MATCH_EXACT, MATCH_FUZZY, MATCH_PREFIX, MediaRecord, TitleIndex
+
+
+def build_index():
+    index = TitleIndex()
+    titles = [f"Alpha {i}" for i in range(30)] + [f"The Alpha {i}" for i in range(30)] \
+        + [f"Beta {i}" for i in range(30)] + ["Alpha", "流浪地球", "流浪地球2", "地球脉动"]
+    index.build(MediaRecord(item_id=str(i), title=title, item_type="电影") for i, title in enumerate(titles))
+    return index
+
+
+def test_limit_matches_full_ranking():
+    index = build_index()
+    for query in ("a", "Alpha", "alpha 1", "e", "地", "地球", "beta"):
+        full = [record.item_id for record in index.search(query)]
+        assert [record.item_id for record in index.search(query, limit=5)] == full[:5]
+
+
+def test_limit_keeps_exact_match_first():
+    index = build_index()
+    assert index.search("Alpha", limit=3)[0].title == "Alpha"
+    assert [record.title for record in index.search("流浪", limit=1)] == ["流浪地球"]
+
+
+def test_ranked_exposes_match_tier():
+    index = TitleIndex()
+    index.build([MediaRecord(item_id="1", title="Heat", item_type="电影"),
+                 MediaRecord(item_id="2", title="Heat Wave", item_type="电影")])
+    assert [(kind, record.title) for kind, record in index.search_ranked("Heat")] == \
+        [(MATCH_EXACT, "Heat"), (MATCH_PREFIX, "Heat Wave")]
+    # 输错字只能模糊匹配，不应被当作确定的结果
+    assert [kind for kind, _ in index.search_ranked("Heart Wave")] == [MATCH_FUZZY]